@@ -5,23 +5,51 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
-from monte_carlo_generator_scenario1 import MonteCarloSceneGenerator, visualize_scene
+from monte_carlo_generator_scenario1 import MonteCarloSceneGenerator
+from scene_batch import SceneBatch
+from job_manifest import JobManifest, atomic_output, file_sha256, job_key
+from scene_store import SceneStoreWriter, scene_columns, scene_layout
+from render_queue import (RENDER_MODES, close_scene_renderer, render_job_key, render_path, render_scenes,
+                          save_scene_image, select_scenes)
 import os
+import time
+import multiprocessing
 from tqdm import tqdm
 import scipy.io as sio
 
 
-def save_scene_to_mat(scene_data, mat_path, scene_id):
+def save_scene_to_mat(scene_data, mat_path, scene_id, index=None):
     """
     将场景数据保存为 MATLAB 可读的 .mat 文件
     
     参数：
-    - scene_data: 场景数据字典
+    - scene_data: 场景数据字典，或 SceneBatch
     - mat_path: .mat 文件保存路径
     - scene_id: 场景编号
+    - index: scene_data 为 SceneBatch 时的批内场景下标（默认 scene_id - 1）
     """
-    # 提取散射点数据
-    scatterers = scene_data['scatterers']
+    if isinstance(scene_data, SceneBatch):
+        index = scene_id - 1 if index is None else index
+        scatterers = scene_data.scene_scatterers(index)
+        object_table = scene_data.scene_objects(index)
+        # 速度取自整数档位；批量数据以 float 存储，转换为 int64 与场景字典路径写出的类型一致
+        for table in object_table.values():
+            table['velocities'] = table['velocities'].astype(np.int64)
+        barrier, lights = scene_data.barrier, scene_data.lights
+    else:
+        scatterers = scene_data['scatterers']
+        object_table = {
+            key: {
+                'centers': np.array([o.center for o in scene_data['objects'][key]]),
+                'directions': np.array([o.direction for o in scene_data['objects'][key]]),
+                'velocities': np.array([o.velocity for o in scene_data['objects'][key]])
+            }
+            for key in ('vehicles', 'pedestrians')
+        }
+        barrier, lights = scene_data['objects']['barrier'], scene_data['objects']['lights']
+    
+    num_vehicles = len(object_table['vehicles']['velocities'])
+    num_pedestrians = len(object_table['pedestrians']['velocities'])
     
     # 构建 MATLAB 结构
     mat_data = {
@@ -34,53 +62,31 @@ def save_scene_to_mat(scene_data, mat_path, scene_id):
             'pedestrians': scatterers['pedestrians']
         },
         'object_counts': {
-            'num_vehicles': len(scene_data['objects']['vehicles']),
-            'num_pedestrians': len(scene_data['objects']['pedestrians']),
-            'num_lights': len(scene_data['objects']['lights']),
+            'num_vehicles': num_vehicles,
+            'num_pedestrians': num_pedestrians,
+            'num_lights': len(lights),
             'num_scatterers': scatterers['all'].shape[0]
         }
     }
     
-    # 添加车辆详细信息
-    vehicles = scene_data['objects']['vehicles']
-    if len(vehicles) > 0:
-        vehicle_info = {
-            'centers': np.array([v.center for v in vehicles]),  # [N, 3]
-            'directions': np.array([v.direction for v in vehicles]),  # [N]
-            'velocities': np.array([v.velocity for v in vehicles]),  # [N]
-            'scatterers': scatterers['vehicles']  # [M, 4]
-        }
-        mat_data['vehicles'] = vehicle_info
-    else:
-        mat_data['vehicles'] = {
-            'centers': np.empty((0, 3)),
-            'directions': np.empty(0),
-            'velocities': np.empty(0),
-            'scatterers': np.empty((0, 4))
-        }
-    
-    # 添加行人详细信息
-    pedestrians = scene_data['objects']['pedestrians']
-    if len(pedestrians) > 0:
-        pedestrian_info = {
-            'centers': np.array([p.center for p in pedestrians]),  # [N, 3]
-            'directions': np.array([p.direction for p in pedestrians]),  # [N]
-            'velocities': np.array([p.velocity for p in pedestrians]),  # [N]
-            'scatterers': scatterers['pedestrians']  # [M, 4]
-        }
-        mat_data['pedestrians'] = pedestrian_info
-    else:
-        mat_data['pedestrians'] = {
-            'centers': np.empty((0, 3)),
-            'directions': np.empty(0),
-            'velocities': np.empty(0),
-            'scatterers': np.empty((0, 4))
-        }
+    # 添加车辆、行人详细信息
+    for key, count in (('vehicles', num_vehicles), ('pedestrians', num_pedestrians)):
+        if count > 0:
+            mat_data[key] = {
+                'centers': object_table[key]['centers'],  # [N, 3]
+                'directions': object_table[key]['directions'],  # [N]
+                'velocities': object_table[key]['velocities'],  # [N]
+                'scatterers': scatterers[key]  # [M, 4]
+            }
+        else:
+            mat_data[key] = {
+                'centers': np.empty((0, 3)),
+                'directions': np.empty(0),
+                'velocities': np.empty(0),
+                'scatterers': np.empty((0, 4))
+            }
     
     # 添加固定对象信息
-    barrier = scene_data['objects']['barrier']
-    lights = scene_data['objects']['lights']
-    
     mat_data['barrier'] = {
         'start': barrier.requested_start,
         'center': barrier.center,
@@ -103,11 +109,98 @@ def save_scene_to_mat(scene_data, mat_path, scene_id):
         'description': 'Scenario 1: Fixed barrier at center with random vehicles and pedestrians'
     }
     
+    # 保存为 .mat 文件（先写临时文件再重命名，中断时不会留下不完整的文件）
+    with atomic_output(mat_path) as tmp_path:
+        sio.savemat(tmp_path, mat_data, oned_as='row')
+
+
+def _init_worker():
+    """进程池初始化：子进程只保存图片，使用非交互式后端"""
+    plt.switch_backend('Agg')
+
+
+def _process_scene(task):
+    """
+    生成并保存单个场景（串行与进程池共用）
+    
+    参数：
+    - task: (scene_id, seed, output_dir, save_mat, with_columns, inline_render)
+      seed 为 int 时按旧版方式播种（legacy），为 SeedSequence 时使用独立的 Generator；
+      with_columns 为 True 时同时返回列式数据集的一行；
+      inline_render 为 None 时不渲染（由 render_queue 从保存的数据集渲染），否则为缩略图标志，
+      只在没有保存任何数据集（--no-mat 且无 --store）时在生成阶段直接渲染
+    
+    返回：
+    - record: 场景统计记录（不含场景数据本身，避免跨进程传输大对象）
+    - outputs: {相对 output_dir 的输出路径: sha256}
+    - duration: 耗时（秒）
+    - store_row: {'columns': scene_columns(), 'layout': scene_layout()}，未请求时为 None
+    """
+    scene_id, seed, output_dir, save_mat, with_columns, inline_render = task
+    legacy_seed = not isinstance(seed, np.random.SeedSequence)
+    start_time = time.time()
+    
+    # 生成场景
+    generator = MonteCarloSceneGenerator(seed=seed, legacy_seed=legacy_seed)
+    scene_data = generator.generate_scene()
+    
     # 保存为 .mat 文件
-    sio.savemat(mat_path, mat_data, oned_as='row')
+    if save_mat:
+        save_scene_to_mat(scene_data, os.path.join(output_dir, 'mat_files', f'scene_{scene_id:03d}.mat'), scene_id)
+    
+    # 没有保存数据集时只能在生成阶段渲染
+    if inline_render is not None:
+        save_scene_image(scene_data, render_path(output_dir, scene_id, inline_render), inline_render)
+    
+    outputs = _scene_outputs(scene_id, save_mat, inline_render)
+    
+    record = {
+        'id': scene_id,
+        **_seed_info(seed),
+        'num_vehicles': len(scene_data['objects']['vehicles']),
+        'num_pedestrians': len(scene_data['objects']['pedestrians']),
+        'num_scatterers': scene_data['scatterers']['all'].shape[0]
+    }
+    outputs = {path: file_sha256(os.path.join(output_dir, path)) for path in outputs}
+    store_row = {'columns': scene_columns(scene_data), 'layout': scene_layout(scene_data)} if with_columns else None
+    return record, outputs, time.time() - start_time, store_row
+
+
+def _seed_info(seed):
+    """场景种子信息：legacy 为整数种子，否则为 (entropy, spawn_index)"""
+    if isinstance(seed, np.random.SeedSequence):
+        return {'seed': seed.entropy, 'spawn_index': seed.spawn_key[-1]}
+    return {'seed': seed}
+
+
+def _scene_outputs(scene_id, save_mat, inline_render=None):
+    """场景生成阶段的输出文件（相对 output_dir）"""
+    outputs = []
+    if save_mat:
+        outputs.append(f'mat_files/scene_{scene_id:03d}.mat')
+    if inline_render is not None:
+        outputs.append(os.path.relpath(render_path('.', scene_id, inline_render)).replace(os.sep, '/'))
+    return outputs
+
 
+def _scene_job_key(output_dir, seed):
+    """场景生成任务在清单中的键 (scenario, seed, 'generate')"""
+    seed_info = _seed_info(seed)
+    seed_label = '-'.join(str(seed_info[key]) for key in ('seed', 'spawn_index') if key in seed_info)
+    return job_key(os.path.basename(os.path.normpath(output_dir)), seed_label, 'generate')
 
-def generate_batch_scenes(num_scenes=10, output_dir='scenario_1', seed_start=0, save_mat=True):
+
+def _append_record(stats, record):
+    """将单个场景的统计记录追加到汇总统计中"""
+    stats['vehicle_counts'].append(record['num_vehicles'])
+    stats['pedestrian_counts'].append(record['num_pedestrians'])
+    stats['total_scatterers'].append(record['num_scatterers'])
+    stats['scene_data_list'].append(record)
+
+
+def generate_batch_scenes(num_scenes=10, output_dir='scenario_1', seed_start=0, save_mat=True, workers=1,
+                          legacy_seed=False, resume=True, store=None, render='all', render_rate=0.1,
+                          thumbnail=False):
     """
     批量生成场景
     
@@ -116,12 +209,26 @@ def generate_batch_scenes(num_scenes=10, output_dir='scenario_1', seed_start=0,
     - output_dir: 输出目录
     - seed_start: 起始随机种子
     - save_mat: 是否保存为 .mat 文件
+    - workers: 并行进程数（1 为串行；输出与串行运行完全一致）
+    - legacy_seed: 为 True 时第 i 个场景使用种子 seed_start + i（与旧版结果逐位一致）；
+      否则由 SeedSequence(seed_start).spawn(num_scenes) 为每个场景派生独立随机流
+    - resume: 为 True 时跳过任务清单（output_dir/manifest.json）中已完成且输出文件仍存在的场景；
+      为 False 时全部重新生成
+    - store: 列式场景数据集路径（如 'scenario_1/scenes.h5' 或目录，见 scene_store.py），
+      为 None 时不写入；与 .mat 文件可同时保存
+    - render: 场景图片渲染范围 'none' / 'sample' / 'all'。场景全部生成后由 render_queue 从保存的数据集
+      并行渲染，生成阶段不等待 matplotlib
+    - render_rate: render='sample' 时的抽样比例
+    - thumbnail: 只生成低分辨率缩略图（保存到 output_dir/thumbnails/）
     """
     print("=" * 70)
     print(f"批量生成蒙特卡洛场景 - Scenario 1")
     print(f"场景数量: {num_scenes}")
     print(f"输出目录: {output_dir}")
     print(f"保存 .mat 文件: {'是' if save_mat else '否'}")
+    print(f"列式数据集: {store if store else '否'}")
+    print(f"渲染: {render}{f' ({render_rate:.0%})' if render == 'sample' else ''}{'，缩略图' if thumbnail else ''}")
+    print(f"并行进程数: {workers}")
     print("=" * 70)
     
     # 创建输出目录
@@ -135,56 +242,84 @@ def generate_batch_scenes(num_scenes=10, output_dir='scenario_1', seed_start=0,
         'vehicle_counts': [],
         'pedestrian_counts': [],
         'total_scatterers': [],
-        'scene_data_list': []  # 保存所有场景数据用于后续分析
+        'scene_data_list': []  # 保存所有场景的统计记录用于后续分析
     }
     
-    # 生成场景
-    for i in tqdm(range(num_scenes), desc="生成场景"):
-        seed = seed_start + i
-        scene_id = i + 1
-        
-        # 生成场景
-        generator = MonteCarloSceneGenerator(seed=seed)
-        scene_data = generator.generate_scene()
-        
-        # 统计
-        num_vehicles = len(scene_data['objects']['vehicles'])
-        num_pedestrians = len(scene_data['objects']['pedestrians'])
-        num_scatterers = scene_data['scatterers']['all'].shape[0]
-        
-        stats['vehicle_counts'].append(num_vehicles)
-        stats['pedestrian_counts'].append(num_pedestrians)
-        stats['total_scatterers'].append(num_scatterers)
-        stats['scene_data_list'].append({
-            'id': scene_id,
-            'seed': seed,
-            'num_vehicles': num_vehicles,
-            'num_pedestrians': num_pedestrians,
-            'num_scatterers': num_scatterers
-        })
-        
-        # 保存可视化
-        save_path = os.path.join(output_dir, f'scene_{scene_id:03d}.png')
-        fig, ax = visualize_scene(scene_data, save_path=save_path)
-        plt.close(fig)
-        
-        # 保存为 .mat 文件
-        if save_mat:
-            mat_path = os.path.join(mat_dir, f'scene_{scene_id:03d}.mat')
-            save_scene_to_mat(scene_data, mat_path, scene_id)
+    if legacy_seed:
+        scene_seeds = [seed_start + i for i in range(num_scenes)]
+    else:
+        scene_seeds = np.random.SeedSequence(seed_start).spawn(num_scenes)
+    
+    # 任务清单：每个场景完成后记录，中断后重新运行只生成未完成的场景
+    manifest = JobManifest(output_dir)
+    writer = SceneStoreWriter(store) if store else None
+    render_ids = set(select_scenes(np.arange(1, num_scenes + 1), render, render_rate, seed_start).tolist())
+    deferred_render = save_mat or store is not None
+    records, tasks = {}, []
+    for i in range(num_scenes):
+        key = _scene_job_key(output_dir, scene_seeds[i])
+        inline_render = thumbnail if not deferred_render and i + 1 in render_ids else None
+        # 校验输出哈希：以其他种子重新生成过的同名 .mat 不会被误认为本种子的结果
+        if (resume and manifest.is_complete(key, _scene_outputs(i + 1, save_mat, inline_render), verify_hash=True)
+                and (writer is None or writer.matches(i + 1, _seed_info(scene_seeds[i])))):
+            records[i + 1] = manifest.get(key)['info']
+        else:
+            tasks.append((i + 1, scene_seeds[i], output_dir, save_mat, writer is not None, inline_render))
+    if records:
+        print(f"✓ 任务清单中已有 {len(records)} 个已完成场景，跳过")
+    
+    def _record_result(task, result):
+        record, outputs, duration, store_row = result
+        if writer is not None:
+            writer.set_layout(store_row['layout'])
+            writer.append(record['id'], store_row['columns'], meta=record)
+        manifest.finish(_scene_job_key(output_dir, task[1]), outputs, info=record, duration=duration, flush=False)
+        for render_thumbnail in (False, True):
+            manifest.discard(render_job_key(output_dir, record['id'], render_thumbnail))   # 场景已重新生成
+        manifest.flush()
+        records[record['id']] = record
+    
+    # 生成场景（workers > 1 时按种子分片到进程池，结果按场景编号顺序流式返回）
+    # 清单按时间间隔写回，结束或中断时再写回一次，已完成的场景不会丢失
+    try:
+        if workers > 1 and len(tasks) > 1:
+            with multiprocessing.Pool(processes=workers, initializer=_init_worker) as pool:
+                results = pool.imap(_process_scene, tasks, chunksize=max(1, len(tasks) // (workers * 8)))
+                for task, result in zip(tasks, tqdm(results, total=len(tasks), desc="生成场景")):
+                    _record_result(task, result)
+        else:
+            for task in tqdm(tasks, desc="生成场景"):
+                _record_result(task, _process_scene(task))
+    finally:
+        close_scene_renderer()
+        manifest.flush(force=True)
+    if writer is not None:
+        writer.close()
+        print(f"\n✓ 列式数据集已保存: {store}（{len(writer)} 个场景）")
+    
+    # 渲染阶段：从保存的数据集读取场景，进程池并行渲染
+    if deferred_render and render_ids:
+        render_scenes(store if store else output_dir, output_dir, mode=render, rate=render_rate,
+                      thumbnail=thumbnail, workers=workers, seed=seed_start, resume=resume,
+                      scene_ids=sorted(render_ids))
+    
+    for scene_id in sorted(records):
+        _append_record(stats, records[scene_id])
     
     # 保存汇总的 .mat 文件（包含所有场景的统计信息）
     if save_mat:
         summary_data = {
             'num_scenes': num_scenes,
             'seed_start': seed_start,
+            'legacy_seed': int(legacy_seed),
             'vehicle_counts': np.array(stats['vehicle_counts']),
             'pedestrian_counts': np.array(stats['pedestrian_counts']),
             'total_scatterers': np.array(stats['total_scatterers']),
             'scene_info': stats['scene_data_list']
         }
         summary_path = os.path.join(output_dir, 'summary.mat')
-        sio.savemat(summary_path, summary_data, oned_as='row')
+        with atomic_output(summary_path) as tmp_path:
+            sio.savemat(tmp_path, summary_data, oned_as='row')
         print(f"\n✓ 汇总文件已保存: {summary_path}")
     
     # 打印统计结果
@@ -268,6 +403,17 @@ def main():
     parser.add_argument('--output-dir', type=str, default='scenario_3', help='输出目录')
     parser.add_argument('--seed', type=int, default=0, help='起始随机种子')
     parser.add_argument('--no-mat', action='store_true', help='不保存 .mat 文件')
+    parser.add_argument('--workers', type=int, default=1, help='并行进程数（默认 1，串行）')
+    parser.add_argument('--legacy-seed', action='store_true',
+                        help='使用旧版逐场景种子 (seed + i)，复现旧数据集')
+    parser.add_argument('--store', type=str, default=None,
+                        help='同时写入列式场景数据集（.h5 需要 h5py，其余路径为 npy 目录）')
+    parser.add_argument('--render', type=str, default='all', choices=RENDER_MODES,
+                        help='场景图片渲染范围（生成完成后从保存的数据集并行渲染）')
+    parser.add_argument('--render-rate', type=float, default=0.1, help='--render sample 的抽样比例')
+    parser.add_argument('--thumbnail', action='store_true', help='只生成低分辨率缩略图')
+    parser.add_argument('--no-resume', action='store_true',
+                        help='忽略任务清单，重新生成所有场景')
     
     args = parser.parse_args()
     
@@ -276,7 +422,14 @@ def main():
         num_scenes=args.num_scenes,
         output_dir=args.output_dir,
         seed_start=args.seed,
-        save_mat=not args.no_mat
+        save_mat=not args.no_mat,
+        workers=args.workers,
+        legacy_seed=args.legacy_seed,
+        resume=not args.no_resume,
+        store=args.store,
+        render=args.render,
+        render_rate=args.render_rate,
+        thumbnail=args.thumbnail
     )
     
     # 绘制统计图表
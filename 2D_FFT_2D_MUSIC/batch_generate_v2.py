@@ -5,7 +5,7 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
-from monte_carlo_generator_scenario1 import MonteCarloSceneGenerator, visualize_scene
+from monte_carlo_generator_scenario1 import MonteCarloSceneGenerator, SceneRenderer
 import os
 from tqdm import tqdm
 
@@ -36,6 +36,7 @@ def generate_batch_scenes(num_scenes=10, output_dir='monte_carlo_scenes_v2', see
     }
     
     # 生成场景
+    renderer = SceneRenderer()
     for i in tqdm(range(num_scenes), desc="生成场景"):
         seed = seed_start + i
         
@@ -52,10 +53,11 @@ def generate_batch_scenes(num_scenes=10, output_dir='monte_carlo_scenes_v2', see
         stats['pedestrian_counts'].append(num_pedestrians)
         stats['total_scatterers'].append(num_scatterers)
         
-        # 保存可视化
+        # 保存可视化（复用同一个渲染器，坐标轴与颜色条只建立一次）
         save_path = os.path.join(output_dir, f'scene_{i+1:03d}.png')
-        fig, ax = visualize_scene(scene_data, save_path=save_path)
-        plt.close(fig)
+        renderer.save(scene_data, save_path)
+    
+    renderer.close()
     
     # 打印统计结果
     print("\n" + "=" * 70)
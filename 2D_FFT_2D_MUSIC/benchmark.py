@@ -0,0 +1,452 @@
+"""
+性能基准测试（场景生成与评估指标的热点路径）
+- generate：不同密度下 MonteCarloSceneGenerator.generate_scene 的速度、各阶段耗时，
+  以及 _check_collision_free 的调用次数与通过率
+- scatterers：各类物体 get_scatterers 的耗时
+- save_mat：save_scene_to_mat 的写入吞吐量
+- render：visualize_scene 与 SceneRenderer 的单张图片耗时
+- metric：Metric.pos_metric / velociy_metric / density_mertic 在不同点云规模下的耗时
+- 结果（耗时、每秒场景数、峰值内存）以 JSON 输出；指定基线文件时比较各项耗时，发现性能回退
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from monte_carlo_generator_scenario1 import MonteCarloSceneGenerator, SceneConfig
+from scene_objects import Pedestrian, StraightBarrier, StreetLight, Vehicle
+
+
+STAGES = ('generate', 'scatterers', 'save_mat', 'render', 'metric')
+
+# 场景密度：(车辆数量范围, 行人数量范围)，上界不包含
+DENSITIES = {
+    'sparse': ((1, 3), (1, 3)),
+    'default': (SceneConfig.NUM_VEHICLES, SceneConfig.NUM_PEDESTRIANS),
+    'dense': ((6, 9), (8, 15)),
+}
+
+DEFAULT_METRIC_SIZES = (100, 1000, 10000)
+METRIC_ENV_SIZE = [30, 20, 20]
+METRIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Metric')
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB）；不支持 resource 模块的平台（Windows）返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(peak / (1024 ** 2 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _quiet():
+    """屏蔽生成器的逐物体打印"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _timed_method(obj, name, totals, key):
+    """把 obj.name 替换为累计耗时的包装（只作用于该实例）"""
+    method = getattr(obj, name)
+
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            totals[key] = totals.get(key, 0.0) + time.perf_counter() - t0
+
+    setattr(obj, name, wrapper)
+
+
+def _counted_collision_check(generator, counts):
+    """包装 _check_collision_free，统计调用次数、通过次数与耗时"""
+    check = generator._check_collision_free
+
+    def wrapper(center, radius, obj_type):
+        t0 = time.perf_counter()
+        free = check(center, radius, obj_type)
+        counts['seconds'] += time.perf_counter() - t0
+        counts['calls'] += 1
+        counts['accepted'] += bool(free)
+        counts[f'{obj_type}_calls'] = counts.get(f'{obj_type}_calls', 0) + 1
+        return free
+
+    generator._check_collision_free = wrapper
+
+
+def _median_seconds(fn, repeat):
+    """重复调用 fn，返回耗时中位数（秒）"""
+    durations = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - t0)
+    return float(np.median(durations))
+
+
+def bench_generate(num_scenes=20, seed=0, densities=DENSITIES):
+    """
+    场景生成基准
+
+    参数：
+    - num_scenes: 每种密度生成的场景数
+    - seed: 起始种子（场景 i 使用 seed + i）
+    - densities: {名称: (车辆数量范围, 行人数量范围)}
+
+    返回：
+    - dict: {密度名称: 统计结果}
+    """
+    results = {}
+    for name, (vehicle_range, pedestrian_range) in densities.items():
+        stages = {}
+        counts = {'calls': 0, 'accepted': 0, 'seconds': 0.0}
+        num_vehicles = num_pedestrians = num_scatterers = 0
+        t0 = time.perf_counter()
+        for i in range(num_scenes):
+            generator = MonteCarloSceneGenerator(seed=seed + i)
+            generator.config.NUM_VEHICLES = vehicle_range
+            generator.config.NUM_PEDESTRIANS = pedestrian_range
+            for method, key in (('_generate_fixed_layout', 'fixed_layout'), ('_generate_vehicles', 'vehicles'),
+                                ('_generate_pedestrians', 'pedestrians'), ('_collect_scatterers', 'collect_scatterers')):
+                _timed_method(generator, method, stages, key)
+            _counted_collision_check(generator, counts)
+            with _quiet():
+                scene_data = generator.generate_scene()
+            num_vehicles += len(scene_data['objects']['vehicles'])
+            num_pedestrians += len(scene_data['objects']['pedestrians'])
+            num_scatterers += scene_data['scatterers']['all'].shape[0]
+        seconds = time.perf_counter() - t0
+
+        placed = num_vehicles + num_pedestrians
+        results[name] = {
+            'vehicle_range': list(vehicle_range),
+            'pedestrian_range': list(pedestrian_range),
+            'scenes': num_scenes,
+            'seconds': round(seconds, 6),
+            'scenes_per_sec': round(num_scenes / seconds, 3),
+            'mean_vehicles': num_vehicles / num_scenes,
+            'mean_pedestrians': num_pedestrians / num_scenes,
+            'mean_scatterers': num_scatterers / num_scenes,
+            'stages': {key: {'seconds': round(value, 6)} for key, value in stages.items()},
+            'collision_check': {
+                'calls': counts['calls'],
+                'accepted': counts['accepted'],
+                'acceptance_rate': round(counts['accepted'] / max(counts['calls'], 1), 4),
+                'attempts_per_object': round(counts['calls'] / max(placed, 1), 3),
+                'vehicle_calls': counts.get('vehicle_calls', 0),
+                'pedestrian_calls': counts.get('pedestrian_calls', 0),
+                'seconds': round(counts['seconds'], 6),
+            },
+        }
+    return results
+
+
+def bench_scatterers(repeat=2000, seed=0):
+    """
+    各类物体构造与 get_scatterers 的耗时（微秒/次）
+
+    参数：
+    - repeat: 每类物体的调用次数
+    - seed: 随机位置 / 朝向的种子
+    """
+    rng = np.random.default_rng(seed)
+    factories = {
+        'vehicle': lambda: Vehicle(center=(*rng.uniform(4, 24, 2), 0), direction=rng.choice([0, 180]),
+                                   velocity=rng.choice(np.arange(-20, 22, 2))),
+        'pedestrian': lambda: Pedestrian(center=(*rng.uniform(1, 27, 2), 0), direction=rng.choice([0, 180]),
+                                         velocity=rng.choice(np.arange(-4, 6, 2))),
+        'light': lambda: StreetLight(position=(*rng.uniform(1, 27, 2), 0)),
+        'barrier': lambda: StraightBarrier(start=(14.0, 0, 0), direction=0, length=20),
+    }
+    results = {}
+    for name, factory in factories.items():
+        objects = [factory() for _ in range(repeat)]
+        t0 = time.perf_counter()
+        for obj in objects:
+            points = obj.get_scatterers()
+        seconds = time.perf_counter() - t0
+        construct = _median_seconds(factory, min(repeat, 200))
+        results[name] = {
+            'calls': repeat,
+            'num_points': int(points.shape[0]),
+            'seconds': round(seconds, 6),
+            'us_per_call': round(seconds / repeat * 1e6, 3),
+            'construct_us': round(construct * 1e6, 3),
+        }
+    return results
+
+
+def _sample_scenes(num_scenes, seed):
+    """生成默认密度的场景（供写盘与渲染基准使用）"""
+    with _quiet():
+        return [MonteCarloSceneGenerator(seed=seed + i).generate_scene() for i in range(num_scenes)]
+
+
+def bench_save_mat(scenes):
+    """
+    save_scene_to_mat 写入吞吐量（写入临时目录）
+
+    参数：
+    - scenes: 场景数据列表
+    """
+    from batch_generate_scenario1 import save_scene_to_mat
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        num_bytes = 0
+        t0 = time.perf_counter()
+        for scene_id, scene_data in enumerate(scenes, 1):
+            save_scene_to_mat(scene_data, os.path.join(tmp_dir, f'scene_{scene_id:03d}.mat'), scene_id)
+        seconds = time.perf_counter() - t0
+        for name in os.listdir(tmp_dir):
+            num_bytes += os.path.getsize(os.path.join(tmp_dir, name))
+    return {
+        'scenes': len(scenes),
+        'seconds': round(seconds, 6),
+        'scenes_per_sec': round(len(scenes) / seconds, 3),
+        'mb_per_sec': round(num_bytes / 2 ** 20 / seconds, 3),
+        'mean_file_kb': round(num_bytes / 1024 / len(scenes), 2),
+    }
+
+
+def bench_render(scenes, dpi=150):
+    """
+    单张场景图片的渲染耗时：每个场景新建图形的 visualize_scene 与复用布局的 SceneRenderer
+
+    参数：
+    - scenes: 场景数据列表
+    - dpi: 保存分辨率
+    """
+    import matplotlib.pyplot as plt
+    from monte_carlo_generator_scenario1 import SceneRenderer, visualize_scene
+
+    backend = plt.get_backend()
+    plt.switch_backend('Agg')
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'scene.png')
+
+            t0 = time.perf_counter()
+            for scene_data in scenes:
+                fig, ax = visualize_scene(scene_data)
+                fig.savefig(path, dpi=dpi, bbox_inches='tight')
+                plt.close(fig)
+            results['visualize_scene'] = time.perf_counter() - t0
+
+            renderer = SceneRenderer()
+            t0 = time.perf_counter()
+            for scene_data in scenes:
+                renderer.save(scene_data, path, dpi=dpi)
+            results['scene_renderer'] = time.perf_counter() - t0
+            renderer.close()
+    finally:
+        plt.switch_backend(backend)
+    return {name: {'images': len(scenes), 'seconds': round(seconds, 6),
+                   'images_per_sec': round(len(scenes) / seconds, 3)}
+            for name, seconds in results.items()}
+
+
+def _import_metric(metric_dir=METRIC_DIR):
+    """导入 Metric/Metric.py（位于仓库的另一目录）"""
+    metric_dir = os.path.abspath(metric_dir)
+    if metric_dir not in sys.path:
+        sys.path.insert(0, metric_dir)
+    import Metric
+    return Metric
+
+
+def synthetic_point_clouds(num_points, seed=0, env_size=METRIC_ENV_SIZE, num_velocities=12):
+    """
+    合成一对真值 / 成像点云 [N, 4] - (x, y, z, velocity)
+
+    成像点云为真值加位置噪声，并随机丢弃、增加部分点；速度取 num_velocities 个离散值
+    """
+    rng = np.random.default_rng(seed)
+    velocities = rng.choice(np.arange(-20, 22, 2), size=num_velocities, replace=False)
+    true_pos = np.column_stack([rng.uniform(0, env_size[0], num_points), rng.uniform(0, env_size[1], num_points),
+                                rng.uniform(0, env_size[2], num_points), rng.choice(velocities, num_points)])
+    keep = rng.random(num_points) < 0.8
+    imaging_pos = true_pos[keep].copy()
+    imaging_pos[:, :3] += rng.normal(0, 0.3, (imaging_pos.shape[0], 3))
+    extra = true_pos[rng.integers(0, num_points, num_points // 10)].copy()
+    extra[:, :3] += rng.normal(0, 1.0, (extra.shape[0], 3))
+    return true_pos, np.vstack([imaging_pos, extra])
+
+
+def bench_metric(sizes=DEFAULT_METRIC_SIZES, repeat=3, seed=0, metric_dir=METRIC_DIR):
+    """
+    评估指标在不同点云规模下的耗时
+
+    参数：
+    - sizes: 真值点数列表
+    - repeat: 每项重复次数（取中位数）
+    - seed: 合成点云的种子
+    - metric_dir: Metric.py 所在目录
+    """
+    metric = _import_metric(metric_dir)
+    env_size = METRIC_ENV_SIZE
+    results = {}
+    for num_points in sizes:
+        true_pos, imaging_pos = synthetic_point_clouds(num_points, seed, env_size)
+        entry = {'true_points': int(true_pos.shape[0]), 'imaging_points': int(imaging_pos.shape[0])}
+        for name, fn in (('pos_metric', lambda: metric.pos_metric(true_pos, imaging_pos, env_size)),
+                         ('pos_metric_legacy', lambda: metric.pos_metric(true_pos, imaging_pos, env_size, mode='legacy')),
+                         ('pos_metric_variants', lambda: metric.pos_metric_variants(true_pos, imaging_pos, env_size)['chamfer']),
+                         ('velociy_metric', lambda: metric.velociy_metric(true_pos, imaging_pos)),
+                         ('velociy_metric_hungarian', lambda: metric.velociy_metric(true_pos, imaging_pos, mode='hungarian')),
+                         ('velociy_metric_legacy', lambda: metric.velociy_metric(true_pos, imaging_pos, mode='legacy')),
+                         ('density_mertic', lambda: metric.density_mertic(true_pos, imaging_pos, env_size))):
+            entry[name] = {'seconds': round(_median_seconds(fn, repeat), 6), 'value': float(fn())}
+        results[str(num_points)] = entry
+    return results
+
+
+def _git_commit():
+    """当前 git 提交（不在仓库中时为 None）"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(stages=STAGES, num_scenes=20, metric_sizes=DEFAULT_METRIC_SIZES, repeat=3, seed=0):
+    """
+    运行所选阶段的基准测试
+
+    参数：
+    - stages: 要运行的阶段（见 STAGES）
+    - num_scenes: generate / save_mat / render 使用的场景数
+    - metric_sizes: metric 阶段的点云规模
+    - repeat: metric 阶段每项的重复次数
+    - seed: 随机种子
+
+    返回：
+    - dict: {'meta': 运行环境, 'stages': {阶段: 结果}, 'peak_rss_mb': 峰值内存}
+            每个阶段的结果附带 peak_rss_mb（截至该阶段结束时的进程峰值）
+    """
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"未知的阶段: {', '.join(sorted(unknown))}（可选 {', '.join(STAGES)}）")
+
+    result = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'num_scenes': num_scenes,
+            'seed': seed,
+        },
+        'stages': {},
+    }
+    scenes = _sample_scenes(num_scenes, seed) if {'save_mat', 'render'} & set(stages) else None
+    runners = {
+        'generate': lambda: bench_generate(num_scenes, seed),
+        'scatterers': lambda: bench_scatterers(seed=seed),
+        'save_mat': lambda: bench_save_mat(scenes),
+        'render': lambda: bench_render(scenes),
+        'metric': lambda: bench_metric(metric_sizes, repeat, seed),
+    }
+    for stage in STAGES:
+        if stage not in stages:
+            continue
+        t0 = time.perf_counter()
+        stage_result = runners[stage]()
+        print(f"✓ {stage}: {time.perf_counter() - t0:.2f} s", file=sys.stderr)   # 标准输出只留给 JSON
+        stage_result['peak_rss_mb'] = peak_rss_mb()
+        result['stages'][stage] = stage_result
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def _timings(tree, prefix=''):
+    """展开结果中的所有 'seconds' 项：{'stage/.../name': 秒}"""
+    timings = {}
+    for key, value in tree.items():
+        if key == 'seconds':
+            timings[prefix.rstrip('/')] = value
+        elif isinstance(value, dict):
+            timings.update(_timings(value, f'{prefix}{key}/'))
+    return timings
+
+
+def compare_results(result, baseline, tolerance=0.2, min_seconds=1e-3):
+    """
+    与基线结果比较各项耗时
+
+    参数：
+    - result, baseline: run_benchmarks 的结果
+    - tolerance: 允许的相对变慢比例（0.2 表示慢 20% 以内不算回退）
+    - min_seconds: 基线耗时低于此值的项不比较（计时噪声过大）
+
+    返回：
+    - list: [(项目, 基线秒数, 当前秒数, 比值)]，按比值降序
+    """
+    current = _timings(result['stages'])
+    reference = _timings(baseline['stages'])
+    regressions = []
+    for name, seconds in current.items():
+        base = reference.get(name)
+        if base is None or base < min_seconds:
+            continue
+        ratio = seconds / base
+        if ratio > 1 + tolerance:
+            regressions.append((name, base, seconds, ratio))
+    return sorted(regressions, key=lambda item: -item[3])
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='场景生成与评估指标的性能基准测试')
+    parser.add_argument('--stages', type=str, nargs='+', default=list(STAGES), choices=STAGES,
+                        help='要运行的阶段')
+    parser.add_argument('--num-scenes', type=int, default=20, help='generate / save_mat / render 使用的场景数')
+    parser.add_argument('--metric-sizes', type=int, nargs='+', default=list(DEFAULT_METRIC_SIZES),
+                        help='metric 阶段的真值点数')
+    parser.add_argument('--repeat', type=int, default=3, help='metric 阶段每项的重复次数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--output', type=str, default=None, help='JSON 结果文件（默认输出到标准输出）')
+    parser.add_argument('--baseline', type=str, default=None, help='基线 JSON 文件，比较各项耗时')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的相对变慢比例')
+
+    args = parser.parse_args()
+    result = run_benchmarks(args.stages, args.num_scenes, args.metric_sizes, args.repeat, args.seed)
+
+    text = json.dumps(result, ensure_ascii=False, indent=1)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"✓ 基准结果已保存: {args.output}（峰值内存 {result['peak_rss_mb']} MB）", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(result, baseline, args.tolerance)
+        for name, base, seconds, ratio in regressions:
+            print(f"⚠ 性能回退: {name} {base:.4f} s → {seconds:.4f} s（×{ratio:.2f}）", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"✓ 与基线相比无超过 {args.tolerance:.0%} 的回退", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+"""
+恒虚警检测（Python 版 CA_CFAR.m / OSCA_CFAR_*.m / WCA_CFAR_1D.m）
+- 窗口在矩阵边缘处平移到矩阵内部（与 MATLAB 逐点循环的取窗方式一致）
+- CA-CFAR：积分图（summed-area table）一次求出所有窗口与保护单元的和；只需判决少量单元时直接对其窗口求和
+- OS-CFAR：先对每行做滑窗排序统计（rank filter），再对窗口内各行取平均
+- 返回 (threshold_matrix, target_index, detect_matrix_abs)，target_index 为 0 起始的 (行, 列)
+"""
+
+import math
+
+import numpy as np
+from scipy.ndimage import rank_filter
+
+
+# func_range_doppler_processing.m 中按 SNR 选用的 OSCA-CFAR 版本
+OSCA_PRESETS = {
+    'high': {'window_size': 9, 'k_ratio': 0.75, 'Pfa': 1e-4, 'threshold_adjust': 60000},
+    'mid': {'window_size': 13, 'k_ratio': 0.85, 'Pfa': 1e-5, 'threshold_adjust': 200000},
+    'low': {'window_size': 15, 'k_ratio': 0.88, 'Pfa': 5e-6, 'threshold_adjust': 300000},
+    'very_low': {'window_size': 17, 'k_ratio': 0.92, 'Pfa': 1e-6, 'threshold_adjust': 500000},
+}
+
+
+def _matlab_round(value):
+    """MATLAB round（0.5 远离零取整）"""
+    return int(math.floor(value + 0.5))
+
+
+def _window_starts(length, window_size):
+    """每个位置对应的窗口起点（边缘处窗口平移到矩阵内部）"""
+    if length < window_size:
+        raise ValueError(f"矩阵尺寸 {length} 小于检测窗口 {window_size}")
+    half = (window_size - 1) // 2
+    return np.clip(np.arange(length) - half, 0, length - window_size)
+
+
+def _summed_area_table(values):
+    """带零边的积分图 [rows+1, cols+1]"""
+    table = np.zeros((values.shape[0] + 1, values.shape[1] + 1))
+    np.cumsum(np.cumsum(values, axis=0), axis=1, out=table[1:, 1:])
+    return table
+
+
+def _box_sum(table, row_start, row_end, col_start, col_end):
+    """由积分图求矩形 [row_start, row_end) × [col_start, col_end) 的和（索引可广播）"""
+    return (table[row_end, col_end] - table[row_start, col_end]
+            - table[row_end, col_start] + table[row_start, col_start])
+
+
+def _targets(detect_matrix_abs, threshold_matrix):
+    """按行优先顺序返回超过门限的单元 [K, 2]"""
+    return np.argwhere(detect_matrix_abs > threshold_matrix)
+
+
+def _ca_threshold(reference_sum, num_reference, Pfa, threshold_adjust):
+    """CA-CFAR 门限：参考单元均值 × (Pfa^(-1/N) - 1) + 门限附加量"""
+    K_factor = Pfa ** (-1 / num_reference) - 1
+    return reference_sum / num_reference * K_factor + threshold_adjust
+
+
+def ca_cfar(detect_matrix, window_size=9, guard_window_size=3, Pfa=1e-3,
+            threshold_adjust=500, point_richness=4):
+    """
+    二维 CA-CFAR（与 CA_CFAR.m 一致，幅度检测器）
+
+    参数：
+    - detect_matrix: 待检测矩阵（复数或实数）
+    - window_size: 检测窗口边长
+    - guard_window_size: 保护窗口边长（含 CUT）
+    - Pfa: 虚警概率
+    - threshold_adjust: 门限附加量
+    - point_richness: 最多返回的目标数（按 CUT 幅值降序保留），None 表示不限制
+
+    返回：
+    - threshold_matrix: 检测门限矩阵
+    - target_index: 目标索引 [K, 2]（0 起始）
+    - detect_matrix_abs: 幅度矩阵
+    """
+    detect_matrix_abs = np.abs(detect_matrix)
+    rows, cols = detect_matrix_abs.shape
+    table = _summed_area_table(detect_matrix_abs)
+
+    row_start = _window_starts(rows, window_size)[:, None]
+    col_start = _window_starts(cols, window_size)[None, :]
+    window_sum = _box_sum(table, row_start, row_start + window_size,
+                          col_start, col_start + window_size)
+
+    # 保护单元在窗口内截断；由于 CUT 总在窗口内，等价于在矩阵边界截断
+    guard_half = (guard_window_size - 1) // 2
+    index_row = np.arange(rows)[:, None]
+    index_col = np.arange(cols)[None, :]
+    guard_row_start = np.maximum(index_row - guard_half, 0)
+    guard_row_end = np.minimum(index_row + guard_half + 1, rows)
+    guard_col_start = np.maximum(index_col - guard_half, 0)
+    guard_col_end = np.minimum(index_col + guard_half + 1, cols)
+    guard_sum = _box_sum(table, guard_row_start, guard_row_end, guard_col_start, guard_col_end)
+
+    num_reference = window_size**2 - (guard_row_end - guard_row_start) * (guard_col_end - guard_col_start)
+    threshold_matrix = _ca_threshold(window_sum - guard_sum, num_reference, Pfa, threshold_adjust)
+
+    target_index = _targets(detect_matrix_abs, threshold_matrix)
+    if point_richness is not None and target_index.shape[0] > point_richness:
+        cut = detect_matrix_abs[target_index[:, 0], target_index[:, 1]]
+        order = np.argsort(-cut, kind='stable')[:point_richness]
+        target_index = target_index[order]
+    return threshold_matrix, target_index, detect_matrix_abs
+
+
+def ca_cfar_cells(detect_matrix, cells, window_size=9, guard_window_size=3, Pfa=1e-3, threshold_adjust=500):
+    """
+    只对指定单元做 CA-CFAR 判决（门限与 ca_cfar 相同，参考窗口直接求和）
+
+    参数：
+    - detect_matrix: 待检测矩阵（复数或实数）
+    - cells: 待判决单元 [K, 2]（0 起始）
+    - 其余同 ca_cfar
+
+    返回：
+    - threshold: 各单元的检测门限 [K]
+    - detected: 各单元幅值是否超过门限 [K]（bool）
+    """
+    cells = np.asarray(cells, dtype=int).reshape(-1, 2)
+    offsets = np.arange(window_size)
+    row_index = _window_starts(detect_matrix.shape[0], window_size)[cells[:, 0], None] + offsets
+    col_index = _window_starts(detect_matrix.shape[1], window_size)[cells[:, 1], None] + offsets
+    window = np.abs(detect_matrix[row_index[:, :, None], col_index[:, None, :]])
+
+    # 保护单元总在窗口内（见 ca_cfar），按与 CUT 的距离在窗口中标出
+    guard_half = (guard_window_size - 1) // 2
+    guard = ((np.abs(row_index - cells[:, :1]) <= guard_half)[:, :, None]
+             & (np.abs(col_index - cells[:, 1:]) <= guard_half)[:, None, :])
+    num_reference = window_size**2 - guard.sum(axis=(1, 2))
+    threshold = _ca_threshold(np.where(guard, 0, window).sum(axis=(1, 2)), num_reference, Pfa, threshold_adjust)
+    cut = np.abs(detect_matrix[cells[:, 0], cells[:, 1]])
+    return threshold, cut > threshold
+
+
+def ca_cfar_support(mask, window_size=9):
+    """
+    ca_cfar 对 mask 内各单元做判决时用到的全部单元（各单元检测窗口的并集，边缘处窗口平移）
+
+    参数：
+    - mask: 待判决单元 [rows, cols]（bool）
+    - window_size: 检测窗口边长
+
+    返回：
+    - ndarray: [rows, cols] bool，只要这些单元取值与全矩阵相同，mask 内的判决即与全矩阵一致
+    """
+    support = np.asarray(mask, dtype=bool)
+    for axis in range(2):
+        support = np.moveaxis(support, axis, 0)
+        length = support.shape[0]
+        starts = _window_starts(length, window_size)
+        # 窗口起点单调不减：覆盖位置 r 的窗口是 starts 落在 (r - window_size, r] 内的一段连续单元
+        positions = np.arange(length)
+        low = np.searchsorted(starts, positions - window_size, side='right')
+        high = np.searchsorted(starts, positions, side='right')
+        counts = np.zeros((length + 1,) + support.shape[1:], dtype=int)
+        np.cumsum(support, axis=0, out=counts[1:])
+        support = np.moveaxis(counts[high] > counts[low], 0, axis)
+    return support
+
+
+def os_cfar(detect_matrix, window_size=9, k_ratio=0.75, Pfa=1e-3, threshold_adjust=60000):
+    """
+    二维 OSCA-CFAR（与 OSCA_CFAR*.m 一致，平方律检测器）
+
+    每个窗口内对各行排序取第 R = round(k_ratio * (window_size-1)) 个值，
+    再对窗口内所有行取平均作为噪声功率。
+
+    参数：
+    - detect_matrix: 待检测矩阵（复数或实数）
+    - window_size: 检测窗口边长（奇数）
+    - k_ratio: 排序比例
+    - Pfa: 虚警概率
+    - threshold_adjust: 门限附加量
+
+    返回：
+    - threshold_matrix, target_index（0 起始 [K, 2]）, detect_matrix_abs（功率矩阵）
+    """
+    detect_matrix_abs = np.abs(detect_matrix)
+    detect_matrix_abs *= detect_matrix_abs
+    rows, cols = detect_matrix_abs.shape
+    row_start = _window_starts(rows, window_size)
+    col_start = _window_starts(cols, window_size)
+    half = (window_size - 1) // 2
+    rank = _matlab_round(k_ratio * (window_size - 1)) - 1
+
+    # 行内滑窗排序统计：只保留窗口完整落在矩阵内的列（共 cols-window_size+1 个）
+    row_rank = rank_filter(detect_matrix_abs, rank=rank, size=(1, window_size))
+    row_rank = row_rank[:, half:cols - half]
+
+    # 窗口内各行求平均：同样只保留完整窗口（共 rows-window_size+1 个）
+    num_windows = rows - window_size + 1
+    noise_sum = row_rank[:num_windows].copy()
+    for offset in range(1, window_size):
+        noise_sum += row_rank[offset:offset + num_windows]
+
+    # 边缘位置使用平移后的窗口
+    noise_power = (noise_sum / window_size)[row_start][:, col_start]
+    K_factor = Pfa ** (-1 / window_size) - 1
+    threshold_matrix = noise_power * K_factor + threshold_adjust
+    return threshold_matrix, _targets(detect_matrix_abs, threshold_matrix), detect_matrix_abs
+
+
+def osca_preset_for_snr(snr_db):
+    """按 SNR 选择 OSCA-CFAR 版本（与 func_range_doppler_processing.m 一致）"""
+    if np.isinf(snr_db) or snr_db >= 10:
+        return 'high'
+    if snr_db >= 0:
+        return 'mid'
+    if snr_db >= -10:
+        return 'low'
+    return 'very_low'
+
+
+def osca_cfar_snr(detect_matrix, snr_db=np.inf):
+    """
+    按 SNR 选用 OSCA_CFAR_high/mid/low/very_low_snr 的参数进行检测
+
+    返回：
+    - threshold_matrix, target_index, detect_matrix_abs
+    """
+    return os_cfar(detect_matrix, **OSCA_PRESETS[osca_preset_for_snr(snr_db)])
+
+
+def adaptive_osca_config(snr_db=np.inf):
+    """
+    OSCA_CFAR_adaptive.m 中的 SNR 自适应参数表
+
+    返回：
+    - dict: window_size, k_ratio, Pfa, threshold_adjust
+    """
+    if np.isinf(snr_db):
+        return {'window_size': 9, 'k_ratio': 0.75, 'Pfa': 1e-4, 'threshold_adjust': 50000}
+    if snr_db >= 10:
+        return {'window_size': 9, 'k_ratio': 0.75, 'Pfa': 1e-4, 'threshold_adjust': 60000}
+    if snr_db >= 0:
+        return {'window_size': 11, 'k_ratio': 0.80, 'Pfa': 5e-5, 'threshold_adjust': 80000}
+    if snr_db >= -10:
+        return {'window_size': 13, 'k_ratio': 0.85, 'Pfa': 1e-5, 'threshold_adjust': 120000}
+    return {'window_size': 15, 'k_ratio': 0.90, 'Pfa': 5e-6, 'threshold_adjust': 200000}
+
+
+def osca_cfar_adaptive(detect_matrix, snr_db=np.inf):
+    """与 OSCA_CFAR_adaptive.m 一致的 SNR 自适应 OSCA-CFAR"""
+    return os_cfar(detect_matrix, **adaptive_osca_config(snr_db))
+
+
+def wca_cfar_1d(detect_list, window_size=5, Pfa=1e-3, threshold_adjust=100,
+                factor_left=0.8, point_richness=3):
+    """
+    一维加权 CA-CFAR（与 WCA_CFAR_1D.m 一致），用于估计信号子空间维数
+
+    参数：
+    - detect_list: 特征值序列 [..., L]（升序），支持批量
+    - window_size: 检测窗口长度
+    - Pfa: 虚警概率
+    - threshold_adjust: 门限附加量
+    - factor_left: 左侧（较小特征值）平均值权重
+    - point_richness: 目标数上限
+
+    返回：
+    - target_num: 检测到的目标数（批量输入时为数组）
+    """
+    values = np.abs(np.asarray(detect_list, dtype=float))
+    length = values.shape[-1]
+    start = _window_starts(length, window_size)
+    position = np.arange(length) - start          # CUT 在窗口内的位置
+
+    cumulative = np.concatenate([np.zeros(values.shape[:-1] + (1,)), np.cumsum(values, axis=-1)], axis=-1)
+    left_count = position
+    right_count = window_size - 1 - position
+    left_sum = cumulative[..., start + position] - cumulative[..., start]
+    right_sum = cumulative[..., start + window_size] - cumulative[..., start + position + 1]
+
+    # 窗口端点处一侧没有参考单元，该侧平均值取 0
+    avg_left = np.where(left_count > 0, left_sum / np.maximum(left_count, 1), 0.0)
+    avg_right = np.where(right_count > 0, right_sum / np.maximum(right_count, 1), 0.0)
+
+    noise_power = avg_left * factor_left + avg_right * (1 - factor_left)
+    K_factor = Pfa ** (-1 / (window_size - 1)) - 1
+    threshold_list = noise_power * K_factor + threshold_adjust
+
+    target_num = np.sum(values > threshold_list, axis=-1)
+    target_num = np.where(target_num > point_richness, point_richness, target_num)
+    return int(target_num) if np.ndim(target_num) == 0 else target_num
@@ -0,0 +1,204 @@
+"""
+可续跑的批处理任务清单（manifest）
+- 每个任务以 (scenario, seed, stage) 为键，记录状态、输出文件的内容哈希与耗时
+- 清单本身与所有输出文件都先写临时文件再 os.replace，进程中途被杀也不会留下半个文件
+- 大批量任务逐条记录后按时间间隔写回清单（flush），结束或中断时再强制写回一次，避免每个任务都重写整个清单
+- 重启时只有状态为 done 且输出文件仍存在（可选：哈希一致）的任务才会跳过，
+  替代 "results.mat 存在即跳过" 的判断（部分写入的文件会被误认为已完成）
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+
+MANIFEST_NAME = 'manifest.json'
+FLUSH_INTERVAL = 30.0   # 清单自动写回的最小间隔（秒）
+_HASH_BLOCK = 1 << 20
+
+
+def file_sha256(path):
+    """文件内容的 SHA-256（十六进制）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def atomic_output(path):
+    """
+    原子写入输出文件：产出同目录下的临时路径，写入成功后重命名为 path
+
+    临时文件保留原扩展名（如 .scene_001.tmp-<pid>-xxxx.mat），savemat / savefig 按扩展名识别格式。
+    写入过程中抛出异常时删除临时文件，path 保持原状。
+
+    用法：
+        with atomic_output(mat_path) as tmp_path:
+            sio.savemat(tmp_path, data)
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    stem, ext = os.path.splitext(name)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f'.{stem}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}{ext}')
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def job_key(scenario, seed, stage):
+    """任务键：'scenario/seed/stage'"""
+    return f'{scenario}/{seed}/{stage}'
+
+
+class JobManifest:
+    """
+    JSON 任务清单（只应由主进程读写；worker 返回输出哈希，由主进程记录）
+
+    每条记录：
+    - status: 'running' | 'done' | 'failed'
+    - outputs: {相对 root 的路径: sha256}
+    - started / finished: 时间戳（ISO 格式），duration: 耗时（秒）
+    - info: 任务附带的统计信息（如场景目标数），跳过任务时可直接复用
+    - error: 失败原因
+    """
+
+    def __init__(self, root, name=MANIFEST_NAME, flush_interval=FLUSH_INTERVAL):
+        """
+        参数：
+        - root: 输出根目录（outputs 中的路径相对于此目录）
+        - name: 清单文件名
+        - flush_interval: flush() 写回清单的最小间隔（秒），0 表示每次 flush() 都写回
+        """
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(self.root, name)
+        self.flush_interval = flush_interval
+        self.jobs = {}
+        self._start_times = {}
+        self._dirty = False
+        self._last_save = time.monotonic()
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                self.jobs = json.load(f)['jobs']
+
+    def save(self):
+        """原子写回清单"""
+        with atomic_output(self.path) as tmp_path:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'updated': datetime.now().isoformat(timespec='seconds'), 'jobs': self.jobs},
+                          f, ensure_ascii=False, indent=1)
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def flush(self, force=False):
+        """
+        写回未保存的修改（距上次写回不足 flush_interval 秒时跳过，force 为 True 时总是写回）
+
+        逐条记录任务时以 flush=False 调用 start / finish / fail，再调用 flush()；
+        全部任务结束或中断时调用 flush(force=True)。
+        """
+        if self._dirty and (force or time.monotonic() - self._last_save >= self.flush_interval):
+            self.save()
+
+    def get(self, key):
+        """返回任务记录（不存在时为 None）"""
+        return self.jobs.get(key)
+
+    def is_complete(self, key, outputs=None, verify_hash=False):
+        """
+        判断任务是否已完成
+
+        参数：
+        - key: 任务键
+        - outputs: 本次运行要求的输出文件（相对路径），记录中缺少任一项即视为未完成
+        - verify_hash: 为 True 时重新计算输出文件哈希并与记录比对（默认只检查文件存在）
+
+        返回：
+        - bool
+        """
+        job = self.jobs.get(key)
+        if job is None or job['status'] != 'done':
+            return False
+        if outputs is not None and not set(outputs) <= set(job['outputs']):
+            return False
+        for rel_path, digest in job['outputs'].items():
+            path = os.path.join(self.root, rel_path)
+            if not os.path.exists(path):
+                return False
+            if verify_hash and file_sha256(path) != digest:
+                return False
+        return True
+
+    def start(self, key, flush=True):
+        """标记任务开始"""
+        self.jobs[key] = {'status': 'running', 'outputs': {}, 'started': datetime.now().isoformat(timespec='seconds')}
+        self._start_times[key] = time.time()
+        self._dirty = True
+        if flush:
+            self.save()
+
+    def finish(self, key, outputs, info=None, duration=None, flush=True):
+        """
+        标记任务完成
+
+        参数：
+        - key: 任务键
+        - outputs: 输出文件路径列表（文件系统路径），或 {相对 root 的路径: sha256}（由 worker 预先计算）
+        - info: 附带的统计信息（需可 JSON 序列化）
+        - duration: 耗时（秒），默认由 start() 的时间计算
+        - flush: 是否立即写回清单
+        """
+        t0 = self._start_times.pop(key, None)
+        if duration is None:
+            duration = time.time() - t0 if t0 is not None else 0.0
+        job = self.jobs.get(key) if t0 is not None else None
+        if job is None:
+            # 未调用 start()（如 worker 中完成的任务）：由耗时反推开始时间
+            job = {'started': (datetime.now() - timedelta(seconds=duration)).isoformat(timespec='seconds')}
+        if not isinstance(outputs, dict):
+            outputs = {self.relpath(path): file_sha256(path) for path in outputs}
+        job.update(status='done', outputs=outputs, finished=datetime.now().isoformat(timespec='seconds'),
+                   duration=round(duration, 4), info=info or {})
+        job.pop('error', None)
+        self.jobs[key] = job
+        self._dirty = True
+        if flush:
+            self.save()
+
+    def fail(self, key, error, flush=True):
+        """标记任务失败（下次运行会重试）"""
+        job = self.jobs.get(key) or {'outputs': {}}
+        self._start_times.pop(key, None)
+        job.update(status='failed', error=str(error), finished=datetime.now().isoformat(timespec='seconds'))
+        self.jobs[key] = job
+        self._dirty = True
+        if flush:
+            self.save()
+
+    def discard(self, key, flush=False):
+        """删除任务记录（上游任务重新计算后，使依赖它的任务失效）"""
+        self._start_times.pop(key, None)
+        if self.jobs.pop(key, None) is not None:
+            self._dirty = True
+            if flush:
+                self.save()
+
+    def relpath(self, path):
+        """文件系统路径转换为相对 root 的路径（统一使用 '/' 分隔）"""
+        return os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, '/')
+
+    def summary(self):
+        """各状态的任务数"""
+        counts = {}
+        for job in self.jobs.values():
+            counts[job['status']] = counts.get(job['status'], 0) + 1
+        return counts
@@ -5,10 +5,14 @@
 - 考虑与静止物体（隔离带、路灯）的碰撞
 """
 
+import math
+from collections import defaultdict
+
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 from scene_objects import Vehicle, StraightBarrier, StreetLight, Pedestrian
+from scene_batch import SceneBatch
 
 
 class SceneConfig:
@@ -32,6 +36,9 @@ class SceneConfig:
     # 安全距离缓冲
     SAFETY_BUFFER = 0.5       # 额外的安全距离 (确保物体间有足够间隙)
     
+    # 碰撞检测网格单元边长：两辆车之间的最大作用距离，查询时通常只需检查 3×3 邻域
+    GRID_CELL_SIZE = 2 * VEHICLE_RADIUS + SAFETY_BUFFER
+    
     # 数量范围
     NUM_VEHICLES = (1, 6)     # 车辆数量范围
     NUM_PEDESTRIANS = (1, 8)  # 行人数量范围
@@ -42,18 +49,82 @@ class SceneConfig:
     PEDESTRIAN_SPEED_RANGE = (-2, 2)    # 行人速度范围 (m/s)
 
 
+class OccupancyGrid:
+    """
+    均匀网格占用索引（空间哈希）
+    
+    以碰撞圆圆心所在单元存储 (x, y, radius)，查询时只检查与候选圆可能相交的邻近单元，
+    单次查询代价与场景中物体总数无关。
+    """
+    
+    def __init__(self, cell_size):
+        """
+        参数：
+        - cell_size: 网格单元边长 (m)
+        """
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.max_radius = 0.0
+        self.count = 0
+    
+    def _cell_index(self, value):
+        return math.floor(value / self.cell_size)
+    
+    def insert(self, x, y, radius):
+        """插入一个碰撞圆"""
+        self.cells[(self._cell_index(x), self._cell_index(y))].append((x, y, radius))
+        self.max_radius = max(self.max_radius, radius)
+        self.count += 1
+    
+    def is_free(self, x, y, radius, buffer=0.0):
+        """
+        检查候选圆与已插入的圆是否无碰撞（判据与逐对扫描相同）
+        
+        参数：
+        - x, y: 候选圆心
+        - radius: 候选半径
+        - buffer: 额外安全距离
+        
+        返回：
+        - bool: True=无碰撞, False=有碰撞
+        """
+        reach = radius + self.max_radius + buffer
+        ix0, ix1 = self._cell_index(x - reach), self._cell_index(x + reach)
+        iy0, iy1 = self._cell_index(y - reach), self._cell_index(y + reach)
+        
+        for ix in range(ix0, ix1 + 1):
+            for iy in range(iy0, iy1 + 1):
+                cell = self.cells.get((ix, iy))
+                if not cell:
+                    continue
+                for ox, oy, other_radius in cell:
+                    distance = math.sqrt((x - ox)**2 + (y - oy)**2)
+                    if distance < radius + other_radius + buffer:
+                        return False
+        return True
+    
+    def __len__(self):
+        return self.count
+
+
 class MonteCarloSceneGenerator:
     """蒙特卡洛场景生成器"""
     
-    def __init__(self, seed=None):
+    def __init__(self, seed=None, legacy_seed=False):
         """
         初始化生成器
         
         参数：
-        - seed: 随机种子，用于可复现性
+        - seed: 随机种子，用于可复现性（int、np.random.SeedSequence 或 None）
+        - legacy_seed: 兼容模式。为 True 时使用 RandomState(seed)，
+          与旧版 np.random.seed(seed) 生成的场景逐位一致（seed 须为 int 或 None）
         """
-        if seed is not None:
-            np.random.seed(seed)
+        # 每个生成器持有独立的随机数发生器，不修改全局 np.random 状态
+        self.legacy_seed = legacy_seed
+        if legacy_seed:
+            self.rng = np.random.RandomState(seed)
+        else:
+            self.rng = np.random.default_rng(seed)
         
         self.config = SceneConfig()
         
@@ -65,6 +136,31 @@ class MonteCarloSceneGenerator:
         
         # 存储对象的碰撞圆信息 (center_x, center_y, radius)
         self.static_obstacles = []  # 静止障碍物（隔离带、路灯）
+        
+        # 所有已放置碰撞圆（静止障碍物、车辆、行人）的网格索引
+        self.occupancy = OccupancyGrid(self.config.GRID_CELL_SIZE)
+    
+    @classmethod
+    def spawn(cls, n, seed=None):
+        """
+        通过 SeedSequence.spawn 创建 n 个相互独立、可复现的生成器
+        
+        参数：
+        - n: 生成器数量
+        - seed: 根种子（int 或 None）
+        
+        返回：
+        - list[MonteCarloSceneGenerator]: 第 i 个生成器的随机流只由 (seed, i) 决定，
+          可分发到线程池或进程池中并行使用
+        """
+        children = np.random.SeedSequence(seed).spawn(n)
+        return [cls(seed=child) for child in children]
+    
+    def _randint(self, low, high, size=None):
+        """统一 RandomState.randint 与 Generator.integers 的接口（high 不包含）"""
+        if self.legacy_seed:
+            return self.rng.randint(low, high, size=size)
+        return self.rng.integers(low, high, size=size)
     
     def generate_scene(self):
         """
@@ -118,6 +214,7 @@ class MonteCarloSceneGenerator:
                 'radius': self.config.BARRIER_RADIUS,
                 'type': 'barrier'
             })
+            self.occupancy.insert(barrier_x, y_pos, self.config.BARRIER_RADIUS)
         
         print(f"  ✓ 隔离带: X={barrier_x:.1f}, 长度={self.config.SPACE_Y_MAX}m")
         
@@ -137,12 +234,13 @@ class MonteCarloSceneGenerator:
                 'radius': self.config.LIGHT_RADIUS,
                 'type': 'light'
             })
+            self.occupancy.insert(pos[0], pos[1], self.config.LIGHT_RADIUS)
             
             print(f"  ✓ 路灯 {i}: ({pos[0]:.1f}, {pos[1]:.1f})")
     
     def _generate_vehicles(self):
         """生成随机车辆"""
-        num_vehicles = np.random.randint(*self.config.NUM_VEHICLES)
+        num_vehicles = self._randint(*self.config.NUM_VEHICLES)
         print(f"\n[2/3] 生成随机车辆（目标: {num_vehicles} 辆）...")
         
         max_attempts = 100
@@ -150,21 +248,21 @@ class MonteCarloSceneGenerator:
         for i in range(num_vehicles):
             for attempt in range(max_attempts):
                 # 随机位置（Z固定为0）
-                x = np.random.uniform(
+                x = self.rng.uniform(
                     self.config.SPACE_X_MIN + self.config.VEHICLE_RADIUS,
                     self.config.SPACE_X_MAX - self.config.VEHICLE_RADIUS
                 )
-                y = np.random.uniform(
+                y = self.rng.uniform(
                     self.config.SPACE_Y_MIN + self.config.VEHICLE_RADIUS,
                     self.config.SPACE_Y_MAX - self.config.VEHICLE_RADIUS
                 )
                 center = (x, y, 0)
                 
                 # 方向：0° 或 180°
-                direction = np.random.choice([0, 180])
+                direction = self.rng.choice([0, 180])
                 
                 # 速度：-20 到 20 m/s，步长为 2
-                velocity = np.random.choice(np.arange(-20, 22, 2))  # [-20, -18, ..., 18, 20]
+                velocity = self.rng.choice(np.arange(-20, 22, 2))  # [-20, -18, ..., 18, 20]
                 
                 # 先创建车辆对象以获取实际的几何中心
                 vehicle = Vehicle(center=center, direction=direction, velocity=velocity)
@@ -179,6 +277,7 @@ class MonteCarloSceneGenerator:
                         'center': actual_center_3d,  # 使用实际中心
                         'radius': self.config.VEHICLE_RADIUS
                     })
+                    self.occupancy.insert(actual_center[0], actual_center[1], self.config.VEHICLE_RADIUS)
                     print(f"  ✓ 车辆 {i+1}: 位置 ({x:.1f}, {y:.1f}), 实际中心 ({actual_center[0]:.1f}, {actual_center[1]:.1f}), 朝向 {direction:.0f}°, 速度 {velocity:.1f} m/s")
                     break
             else:
@@ -186,7 +285,7 @@ class MonteCarloSceneGenerator:
     
     def _generate_pedestrians(self):
         """生成随机行人"""
-        num_pedestrians = np.random.randint(*self.config.NUM_PEDESTRIANS)
+        num_pedestrians = self._randint(*self.config.NUM_PEDESTRIANS)
         print(f"\n[3/3] 生成随机行人（目标: {num_pedestrians} 人）...")
         
         max_attempts = 100
@@ -194,21 +293,21 @@ class MonteCarloSceneGenerator:
         for i in range(num_pedestrians):
             for attempt in range(max_attempts):
                 # 随机位置（Z固定为0）
-                x = np.random.uniform(
+                x = self.rng.uniform(
                     self.config.SPACE_X_MIN + self.config.PEDESTRIAN_RADIUS,
                     self.config.SPACE_X_MAX - self.config.PEDESTRIAN_RADIUS
                 )
-                y = np.random.uniform(
+                y = self.rng.uniform(
                     self.config.SPACE_Y_MIN + self.config.PEDESTRIAN_RADIUS,
                     self.config.SPACE_Y_MAX - self.config.PEDESTRIAN_RADIUS
                 )
                 center = (x, y, 0)
                 
                 # 方向：0° 或 180°
-                direction = np.random.choice([0, 180])
+                direction = self.rng.choice([0, 180])
                 
                 # 速度：-4 到 4 m/s，步长为 2
-                velocity = np.random.choice(np.arange(-4, 6, 2))  # [-4, -2, 0, 2, 4]
+                velocity = self.rng.choice(np.arange(-4, 6, 2))  # [-4, -2, 0, 2, 4]
                 
                 # 先创建行人对象以获取实际的几何中心
                 pedestrian = Pedestrian(center=center, direction=direction, velocity=velocity)
@@ -223,6 +322,7 @@ class MonteCarloSceneGenerator:
                         'center': actual_center_3d,  # 使用实际中心
                         'radius': self.config.PEDESTRIAN_RADIUS
                     })
+                    self.occupancy.insert(actual_center[0], actual_center[1], self.config.PEDESTRIAN_RADIUS)
                     print(f"  ✓ 行人 {i+1}: 位置 ({x:.1f}, {y:.1f}), 实际中心 ({actual_center[0]:.1f}, {actual_center[1]:.1f}), 朝向 {direction:.0f}°, 速度 {velocity:.1f} m/s")
                     break
             else:
@@ -249,44 +349,193 @@ class MonteCarloSceneGenerator:
             y + radius > self.config.SPACE_Y_MAX):
             return False
         
-        # 2. 检查与静止障碍物的碰撞（隔离带、路灯）
-        for obstacle in self.static_obstacles:
-            distance = np.sqrt(
-                (x - obstacle['center'][0])**2 + 
-                (y - obstacle['center'][1])**2
-            )
-            min_distance = radius + obstacle['radius'] + self.config.SAFETY_BUFFER
-            if distance < min_distance:
-                return False
-        
-        # 3. 检查与已有车辆的碰撞
-        for vehicle_info in self.vehicles:
-            distance = np.sqrt(
-                (x - vehicle_info['center'][0])**2 + 
-                (y - vehicle_info['center'][1])**2
-            )
-            min_distance = radius + vehicle_info['radius'] + self.config.SAFETY_BUFFER
-            if distance < min_distance:
-                return False
-        
-        # 4. 检查与已有行人的碰撞
-        for pedestrian_info in self.pedestrians:
-            distance = np.sqrt(
-                (x - pedestrian_info['center'][0])**2 + 
-                (y - pedestrian_info['center'][1])**2
-            )
-            min_distance = radius + pedestrian_info['radius'] + self.config.SAFETY_BUFFER
-            if distance < min_distance:
-                return False
+        # 2. 检查与静止障碍物、已有车辆和行人的碰撞（只检查网格邻近单元）
+        return self.occupancy.is_free(x, y, radius, self.config.SAFETY_BUFFER)
+    
+    def generate_batch(self, n_scenes, max_attempts=100, chunk_size=1024, as_batch=False, dtype=np.float64):
+        """
+        批量生成场景（向量化版本）
+        
+        一次性为多个场景抽取所有候选位置、方向和速度，碰撞检测以数组运算完成，
+        只为最终放置成功的物体创建 Vehicle/Pedestrian 对象。
         
-        return True
+        参数：
+        - n_scenes: 场景数量
+        - max_attempts: 每个物体的最大尝试次数（与 generate_scene 一致）
+        - chunk_size: 每批同时处理的场景数，用于限制中间数组的内存占用
+        - as_batch: 为 True 时返回 SceneBatch（扁平数组，不创建任何物体对象）
+        - dtype: as_batch 时散射点数组的数据类型
+        
+        返回：
+        - list[dict]: 每个元素与 generate_scene 返回的场景字典格式相同
+        - 或 SceneBatch（as_batch=True）
+        """
+        if self.barrier is None:
+            self._generate_fixed_layout()
+        
+        chunks = []
+        for start in range(0, n_scenes, chunk_size):
+            count = min(chunk_size, n_scenes - start)
+            placements = self._generate_batch_chunk(count, max_attempts)
+            if as_batch:
+                chunks.append(self._placements_to_batch(count, placements, dtype))
+            else:
+                chunks.extend(self._placements_to_scenes(count, placements))
+        
+        if as_batch:
+            # n_scenes 为 0 时没有任何分块，返回只含固定布局的空批量
+            result = (SceneBatch.concatenate(chunks) if chunks else
+                      SceneBatch.from_placements(0, [], [], [], [], [], self.barrier, self.lights, dtype=dtype))
+            types = result.object_type
+        else:
+            result = chunks
+            types = np.array([SceneBatch.VEHICLE] * sum(len(s['objects']['vehicles']) for s in chunks) +
+                             [SceneBatch.PEDESTRIAN] * sum(len(s['objects']['pedestrians']) for s in chunks))
+        
+        num_vehicles = int(np.sum(types == SceneBatch.VEHICLE))
+        num_pedestrians = int(np.sum(types == SceneBatch.PEDESTRIAN))
+        print(f"\n✓ 批量生成完成: {n_scenes} 个场景, 车辆 {num_vehicles} 辆, 行人 {num_pedestrians} 人")
+        
+        return result
+    
+    def _placements_to_batch(self, n_scenes, placements, dtype):
+        """将放置结果直接转换为 SceneBatch"""
+        scene, obj_type, x, y, direction, velocity = placements
+        position = np.column_stack([x, y, np.zeros_like(x)])
+        return SceneBatch.from_placements(n_scenes, scene, obj_type, position, np.radians(direction),
+                                          velocity, self.barrier, self.lights, dtype=dtype)
+    
+    def _placements_to_scenes(self, n_scenes, placements):
+        """按场景归组，只为放置成功的物体创建对象，组装场景字典"""
+        vehicles = [[] for _ in range(n_scenes)]
+        pedestrians = [[] for _ in range(n_scenes)]
+        for row, obj_type, xi, yi, di, vi in zip(*placements):
+            if obj_type == SceneBatch.VEHICLE:
+                vehicles[row].append(Vehicle(center=(xi, yi, 0), direction=di, velocity=vi))
+            else:
+                pedestrians[row].append(Pedestrian(center=(xi, yi, 0), direction=di, velocity=vi))
+        
+        return [self._assemble_scene(vehicles[i], pedestrians[i]) for i in range(n_scenes)]
+    
+    def _generate_batch_chunk(self, n_scenes, max_attempts):
+        """
+        为一批场景向量化地放置车辆和行人
+        
+        返回：
+        - tuple: (scene, type, x, y, direction, velocity)，按放置顺序排列的一维数组，
+          direction 为角度（度），x/y 为用户请求的中心
+        """
+        config = self.config
+        attempt_block = 10
+        
+        # 静止障碍物 [S, 3]: (x, y, radius)
+        static = np.array([(o['center'][0], o['center'][1], o['radius'])
+                           for o in self.static_obstacles]).reshape(-1, 3)
+        
+        num_vehicles = self._randint(*config.NUM_VEHICLES, size=n_scenes)
+        num_pedestrians = self._randint(*config.NUM_PEDESTRIANS, size=n_scenes)
+        max_objects = int(num_vehicles.max(initial=0) + num_pedestrians.max(initial=0))
+        
+        # 已放置物体 [n_scenes, max_objects]，未放置的槽位半径为 NaN（比较恒为 False）
+        placed_xy = np.zeros((n_scenes, max_objects, 2))
+        placed_r = np.full((n_scenes, max_objects), np.nan)
+        
+        specs = [
+            (SceneBatch.VEHICLE, Vehicle, num_vehicles, config.VEHICLE_RADIUS, np.arange(-20, 22, 2)),
+            (SceneBatch.PEDESTRIAN, Pedestrian, num_pedestrians, config.PEDESTRIAN_RADIUS, np.arange(-4, 6, 2)),
+        ]
+        
+        records = []
+        slot = 0
+        for obj_type, cls, counts, radius, speed_choices in specs:
+            # 散射点XY质心相对请求中心的偏移（方向只取0°/180°）
+            template_mean = cls.TEMPLATE[:, :2].mean(axis=0)
+            
+            for k in range(int(counts.max(initial=0))):
+                active = k < counts
+                
+                x = self.rng.uniform(config.SPACE_X_MIN + radius, config.SPACE_X_MAX - radius,
+                                      size=(n_scenes, max_attempts))
+                y = self.rng.uniform(config.SPACE_Y_MIN + radius, config.SPACE_Y_MAX - radius,
+                                      size=(n_scenes, max_attempts))
+                direction = self.rng.choice([0, 180], size=(n_scenes, max_attempts))
+                velocity = self.rng.choice(speed_choices, size=(n_scenes, max_attempts))
+                
+                # 实际中心 = 请求中心 + 旋转后的模板质心
+                sign = np.where(direction == 0, 1.0, -1.0)
+                cx = x + sign * template_mean[0]
+                cy = y + sign * template_mean[1]
+                
+                # 按尝试顺序分块检测，只对尚未找到可行位置的场景继续检测
+                first = np.full(n_scenes, -1)
+                pending = np.nonzero(active)[0]
+                for a0 in range(0, max_attempts, attempt_block):
+                    if pending.size == 0:
+                        break
+                    a1 = a0 + attempt_block
+                    free = self._batch_collision_free(
+                        cx[pending, a0:a1], cy[pending, a0:a1], radius, static,
+                        placed_xy[pending, :slot], placed_r[pending, :slot]
+                    )
+                    hit = free.any(axis=1)
+                    first[pending[hit]] = a0 + free[hit].argmax(axis=1)
+                    pending = pending[~hit]
+                
+                rows = np.nonzero(first >= 0)[0]
+                cols = first[rows]
+                placed_xy[rows, slot, 0] = cx[rows, cols]
+                placed_xy[rows, slot, 1] = cy[rows, cols]
+                placed_r[rows, slot] = radius
+                slot += 1
+                
+                records.append((rows, np.full(rows.shape, obj_type), x[rows, cols], y[rows, cols],
+                                direction[rows, cols], velocity[rows, cols]))
+        
+        if not records:
+            return tuple(np.empty(0) for _ in range(6))
+        return tuple(np.concatenate(column) for column in zip(*records))
+    
+    def _batch_collision_free(self, cx, cy, radius, static, placed_xy, placed_r):
+        """
+        向量化的圆形碰撞检测（与 _check_collision_free 判据相同）
+        
+        参数：
+        - cx, cy: 候选中心 [n_scenes, attempts]
+        - radius: 候选物体碰撞半径
+        - static: 静止障碍物 [S, 3]
+        - placed_xy: 已放置物体中心 [n_scenes, P, 2]
+        - placed_r: 已放置物体半径 [n_scenes, P]（NaN 表示空槽位）
+        
+        返回：
+        - ndarray[bool]: [n_scenes, attempts]，True=无碰撞
+        """
+        config = self.config
+        free = ((cx - radius >= config.SPACE_X_MIN) & (cx + radius <= config.SPACE_X_MAX) &
+                (cy - radius >= config.SPACE_Y_MIN) & (cy + radius <= config.SPACE_Y_MAX))
+        
+        if static.shape[0] > 0:
+            dist = np.hypot(cx[..., None] - static[:, 0], cy[..., None] - static[:, 1])
+            free &= ~(dist < radius + static[:, 2] + config.SAFETY_BUFFER).any(axis=-1)
+        
+        if placed_xy.shape[1] > 0:
+            dist = np.hypot(cx[..., None] - placed_xy[:, None, :, 0],
+                            cy[..., None] - placed_xy[:, None, :, 1])
+            min_dist = radius + placed_r[:, None, :] + config.SAFETY_BUFFER
+            free &= ~(dist < min_dist).any(axis=-1)
+        
+        return free
     
     def _collect_scatterers(self):
         """收集所有散射点"""
-        vehicle_scatterers = np.vstack([v['object'].get_scatterers() for v in self.vehicles]) if self.vehicles else np.empty((0, 4))
+        return self._assemble_scene([v['object'] for v in self.vehicles],
+                                    [p['object'] for p in self.pedestrians])
+    
+    def _assemble_scene(self, vehicles, pedestrians):
+        """根据车辆、行人对象和固定布局组装场景字典"""
+        vehicle_scatterers = np.vstack([v.get_scatterers() for v in vehicles]) if vehicles else np.empty((0, 4))
         barrier_scatterers = self.barrier.get_scatterers()
         light_scatterers = np.vstack([l.get_scatterers() for l in self.lights])
-        pedestrian_scatterers = np.vstack([p['object'].get_scatterers() for p in self.pedestrians]) if self.pedestrians else np.empty((0, 4))
+        pedestrian_scatterers = np.vstack([p.get_scatterers() for p in pedestrians]) if pedestrians else np.empty((0, 4))
         
         all_scatterers = np.vstack([
             vehicle_scatterers,
@@ -297,10 +546,10 @@ class MonteCarloSceneGenerator:
         
         return {
             'objects': {
-                'vehicles': [v['object'] for v in self.vehicles],
+                'vehicles': list(vehicles),
                 'barrier': self.barrier,
                 'lights': self.lights,
-                'pedestrians': [p['object'] for p in self.pedestrians]
+                'pedestrians': list(pedestrians)
             },
             'scatterers': {
                 'vehicles': vehicle_scatterers,
@@ -321,17 +570,21 @@ class MonteCarloSceneGenerator:
         print(f"  - 行人: {len(self.pedestrians)} 人")
 
 
-def visualize_scene(scene_data, save_path=None):
+def visualize_scene(scene_data, save_path=None, fig=None):
     """
     可视化场景（俯视图）
     
     参数：
     - scene_data: 场景数据
     - save_path: 保存路径（可选）
+    - fig: 可复用的 Figure（可选，清空后重绘，批量渲染时避免反复创建窗口）
     """
     scatterers = scene_data['scatterers']
     
-    fig = plt.figure(figsize=(14, 10))
+    if fig is None:
+        fig = plt.figure(figsize=(14, 10))
+    else:
+        fig.clf()
     ax = fig.add_subplot(111)
     
     # 绘制车辆（根据速度着色）- 只使用XY坐标
@@ -342,7 +595,7 @@ def visualize_scene(scene_data, save_path=None):
             c=vehicle_data[:, 3], s=80, marker='.', cmap='RdYlGn',
             vmin=0, vmax=20, label='Vehicles', alpha=0.8
         )
-        cbar = plt.colorbar(scatter_vehicle, ax=ax, pad=0.02, shrink=0.8)
+        cbar = fig.colorbar(scatter_vehicle, ax=ax, pad=0.02, shrink=0.8)
         cbar.set_label('Vehicle Velocity (m/s)', rotation=270, labelpad=20)
     
     # 绘制隔离带（绿色）- 只使用XY坐标
@@ -387,17 +640,148 @@ def visualize_scene(scene_data, save_path=None):
     # 添加图例
     ax.legend(loc='upper left', fontsize=10)
     
-    plt.tight_layout()
+    fig.tight_layout()
     
     if save_path:
         import os
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        plt.savefig(save_path, dpi=150, bbox_inches='tight')
+        fig.savefig(save_path, dpi=150, bbox_inches='tight')
         print(f"\n✓ 图片已保存: {save_path}")
     
     return fig, ax
 
 
+class SceneRenderer:
+    """
+    可复用的场景俯视图渲染器（与 visualize_scene 输出一致）
+
+    坐标轴、颜色条、刻度、标题与布局只在构造时建立一次；
+    每个场景只通过 set_offsets / set_array 更新各类散射点，并重建图例（图例颜色随场景数据变化）。
+    批量渲染时省去每个场景重建图形与 bbox_inches='tight' 的额外绘制。
+
+    与 visualize_scene 的区别：场景中没有车辆时仍保留颜色条。
+
+    用法：
+        renderer = SceneRenderer()
+        for scene_data in scenes:
+            renderer.save(scene_data, save_path)
+        renderer.close()
+    """
+
+    def __init__(self, fig=None):
+        """
+        参数：
+        - fig: 使用的 Figure（可选，默认新建；会被清空）
+        """
+        from matplotlib.ticker import MultipleLocator
+
+        if fig is None:
+            fig = plt.figure(figsize=(14, 10))
+        else:
+            fig.clf()
+        ax = fig.add_subplot(111)
+        empty = np.empty((0, 2))
+
+        # 各类散射点（绘制顺序与 visualize_scene 相同），数据在 render() 中填充
+        self.vehicles = ax.scatter(
+            empty[:, 0], empty[:, 1], c=empty[:, 0], s=80, marker='.', cmap='RdYlGn',
+            vmin=0, vmax=20, label='Vehicles', alpha=0.8
+        )
+        cbar = fig.colorbar(self.vehicles, ax=ax, pad=0.02, shrink=0.8)
+        cbar.set_label('Vehicle Velocity (m/s)', rotation=270, labelpad=20)
+        self.barrier = ax.scatter(
+            empty[:, 0], empty[:, 1], c='darkgreen', s=60, marker='.', alpha=0.7, label='Barrier'
+        )
+        self.lights = ax.scatter(
+            empty[:, 0], empty[:, 1], c='gold', s=150, marker='^', label='Street Lights',
+            edgecolors='orange', linewidths=1.5
+        )
+        self.pedestrians = ax.scatter(
+            empty[:, 0], empty[:, 1], c=empty[:, 0], s=80, marker='o', cmap='Blues',
+            vmin=0, vmax=3, label='Pedestrians', alpha=0.8, edgecolors='navy'
+        )
+
+        ax.set_xlim(0, 28)
+        ax.set_ylim(0, 28)
+        ax.set_xlabel('X (m)', fontsize=12, fontweight='bold')
+        ax.set_ylabel('Y (m)', fontsize=12, fontweight='bold')
+        ax.set_title('Monte Carlo Traffic Scene (Top View)', fontsize=14, fontweight='bold')
+        ax.set_aspect('equal', adjustable='box')
+        ax.xaxis.set_major_locator(MultipleLocator(5))
+        ax.yaxis.set_major_locator(MultipleLocator(5))
+        ax.grid(True, alpha=0.3, linestyle='--')
+
+        # 布局只取决于坐标轴、标题与颜色条，计算一次即可
+        fig.tight_layout()
+
+        self.fig = fig
+        self.ax = ax
+        self.cbar = cbar
+        self._tight_bboxes = {}
+
+    def render(self, scene_data):
+        """
+        把场景数据填入图中（不保存）
+
+        参数：
+        - scene_data: 场景数据（只使用 scene_data['scatterers']）
+
+        返回：
+        - fig, ax
+        """
+        scatterers = scene_data['scatterers']
+        handles = []
+        for collection, key, colored in ((self.vehicles, 'vehicles', True), (self.barrier, 'barrier', False),
+                                         (self.lights, 'lights', False), (self.pedestrians, 'pedestrians', True)):
+            data = scatterers[key]
+            collection.set_offsets(data[:, :2])
+            if colored:
+                collection.set_array(data[:, 3])
+                # 图例标记取第一个散射点的颜色，需在建图例前更新颜色映射
+                collection.update_scalarmappable()
+            # 与 visualize_scene 一致：没有车辆 / 行人时图例中不列出
+            if data.shape[0] > 0 or not colored:
+                handles.append(collection)
+        self.ax.legend(handles=handles, loc='upper left', fontsize=10)
+        return self.fig, self.ax
+
+    def tight_bbox(self, dpi=150):
+        """
+        savefig(bbox_inches='tight') 的裁剪范围（英寸）
+
+        图例与散射点都在坐标轴内，裁剪范围与场景无关，每个 dpi 只计算一次，
+        之后保存时不再需要 'tight' 额外的一次绘制。
+        """
+        bbox = self._tight_bboxes.get(dpi)
+        if bbox is None:
+            original_dpi = self.fig.dpi
+            self.fig.dpi = dpi
+            try:
+                self.fig.draw_without_rendering()
+                bbox = self.fig.get_tightbbox(self.fig.canvas.get_renderer())
+            finally:
+                self.fig.dpi = original_dpi
+            bbox = self._tight_bboxes[dpi] = bbox.padded(plt.rcParams['savefig.pad_inches'])
+        return bbox
+
+    def save(self, scene_data, save_path, dpi=150, tight=True):
+        """
+        渲染场景并保存图片
+
+        参数：
+        - scene_data: 场景数据
+        - save_path: 保存路径
+        - dpi: 分辨率
+        - tight: 是否按 bbox_inches='tight' 裁剪白边（缩略图可设为 False）
+        """
+        self.render(scene_data)
+        self.fig.savefig(save_path, dpi=dpi, bbox_inches=self.tight_bbox(dpi) if tight else None)
+
+    def close(self):
+        """关闭 Figure"""
+        plt.close(self.fig)
+
+
 def main():
     """主函数"""
     # 创建生成器
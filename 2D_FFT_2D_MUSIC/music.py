@@ -0,0 +1,379 @@
+"""
+2D MUSIC 角度估计（Python 版 func_2d_music_angle_estimation.m）
+- 方位 / 俯仰导向矢量库按 (K_sub, d, lambda, 搜索网格) 缓存，只计算一次
+- 一个场景的所有 RD 目标一次完成协方差构建、空间平滑与特征分解
+- 伪谱 1/|a^H En|^2 对整个搜索网格以矩阵乘法一次求出
+- 可选分层搜索：按粗网格块的伪谱上界由高到低精搜，跳过不可能含检测点的块，结果与全网格一致
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from cfar import ca_cfar, ca_cfar_cells, ca_cfar_support, wca_cfar_1d
+from radar_echo import steering_phases
+
+
+def default_music_params(**overrides):
+    """
+    返回与 main_modular_ofdm_isac.m 一致的 MUSIC 参数字典
+
+    返回：
+    - dict: space, theta_head_offset, theta_back_offset, faii_head_offset, faii_back_offset
+    """
+    params = {
+        'space': 0.1,               # 搜索粒度（度）
+        'theta_head_offset': 60,
+        'theta_back_offset': 60,
+        'faii_head_offset': 60,
+        'faii_back_offset': 90,
+    }
+    params.update(overrides)
+    return params
+
+
+def _angle_list(space, head_offset, back_offset):
+    """MATLAB 中 space + head : space : 180 - back 的角度列表（度）"""
+    start = space + head_offset
+    count = int(np.floor((180 - back_offset - start) / space + 1e-9)) + 1
+    return start + space * np.arange(max(count, 0))
+
+
+def search_grid(music_params):
+    """
+    MUSIC 搜索网格
+
+    返回：
+    - theta_list: 方位角列表（度）
+    - faii_list: 俯仰角列表（度）
+    """
+    theta_list = _angle_list(music_params['space'], music_params['theta_head_offset'],
+                             music_params['theta_back_offset'])
+    faii_list = _angle_list(music_params['space'], music_params['faii_head_offset'],
+                            music_params['faii_back_offset'])
+    return theta_list, faii_list
+
+
+@lru_cache(maxsize=16)
+def _steering_phase_grid(d, lam, space, theta_head, theta_back, faii_head, faii_back):
+    theta_list = _angle_list(space, theta_head, theta_back)
+    faii_list = _angle_list(space, faii_head, faii_back)
+    theta_grid, faii_grid = np.meshgrid(np.radians(theta_list), np.radians(faii_list), indexing='ij')
+    phase_x, phase_y = steering_phases(theta_grid, faii_grid, d, lam)
+    phase_x.flags.writeable = False
+    phase_y.flags.writeable = False
+    return phase_x, phase_y
+
+
+@lru_cache(maxsize=16)
+def _steering_bank(K_sub, d, lam, space, theta_head, theta_back, faii_head, faii_back):
+    phase_x, phase_y = _steering_phase_grid(d, lam, space, theta_head, theta_back, faii_head, faii_back)
+
+    # W_search 的第一列（方位）与第一行（俯仰），预先取共轭以便直接右乘 En
+    index = np.arange(K_sub)
+    bank_azimuth = np.exp(-1j * phase_x.reshape(-1, 1) * index)
+    bank_pitch = np.exp(-1j * phase_y.reshape(-1, 1) * index)
+    bank_azimuth.flags.writeable = False
+    bank_pitch.flags.writeable = False
+    return bank_azimuth, bank_pitch, phase_x.shape
+
+
+def steering_bank(radar_params, music_params):
+    """
+    搜索网格上的共轭导向矢量库（按参数缓存，只读）
+
+    返回：
+    - bank_azimuth: [G, K_sub] 方位导向矢量的共轭（G = len(theta_list) * len(faii_list)）
+    - bank_pitch: [G, K_sub] 俯仰导向矢量的共轭
+    - grid_shape: (len(theta_list), len(faii_list))
+    """
+    return _steering_bank(int(radar_params['K_sub']), float(radar_params['d']),
+                          float(radar_params['lambda']), float(music_params['space']),
+                          float(music_params['theta_head_offset']), float(music_params['theta_back_offset']),
+                          float(music_params['faii_head_offset']), float(music_params['faii_back_offset']))
+
+
+def steering_phase_grid(radar_params, music_params):
+    """
+    搜索网格上 x / y 方向相邻阵元的相位差（按参数缓存，只读）
+
+    返回：
+    - phase_x, phase_y: [len(theta_list), len(faii_list)]（弧度）
+    """
+    return _steering_phase_grid(float(radar_params['d']), float(radar_params['lambda']),
+                                float(music_params['space']),
+                                float(music_params['theta_head_offset']), float(music_params['theta_back_offset']),
+                                float(music_params['faii_head_offset']), float(music_params['faii_back_offset']))
+
+
+def smooth_covariance(covariance, K_sub):
+    """
+    空间平滑协方差（与 smooth_covariance.m 一致），支持批量 [..., M, M]
+
+    返回：
+    - ndarray: [..., K_sub, K_sub]
+    """
+    num_sub = covariance.shape[-1] - K_sub + 1
+    smoothed = covariance[..., :K_sub, :K_sub].copy()
+    for i in range(1, num_sub):
+        smoothed += covariance[..., i:i + K_sub, i:i + K_sub]
+    return smoothed / num_sub
+
+
+def noise_subspace(snapshots, K_sub):
+    """
+    由单快拍向量批量求噪声子空间
+
+    参数：
+    - snapshots: [T, L] 每个目标的阵列快拍（W 的第一列或第一行）
+    - K_sub: 子阵元数目
+
+    返回：
+    - En: [T, K_sub, K_sub] 噪声子空间，信号子空间对应的列已置零
+    - signal_num: [T] WCA-CFAR 估计的信号子空间维数
+    """
+    covariance = snapshots[:, :, None] * snapshots[:, None, :].conj()
+    eigenvalues, eigenvectors = np.linalg.eigh(smooth_covariance(covariance, K_sub))
+    signal_num = np.atleast_1d(wca_cfar_1d(eigenvalues))
+
+    # eigh 按特征值升序排列，前 K_sub - signal_num 列为噪声子空间
+    noise_mask = np.arange(K_sub)[None, :] < (K_sub - signal_num)[:, None]
+    return eigenvectors * noise_mask[:, None, :], signal_num
+
+
+def music_pseudo_spectrum(bank, En, chunk_elements=1 << 22):
+    """
+    伪谱 1 / |a^H En|^2，对所有目标与网格点批量计算
+
+    参数：
+    - bank: [G, K] 共轭导向矢量库
+    - En: [T, K, K] 噪声子空间（无效列为零）
+    - chunk_elements: 单次矩阵乘法的最大中间元素数，用于限制内存
+
+    返回：
+    - ndarray: [T, G]
+    """
+    num_targets, num_grid = En.shape[0], bank.shape[0]
+    spectrum = np.empty((num_targets, num_grid))
+    step = max(1, chunk_elements // (num_grid * En.shape[-1]))
+    for start in range(0, num_targets, step):
+        # |a^H En|^2：以实部/虚部交错的实数视图求平方和
+        projection = (bank @ En[start:start + step]).view(np.float64)
+        spectrum[start:start + step] = 1.0 / np.einsum('tgk,tgk->tg', projection, projection)
+    return spectrum
+
+
+def _target_noise_subspaces(Velocity_fft, RD_target_index, K_sub):
+    """角度测量矩阵 [T, M, N] 的第一列（方位）与第一行（俯仰）对应的噪声子空间"""
+    Angle_matrix = Velocity_fft[RD_target_index[:, 0], RD_target_index[:, 1]]
+    En_azimuth, _ = noise_subspace(Angle_matrix[:, :, 0], K_sub)
+    En_pitch, _ = noise_subspace(Angle_matrix[:, 0, :], K_sub)
+    return En_azimuth, En_pitch
+
+
+def music_angle_estimation(Velocity_fft, RD_target_index, radar_params, music_params=None):
+    """
+    2D MUSIC 角度估计 + CA-CFAR 检测
+
+    参数：
+    - Velocity_fft: 速度-距离 FFT 结果 [symbols_per_carrier, IFFT_length, M, N]
+    - RD_target_index: RD 域目标索引 [T, 2]（0 起始）
+    - radar_params: 雷达参数字典（M, N, lambda, d, K_sub）
+    - music_params: MUSIC 参数字典（默认 default_music_params()）
+
+    返回：
+    - Angle_music_matrix: MUSIC 谱 [T, len(theta_list), len(faii_list)]
+    - Angle_music_threshold_matrix: CA-CFAR 门限 [T, len(theta_list), len(faii_list)]
+    - Angle_music_abs_matrix: CA-CFAR 检测矩阵 [T, len(theta_list), len(faii_list)]
+    - A2_Angle_target_cell: 每个目标检测到的角度索引列表（0 起始 [K, 2]）
+    """
+    if music_params is None:
+        music_params = default_music_params()
+    K_sub = radar_params['K_sub']
+    RD_target_index = np.asarray(RD_target_index, dtype=int).reshape(-1, 2)
+
+    bank_azimuth, bank_pitch, grid_shape = steering_bank(radar_params, music_params)
+    En_azimuth, En_pitch = _target_noise_subspaces(Velocity_fft, RD_target_index, K_sub)
+
+    Angle_music_matrix = music_pseudo_spectrum(bank_azimuth, En_azimuth)
+    Angle_music_matrix *= music_pseudo_spectrum(bank_pitch, En_pitch)
+    Angle_music_matrix = Angle_music_matrix.reshape((-1,) + grid_shape)
+
+    Angle_music_threshold_matrix = np.empty_like(Angle_music_matrix)
+    Angle_music_abs_matrix = np.empty_like(Angle_music_matrix)
+    A2_Angle_target_cell = []
+    for i in range(Angle_music_matrix.shape[0]):
+        threshold_matrix, target_index, detect_matrix_abs = ca_cfar(Angle_music_matrix[i])
+        Angle_music_threshold_matrix[i] = threshold_matrix
+        Angle_music_abs_matrix[i] = detect_matrix_abs
+        A2_Angle_target_cell.append(target_index)
+
+    return Angle_music_matrix, Angle_music_threshold_matrix, Angle_music_abs_matrix, A2_Angle_target_cell
+
+
+def noise_polynomial(En):
+    """
+    噪声子空间投影 |a^H En|^2 关于相邻阵元相位差 psi 的三角多项式系数
+
+    a = exp(1j * psi * k) 时 |a^H En|^2 = sum_m c_m * exp(-1j * m * psi)，c_m 为 En En^H 第 -m 条对角线之和。
+
+    参数：
+    - En: [T, K, K] 噪声子空间
+
+    返回：
+    - ndarray: [T, 2K-1] 系数，依次对应 m = -(K-1) ... K-1
+    """
+    K = En.shape[-1]
+    projector = En @ np.conj(np.swapaxes(En, -1, -2))
+    return np.stack([np.trace(projector, offset=-m, axis1=-2, axis2=-1) for m in range(-(K - 1), K)], axis=-1)
+
+
+def _projection_lower_bound(coefficients, phase_low, phase_high, samples):
+    """
+    |a^H En|^2 在各相位区间 [phase_low, phase_high] 上的下界
+
+    用 FFT 在 samples 个均匀相位点上求值；区间内任一相位与区间两侧之间的某个采样点相距不超过半个步长，
+    再扣除导数上界 sum |m c_m| 在半个步长内的变化量（另留浮点舍入余量）。
+    """
+    K = (coefficients.shape[-1] + 1) // 2
+    order = np.arange(-(K - 1), K)
+    padded = np.zeros(samples, dtype=complex)
+    padded[order % samples] = coefficients
+    values = np.fft.fft(padded).real
+
+    step = 2 * np.pi / samples
+    slack = np.sum(np.abs(order * coefficients)) * step / 2 + 1e-12 * np.sum(np.abs(coefficients))
+    first = np.floor(phase_low / step).astype(int).ravel()
+    last = np.ceil(phase_high / step).astype(int).ravel()
+    extended = values[np.arange(first.min(), last.max() + 2) % samples]
+    index = np.empty(2 * first.size, dtype=int)
+    index[0::2] = first - first.min()
+    index[1::2] = last - first.min() + 1
+    minimum = np.minimum.reduceat(extended, index)[0::2]
+    return np.maximum(minimum - slack, 0).reshape(np.shape(phase_low))
+
+
+def _block_reduce(values, block, ufunc):
+    """二维数组按 block × block 分块归约（末尾不足一块的部分单独成块）"""
+    for axis in range(2):
+        values = ufunc.reduceat(values, np.arange(0, values.shape[axis], block), axis=axis)
+    return values
+
+
+def music_angle_estimation_hierarchical(Velocity_fft, RD_target_index, radar_params, music_params=None,
+                                        coarse_factor=5, num_peaks=4, point_richness=4, bound_samples=1 << 16,
+                                        cfar_window_size=9, threshold_adjust=500):
+    """
+    分层 2D MUSIC 角度估计（结果与全网格 music_angle_estimation 一致）
+
+    伪谱 = 1/|a_x^H En_x|^2 * 1/|a_y^H En_y|^2，每个因子只依赖一个相位差 psi，分母是 psi 的三角多项式。
+    先把细网格划分为 coarse_factor × coarse_factor 的块，由块内相位范围求出每块伪谱的上界；
+    再按上界由高到低分批精搜（计算块内及其 CA-CFAR 参考窗口内的细网格伪谱并做 CA-CFAR），
+    直到剩余块的上界低于当前第 point_richness 个检测点的伪谱值（检测点不足时为门限下限 threshold_adjust）。
+    被跳过的块既不可能超过 CFAR 门限也不可能进入前 point_richness 个，因此检测结果与全网格相同
+    （仅在伪谱值相差一个浮点舍入量的并列处可能不同）。
+    MUSIC 峰在 0.1° 网格上常只有一个单元宽，粗网格采样找峰无法保证不漏峰，因此不采用先找峰再精搜的方式。
+
+    参数：
+    - Velocity_fft, RD_target_index, radar_params, music_params: 同 music_angle_estimation
+    - coarse_factor: 块边长（细网格单元数）
+    - num_peaks: 首批精搜的块数（用于确定截止值）
+    - point_richness: 每个目标最多返回的角度数（与 CA_CFAR 一致），None 表示不限制
+    - bound_samples: 求上界时相位采样点数（越大上界越紧、跳过的块越多）
+    - cfar_window_size, threshold_adjust: CA-CFAR 参数（与 ca_cfar 一致）
+
+    返回：
+    - A2_Angle_target_cell: 每个目标检测到的细网格角度索引列表（0 起始 [K, 2]）
+    - Angle_music_bound_matrix: 每块伪谱上界 [T, ceil(len(theta_list)/coarse_factor), ceil(len(faii_list)/coarse_factor)]
+    - evaluated_fraction: 每个目标实际计算伪谱的细网格比例 [T]
+    """
+    if music_params is None:
+        music_params = default_music_params()
+    K_sub = radar_params['K_sub']
+    RD_target_index = np.asarray(RD_target_index, dtype=int).reshape(-1, 2)
+
+    bank_azimuth, bank_pitch, grid_shape = steering_bank(radar_params, music_params)
+    phase_x, phase_y = steering_phase_grid(radar_params, music_params)
+    phase_ranges = [(_block_reduce(phase, coarse_factor, np.minimum), _block_reduce(phase, coarse_factor, np.maximum))
+                    for phase in (phase_x, phase_y)]
+    En_azimuth, En_pitch = _target_noise_subspaces(Velocity_fft, RD_target_index, K_sub)
+    coefficients_azimuth, coefficients_pitch = noise_polynomial(En_azimuth), noise_polynomial(En_pitch)
+
+    num_targets = len(RD_target_index)
+    Angle_music_bound_matrix = np.empty((num_targets,) + phase_ranges[0][0].shape)
+    evaluated_fraction = np.empty(num_targets)
+    A2_Angle_target_cell = []
+    for t in range(num_targets):
+        denominator = (_projection_lower_bound(coefficients_azimuth[t], *phase_ranges[0], bound_samples)
+                       * _projection_lower_bound(coefficients_pitch[t], *phase_ranges[1], bound_samples))
+        with np.errstate(divide='ignore'):
+            bound = 1.0 / denominator
+        Angle_music_bound_matrix[t] = bound
+
+        order = np.argsort(-bound, axis=None, kind='stable')
+        searched = np.zeros(bound.shape, dtype=bool)
+        evaluated = np.zeros(grid_shape, dtype=bool)
+        spectrum = np.zeros(grid_shape)
+        cells = np.empty((0, 2), dtype=np.int64)
+        cutoff, done, batch = threshold_adjust, 0, max(num_peaks, 1)
+        while done < order.size and bound.flat[order[done]] >= cutoff:
+            chosen = order[done:done + batch]
+            searched.flat[chosen[bound.flat[chosen] >= cutoff]] = True
+            # 首批只精搜上界最高的 num_peaks 块以确定截止值，之后一次精搜上界不低于截止值的全部块
+            done, batch = done + batch, order.size
+
+            # 块内单元的 CFAR 判决只依赖其参考窗口，窗口内的伪谱全部算出后判决与全网格一致
+            exact = np.repeat(np.repeat(searched, coarse_factor, axis=0), coarse_factor, axis=1)
+            exact = exact[:grid_shape[0], :grid_shape[1]]
+            pending = np.flatnonzero(ca_cfar_support(exact, cfar_window_size) & ~evaluated)
+            spectrum.flat[pending] = (music_pseudo_spectrum(bank_azimuth[pending], En_azimuth[t:t + 1])[0]
+                                      * music_pseudo_spectrum(bank_pitch[pending], En_pitch[t:t + 1])[0])
+            evaluated.flat[pending] = True
+
+            # 门限不低于 threshold_adjust，只需判决伪谱值超过它的单元
+            target_index = np.argwhere(exact & (spectrum > threshold_adjust))
+            _, detected = ca_cfar_cells(spectrum, target_index, window_size=cfar_window_size,
+                                        threshold_adjust=threshold_adjust)
+            cells = target_index[detected]
+            if point_richness is not None:
+                # 与 CA_CFAR 一致：按伪谱值降序保留 point_richness 个（同值按行优先顺序）
+                values = spectrum[cells[:, 0], cells[:, 1]]
+                keep = np.argsort(-values, kind='stable')[:point_richness]
+                cells = cells[keep]
+                if len(keep) == point_richness:
+                    cutoff = max(threshold_adjust, values[keep[-1]])
+
+        A2_Angle_target_cell.append(cells)
+        evaluated_fraction[t] = evaluated.mean()
+
+    return A2_Angle_target_cell, Angle_music_bound_matrix, evaluated_fraction
+
+
+def angle_peak_error(reference_cell, test_cell, music_params):
+    """
+    两组角度检测结果之间的最大偏差（度），用于检验分层搜索与全网格搜索的一致性
+
+    对每个 RD 目标，取两组检测角度之间的对称 Hausdorff 距离；
+    两组均为空时为 0，仅一组为空时为 inf。
+
+    参数：
+    - reference_cell: 参考检测结果（如全网格 music_angle_estimation 的 A2_Angle_target_cell）
+    - test_cell: 待检验的检测结果
+    - music_params: MUSIC 参数字典
+
+    返回：
+    - ndarray: 每个 RD 目标的最大偏差 [T]
+    """
+    theta_list, faii_list = search_grid(music_params)
+    errors = np.zeros(len(reference_cell))
+    for i, (reference, test) in enumerate(zip(reference_cell, test_cell)):
+        if len(reference) == 0 and len(test) == 0:
+            continue
+        if len(reference) == 0 or len(test) == 0:
+            errors[i] = np.inf
+            continue
+        reference_angles = np.column_stack([theta_list[reference[:, 0]], faii_list[reference[:, 1]]])
+        test_angles = np.column_stack([theta_list[test[:, 0]], faii_list[test[:, 1]]])
+        distance = np.sqrt(np.sum((reference_angles[:, None, :] - test_angles[None, :, :])**2, axis=-1))
+        errors[i] = max(distance.min(axis=1).max(), distance.min(axis=0).max())
+    return errors
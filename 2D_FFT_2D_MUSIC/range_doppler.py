@@ -0,0 +1,127 @@
+"""
+Range-Doppler 处理（Python 版 func_range_doppler_processing.m 的 FFT 部分）
+- 所有天线页一次性批量处理：除以发送符号 -> 子载波维 IFFT -> 符号维 FFT + fftshift
+- 发送符号的倒数与 fftshift 调制因子预先合并，多场景 / 多 SNR 复用
+- 使用 scipy.fft（内部缓存 FFT plan），支持多线程 workers
+"""
+
+import numpy as np
+import scipy.fft
+
+from cfar import osca_cfar_snr
+
+
+class RangeDopplerProcessor:
+    """
+    批量 Range-Doppler FFT 处理器
+
+    同一组 OFDM 发送符号（complex_carrier_matrix）下处理多个场景时，
+    只需创建一次处理器，预计算的参考矩阵与 scipy.fft 的 plan 缓存均可复用。
+    """
+
+    def __init__(self, complex_carrier_matrix, radar_params, workers=None):
+        """
+        参数：
+        - complex_carrier_matrix: 原始发送调制符号 [symbols_per_carrier, IFFT_length]
+        - radar_params: 雷达参数字典（见 radar_echo.default_radar_params）
+        - workers: FFT 线程数（None 为单线程，-1 为使用全部 CPU 核）
+        """
+        self.radar_params = radar_params
+        self.workers = workers
+        self.symbols = radar_params['symbols_per_carrier']
+        self.ifft_length = radar_params['IFFT_length']
+
+        carrier = np.asarray(complex_carrier_matrix)
+        if carrier.shape != (self.symbols, self.ifft_length):
+            raise ValueError(f"发送符号矩阵形状 {carrier.shape} 与雷达参数不一致")
+
+        # 符号数为偶数时，fftshift 等价于输入乘以 (-1)^s，直接并入参考矩阵
+        self._shift_in_reference = self.symbols % 2 == 0
+        reference = 1.0 / carrier
+        if self._shift_in_reference:
+            reference = reference * np.where(np.arange(self.symbols) % 2, -1.0, 1.0)[:, None]
+        self._reference = {np.dtype(np.complex128): reference.astype(np.complex128)}
+
+    def _reference_for(self, dtype):
+        dtype = np.dtype(dtype)
+        if dtype not in self._reference:
+            self._reference[dtype] = self._reference[np.dtype(np.complex128)].astype(dtype)
+        return self._reference[dtype]
+
+    def process(self, echo, out=None, overwrite=False, scale=None):
+        """
+        对所有天线的回波做 Range-Doppler FFT
+
+        参数：
+        - echo: 多天线回波 [symbols_per_carrier, IFFT_length, M, N]（或 [S, K, ...] 任意尾部维度）
+        - out: 可选的预分配输出数组（形状同 echo，复数类型）
+        - overwrite: 为 True 且 out 为空时直接在 echo 上原地计算（echo 内容会被覆盖）
+        - scale: 可选的 [symbols_per_carrier, IFFT_length] 逐元素因子，与参考矩阵合并后一次相乘
+                 （如对无噪声几何回波乘以含噪接收信号）
+
+        返回：
+        - Velocity_fft: 速度-距离 FFT 结果，形状同 echo
+        """
+        echo = np.asarray(echo)
+        if echo.shape[:2] != (self.symbols, self.ifft_length):
+            raise ValueError(f"回波形状 {echo.shape} 与雷达参数不一致")
+
+        dtype = echo.dtype if np.iscomplexobj(echo) else np.result_type(echo.dtype, np.complex64)
+        if out is None:
+            out = echo if overwrite and np.iscomplexobj(echo) else np.empty(echo.shape, dtype=dtype)
+
+        reference = self._reference_for(out.dtype)
+        if scale is not None:
+            reference = (reference * scale).astype(out.dtype, copy=False)
+        reference = reference.reshape((self.symbols, self.ifft_length) + (1,) * (echo.ndim - 2))
+        np.multiply(echo, reference, out=out)
+
+        # overwrite_x 时 pocketfft 直接在 out 的内存上计算，只有非原地时才需要回写
+        spectrum = scipy.fft.ifft(out, axis=1, overwrite_x=True, workers=self.workers)
+        spectrum = scipy.fft.fft(spectrum, axis=0, overwrite_x=True, workers=self.workers)
+        if not self._shift_in_reference:
+            spectrum = np.fft.fftshift(spectrum, axes=0)
+        if not (spectrum.ctypes.data == out.ctypes.data and spectrum.strides == out.strides):
+            out[...] = spectrum
+        return out
+
+
+def range_doppler_fft(echo, complex_carrier_matrix, radar_params, workers=None, out=None):
+    """
+    单次调用的 Range-Doppler FFT（等价于 MATLAB 中逐天线循环的 FFT 部分）
+
+    参数：
+    - echo: 多天线回波 [symbols_per_carrier, IFFT_length, M, N]
+    - complex_carrier_matrix: 原始发送调制符号 [symbols_per_carrier, IFFT_length]
+    - radar_params: 雷达参数字典
+    - workers: FFT 线程数
+    - out: 可选的预分配输出数组
+
+    返回：
+    - Velocity_fft: [symbols_per_carrier, IFFT_length, M, N]
+    """
+    return RangeDopplerProcessor(complex_carrier_matrix, radar_params, workers=workers).process(echo, out=out)
+
+
+def range_doppler_processing(echo, complex_carrier_matrix, radar_params, snr_db=np.inf, workers=None,
+                             processor=None):
+    """
+    Range-Doppler FFT 与 OSCA-CFAR 检测（与 func_range_doppler_processing.m 一致，不含可视化）
+
+    参数：
+    - echo: 多天线回波 [symbols_per_carrier, IFFT_length, M, N]
+    - complex_carrier_matrix: 原始发送调制符号
+    - radar_params: 雷达参数字典
+    - snr_db: 信噪比（dB），用于选择 CFAR 参数
+    - workers: FFT 线程数
+    - processor: 可复用的 RangeDopplerProcessor（给定时忽略 complex_carrier_matrix 与 workers）
+
+    返回：
+    - Velocity_fft: [symbols_per_carrier, IFFT_length, M, N]
+    - RD_threshold_matrix, RD_target_index（0 起始）, RD_detect_matrix_abs: 天线 (1,1) 的 CFAR 结果
+    """
+    if processor is None:
+        processor = RangeDopplerProcessor(complex_carrier_matrix, radar_params, workers=workers)
+    Velocity_fft = processor.process(echo)
+    RD_threshold_matrix, RD_target_index, RD_detect_matrix_abs = osca_cfar_snr(Velocity_fft[:, :, 0, 0], snr_db)
+    return Velocity_fft, RD_threshold_matrix, RD_target_index, RD_detect_matrix_abs
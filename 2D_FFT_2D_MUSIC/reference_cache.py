@@ -0,0 +1,245 @@
+"""
+OFDM 参考信号共享缓存
+- 发送符号、complex_carrier_matrix 与参数只发布一次，所有 SNR / 场景 worker 零拷贝挂载
+- 两种后端：
+  * 'shm': multiprocessing.shared_memory，由主进程持有并在结束时释放
+  * 'npy': 目录下的 .npy 文件 + manifest.json，以原子重命名发布，多个独立进程并发启动也只有一份生效
+- 替代 MATLAB 流程中 "检查 ofdm_signal_data.mat 是否存在 -> 生成并保存" 的竞争写入
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+from multiprocessing import shared_memory
+
+import numpy as np
+import scipy.io as sio
+
+
+MANIFEST_NAME = 'manifest.json'
+_ALIGNMENT = 64
+
+# worker 进程内挂载的参考信号（由 init_worker_reference 设置）
+_WORKER_REFERENCE = None
+
+
+def qam4(bits):
+    """
+    4QAM 调制（与 qam4.m 的映射一致：00→-1+1j, 01→1+1j, 10→-1-1j, 11→1-1j）
+
+    参数：
+    - bits: 比特序列（长度为偶数）
+
+    返回：
+    - ndarray: 复数符号序列
+    """
+    bits = np.asarray(bits, dtype=np.int8).reshape(-1, 2)
+    return np.where(bits[:, 1] == 1, 1.0, -1.0) + 1j * np.where(bits[:, 0] == 1, -1.0, 1.0)
+
+
+def random_reference_signal(radar_params, seed=None):
+    """
+    生成随机 4QAM 参考信号（不含 m 序列 / gold 序列结构，仅用于雷达处理）
+
+    参数：
+    - radar_params: 雷达参数字典（symbols_per_carrier, IFFT_length）
+    - seed: 随机种子
+
+    返回：
+    - arrays: dict - baseband_out, complex_carrier_matrix
+    """
+    symbols, ifft_length = radar_params['symbols_per_carrier'], radar_params['IFFT_length']
+    rng = np.random.default_rng(seed)
+    baseband_out = rng.integers(0, 2, size=symbols * ifft_length * 2, dtype=np.int8)
+    complex_carrier_matrix = qam4(baseband_out).reshape(symbols, ifft_length)
+    return {'baseband_out': baseband_out, 'complex_carrier_matrix': complex_carrier_matrix}
+
+
+def _plain(value):
+    """把 numpy 标量 / 数组 / MATLAB 结构转换为可 JSON 序列化的 Python 对象"""
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, np.ndarray):
+        if value.dtype.names:
+            return {name: _plain(value[name]) for name in value.dtype.names}
+        return _plain(value.item()) if value.size == 1 else value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def load_ofdm_signal_mat(mat_path):
+    """
+    读取 MATLAB 流程保存的 ofdm_signal_data.mat
+
+    返回：
+    - arrays: dict - windowed_Tx_data, baseband_out, complex_carrier_matrix（存在的项）
+    - params: dict - ofdm_params / radar_params / music_params / base_pos（存在的项）
+    """
+    data = sio.loadmat(mat_path, squeeze_me=True)
+    arrays = {key: np.asarray(data[key]) for key in ('windowed_Tx_data', 'baseband_out', 'complex_carrier_matrix')
+              if key in data}
+    params = {key: _plain(data[key]) for key in ('ofdm_params', 'radar_params', 'music_params', 'base_pos')
+              if key in data}
+    return arrays, params
+
+
+class SharedReference:
+    """
+    发布到共享内存的参考信号（主进程持有）
+
+    所有数组拷贝进同一块 SharedMemory，handle 只包含名称、布局与参数，可廉价地 pickle 给 worker。
+    使用完毕后调用 close()（或使用 with 语句）释放共享内存。
+    """
+
+    def __init__(self, arrays, params=None):
+        """
+        参数：
+        - arrays: dict - 名称 -> ndarray
+        - params: 参数字典（需可 JSON 序列化，例如 radar_params）
+        """
+        layout, offset = {}, 0
+        for key, array in arrays.items():
+            array = np.asarray(array)
+            offset = -(-offset // _ALIGNMENT) * _ALIGNMENT
+            layout[key] = (offset, array.shape, array.dtype.str)
+            offset += array.nbytes
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for key, array in arrays.items():
+            start, shape, dtype = layout[key]
+            np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=start)[...] = array
+
+        self.handle = {'backend': 'shm', 'name': self._shm.name, 'layout': layout, 'params': _plain(params or {})}
+
+    def close(self):
+        """释放共享内存（worker 已挂载的视图在其进程退出前仍然有效）"""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def publish_npy(directory, arrays, params=None):
+    """
+    以 .npy 目录形式原子发布参考信号
+
+    先写入同级临时目录，再重命名为 directory。若其他进程已先完成发布，
+    则丢弃本进程的结果并使用已有数据，保证所有进程看到同一份参考信号。
+
+    参数：
+    - directory: 发布目录
+    - arrays: dict - 名称 -> ndarray
+    - params: 参数字典
+
+    返回：
+    - handle: 可传给 attach() 的描述字典
+    """
+    directory = os.path.abspath(directory)
+    if os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+        return _npy_handle(directory)
+
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.' + os.path.basename(directory) + '-', dir=parent)
+    try:
+        for key, array in arrays.items():
+            np.save(os.path.join(staging, key + '.npy'), np.asarray(array))
+        with open(os.path.join(staging, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump({'keys': list(arrays), 'params': _plain(params or {})}, f, ensure_ascii=False, indent=2)
+        os.rename(staging, directory)
+    except OSError:
+        # 目标目录已被其他进程发布（非空），使用已有结果
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+            raise
+    return _npy_handle(directory)
+
+
+def get_or_publish_npy(directory, factory):
+    """
+    若 directory 中已有参考信号则直接返回其 handle，否则调用 factory() 生成并发布
+
+    参数：
+    - directory: 发布目录
+    - factory: 无参函数，返回 (arrays, params)
+
+    返回：
+    - handle
+    """
+    if os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+        return _npy_handle(os.path.abspath(directory))
+    arrays, params = factory()
+    return publish_npy(directory, arrays, params)
+
+
+def _npy_handle(directory):
+    with open(os.path.join(directory, MANIFEST_NAME), encoding='utf-8') as f:
+        manifest = json.load(f)
+    return {'backend': 'npy', 'directory': directory, 'keys': manifest['keys'], 'params': manifest['params']}
+
+
+class ReferenceSignals(dict):
+    """挂载后的参考信号：只读数组视图（dict），参数见 .params"""
+
+    def __init__(self, arrays, params, shm=None):
+        super().__init__(arrays)
+        self.params = params
+        self._shm = shm          # 保持共享内存映射存活
+
+    def close(self):
+        """解除挂载（不释放共享内存本身）"""
+        self.clear()
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+
+def attach(handle):
+    """
+    挂载已发布的参考信号（零拷贝，只读）
+
+    参数：
+    - handle: SharedReference.handle 或 publish_npy / get_or_publish_npy 的返回值
+
+    返回：
+    - ReferenceSignals
+    """
+    if handle['backend'] == 'npy':
+        arrays = {key: np.load(os.path.join(handle['directory'], key + '.npy'), mmap_mode='r')
+                  for key in handle['keys']}
+        return ReferenceSignals(arrays, handle['params'])
+
+    # 只有发布者负责释放共享内存。Python 3.13 以下挂载时会向 resource_tracker 重复登记，
+    # Pool worker 与发布者共用同一个 tracker，因此无影响；与发布者无父子关系的独立进程请使用 'npy' 后端
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=handle['name'], track=False)
+    else:
+        shm = shared_memory.SharedMemory(name=handle['name'])
+    arrays = {}
+    for key, (offset, shape, dtype) in handle['layout'].items():
+        array = np.ndarray(tuple(shape), dtype=dtype, buffer=shm.buf, offset=offset)
+        array.flags.writeable = False
+        arrays[key] = array
+    return ReferenceSignals(arrays, handle['params'], shm)
+
+
+def init_worker_reference(handle):
+    """multiprocessing.Pool 的 initializer：在 worker 中挂载参考信号"""
+    global _WORKER_REFERENCE
+    _WORKER_REFERENCE = attach(handle)
+
+
+def worker_reference():
+    """返回当前 worker 挂载的参考信号（需先经 init_worker_reference 初始化）"""
+    if _WORKER_REFERENCE is None:
+        raise RuntimeError("当前进程未挂载参考信号，请在 Pool initializer 中调用 init_worker_reference")
+    return _WORKER_REFERENCE
@@ -0,0 +1,221 @@
+"""
+场景图片渲染（独立于场景生成的流水线阶段）
+- 从已保存的数据集（mat_files 或 scene_store 列式数据集）读取场景，生成阶段不再等待 matplotlib
+- 渲染范围：'none' 不渲染，'sample' 按比例抽样，'all' 全部渲染
+- 进程池中每个 worker 使用非交互式后端，并在场景之间复用同一个 SceneRenderer（坐标轴、颜色条与布局只建立一次）
+- 缩略图模式使用低分辨率并跳过 bbox_inches='tight' 裁剪
+- 每张图片以原子写入保存，并记录到任务清单，重新运行时跳过已渲染的场景
+"""
+
+import multiprocessing
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+from tqdm import tqdm
+
+from job_manifest import JobManifest, atomic_output, job_key
+from monte_carlo_generator_scenario1 import SceneRenderer
+from scene_dataset import SceneDataset, is_store
+from scene_store import SCATTERER_CATEGORIES
+
+
+RENDER_MODES = ('none', 'sample', 'all')
+THUMBNAIL_DPI = 30
+FULL_DPI = 150
+
+# worker 进程内的数据集与复用的 SceneRenderer（由 _init_render_worker / scene_renderer 设置）
+_WORKER_STATE = {}
+
+
+def select_scenes(scene_ids, mode='all', rate=0.1, seed=0):
+    """
+    选择需要渲染的场景
+
+    参数：
+    - scene_ids: 全部场景编号
+    - mode: 'none' / 'sample' / 'all'
+    - rate: 'sample' 模式下的抽样比例（至少渲染 1 个场景）
+    - seed: 抽样随机种子（相同种子与场景集合得到相同的样本）
+
+    返回：
+    - ndarray: 按编号排序的场景编号
+    """
+    if mode not in RENDER_MODES:
+        raise ValueError(f"未知的渲染模式: {mode}（可选 {', '.join(RENDER_MODES)}）")
+    scene_ids = np.sort(np.asarray(scene_ids))
+    if mode == 'none' or scene_ids.size == 0:
+        return scene_ids[:0]
+    if mode == 'all':
+        return scene_ids
+    num_samples = min(scene_ids.size, max(1, int(round(rate * scene_ids.size))))
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(scene_ids, size=num_samples, replace=False))
+
+
+def render_path(output_dir, scene_id, thumbnail=False):
+    """场景图片路径：全尺寸为 output_dir/scene_XXX.png，缩略图在 output_dir/thumbnails/ 下"""
+    name = f'scene_{scene_id:03d}.png'
+    return os.path.join(output_dir, 'thumbnails', name) if thumbnail else os.path.join(output_dir, name)
+
+
+def sample_to_scene(sample):
+    """把 SceneDataset 样本还原为 SceneRenderer / visualize_scene 需要的场景字典（按类别拆分散射点）"""
+    scatterers = {key: sample['scatterers'][sample['category'] == k] for k, key in enumerate(SCATTERER_CATEGORIES)}
+    scatterers['all'] = sample['scatterers']
+    return {'scatterers': scatterers}
+
+
+def scene_renderer():
+    """当前进程复用的 SceneRenderer（首次调用时创建）"""
+    renderer = _WORKER_STATE.get('renderer')
+    if renderer is None:
+        renderer = _WORKER_STATE['renderer'] = SceneRenderer()
+    return renderer
+
+
+def close_scene_renderer():
+    """关闭当前进程复用的 SceneRenderer"""
+    renderer = _WORKER_STATE.pop('renderer', None)
+    if renderer is not None:
+        renderer.close()
+
+
+def save_scene_image(scene_data, path, thumbnail=False):
+    """用当前进程的 SceneRenderer 渲染场景并原子保存图片"""
+    with atomic_output(path) as tmp_path:
+        if thumbnail:
+            scene_renderer().save(scene_data, tmp_path, dpi=THUMBNAIL_DPI, tight=False)
+        else:
+            scene_renderer().save(scene_data, tmp_path, dpi=FULL_DPI)
+
+
+def _init_render_worker(source):
+    """进程池初始化：非交互式后端 + 每个 worker 一个数据集实例（SceneRenderer 在首个任务时创建）"""
+    plt.switch_backend('Agg')
+    _WORKER_STATE['dataset'] = SceneDataset(source, cache_size=0)
+
+
+def _render_task(task):
+    """
+    渲染单个场景（串行与进程池共用）
+
+    参数：
+    - task: (scene_id, output_dir, thumbnail)
+
+    返回：
+    - (scene_id, 图片路径)
+    """
+    scene_id, output_dir, thumbnail = task
+    scene = sample_to_scene(_WORKER_STATE['dataset'].get(scene_id))
+    path = render_path(output_dir, scene_id, thumbnail)
+    save_scene_image(scene, path, thumbnail)
+    return scene_id, path
+
+
+def render_job_key(output_dir, scene_id, thumbnail=False):
+    """渲染任务在清单中的键 (scenario, scene_XXX, 'render' / 'thumbnail')"""
+    return job_key(os.path.basename(os.path.normpath(output_dir)), f'scene_{scene_id:03d}',
+                   'thumbnail' if thumbnail else 'render')
+
+
+def _default_output_dir(source):
+    """数据集所在的场景目录（列式数据集与 mat_files 取其上级目录）"""
+    source = os.path.normpath(os.path.abspath(source))
+    if is_store(source) or os.path.basename(source) == 'mat_files':
+        return os.path.dirname(source)
+    return source
+
+
+def render_scenes(source, output_dir=None, mode='all', rate=0.1, thumbnail=False, workers=1, seed=0,
+                  resume=True, scene_ids=None):
+    """
+    从已保存的场景数据集批量渲染图片
+
+    参数：
+    - source: 场景目录（scenario_N 或 mat_files）或列式数据集路径
+    - output_dir: 图片输出目录（默认为数据集所在的场景目录）
+    - mode: 'none' / 'sample' / 'all'
+    - rate: 'sample' 模式的抽样比例
+    - thumbnail: 是否只生成缩略图
+    - workers: 并行进程数
+    - seed: 抽样随机种子
+    - resume: 为 True 时跳过任务清单中已渲染的场景
+    - scene_ids: 直接指定要渲染的场景编号（此时忽略 mode / rate）
+
+    返回：
+    - list: 本次渲染的图片路径
+    """
+    dataset = SceneDataset(source, cache_size=0)
+    if output_dir is None:
+        output_dir = _default_output_dir(source)
+    if scene_ids is None:
+        selected = select_scenes(dataset.scene_ids, mode, rate, seed).tolist()
+    else:
+        selected = [scene_id for scene_id in scene_ids if scene_id in dataset]
+    if not selected:
+        return []
+
+    manifest = JobManifest(output_dir)
+
+    def key_of(scene_id):
+        return render_job_key(output_dir, scene_id, thumbnail)
+
+    tasks = [(scene_id, output_dir, thumbnail) for scene_id in selected
+             if not (resume and manifest.is_complete(key_of(scene_id)))]
+    if len(tasks) < len(selected):
+        print(f"✓ 任务清单中已有 {len(selected) - len(tasks)} 张图片，跳过")
+
+    paths = []
+    desc = "渲染缩略图" if thumbnail else "渲染场景"
+
+    def record(scene_id, path):
+        manifest.finish(key_of(scene_id), [path], flush=False)
+        manifest.flush()
+        paths.append(path)
+
+    # 清单按时间间隔写回，结束或中断时再写回一次，已渲染的图片不会在续跑时重画
+    try:
+        if workers > 1 and len(tasks) > 1:
+            with multiprocessing.Pool(processes=workers, initializer=_init_render_worker,
+                                      initargs=(source,)) as pool:
+                results = pool.imap_unordered(_render_task, tasks, chunksize=max(1, len(tasks) // (workers * 8)))
+                for scene_id, path in tqdm(results, total=len(tasks), desc=desc):
+                    record(scene_id, path)
+        else:
+            backend = plt.get_backend()
+            _init_render_worker(source)
+            try:
+                for task in tqdm(tasks, desc=desc):
+                    record(*_render_task(task))
+            finally:
+                close_scene_renderer()
+                _WORKER_STATE.clear()
+                plt.switch_backend(backend)
+    finally:
+        manifest.flush(force=True)
+    print(f"✓ 已渲染 {len(paths)} 张{'缩略图' if thumbnail else '场景图片'}")
+    return paths
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='从已保存的场景数据集渲染图片')
+    parser.add_argument('source', type=str, help='场景目录（scenario_N）或列式数据集路径')
+    parser.add_argument('--output-dir', type=str, default=None, help='图片输出目录')
+    parser.add_argument('--render', type=str, default='all', choices=RENDER_MODES, help='渲染范围')
+    parser.add_argument('--render-rate', type=float, default=0.1, help='sample 模式的抽样比例')
+    parser.add_argument('--thumbnail', action='store_true', help='只生成低分辨率缩略图')
+    parser.add_argument('--workers', type=int, default=1, help='并行进程数')
+    parser.add_argument('--seed', type=int, default=0, help='抽样随机种子')
+    parser.add_argument('--no-resume', action='store_true', help='忽略任务清单，重新渲染')
+
+    args = parser.parse_args()
+    render_scenes(args.source, args.output_dir, mode=args.render, rate=args.render_rate,
+                  thumbnail=args.thumbnail, workers=args.workers, seed=args.seed, resume=not args.no_resume)
+
+
+if __name__ == '__main__':
+    main()
@@ -230,8 +230,11 @@ for scene_idx = 1:num_scenes
         fprintf('步骤5: 保存结果到 %s\n', result_file);
         % 只保存第一个天线的FFT结果（其他天线在后续MUSIC处理时重新计算）
         Velocity_fft_antenna_1_1 = Velocity_fft(:, :, 1, 1);
-        save(result_file, 'SNR_TARGET', 'BER', 'Velocity_fft_antenna_1_1', 'RD_threshold_matrix', ...
+        % 先写临时文件再重命名，进程中途退出不会留下被误认为已完成的 results.mat
+        result_tmp_file = fullfile(snr_folder, 'results_partial.mat');
+        save(result_tmp_file, 'SNR_TARGET', 'BER', 'Velocity_fft_antenna_1_1', 'RD_threshold_matrix', ...
              'RD_target_index', 'RD_detect_matrix_abs', '-v7.3');
+        movefile(result_tmp_file, result_file, 'f');
         fprintf('结果已成功保存（已优化：只保存第一个天线数据，节省空间）\n');
         
     catch ME
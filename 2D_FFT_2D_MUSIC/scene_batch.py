@@ -0,0 +1,237 @@
+"""
+场景批量数据结构（结构数组 / struct-of-arrays）
+- 所有场景的可移动物体散射点存放在一个扁平数组中，按场景偏移索引切片
+- 物体表（类型、中心、方向、速度、所属场景）以列数组存储
+- 固定布局（隔离带、路灯）在所有场景间共享，只存一份
+"""
+
+import numpy as np
+from scene_objects import Vehicle, Pedestrian, rotated_geometry
+
+
+class SceneBatch:
+    """
+    多场景批量表示
+
+    属性：
+    - scatterers: 可移动物体散射点 [N, 4] - (x, y, z, velocity)，每个场景内先车辆后行人
+    - scatterer_offsets: 场景散射点偏移 [S+1]，场景 i 为 scatterers[offsets[i]:offsets[i+1]]
+    - object_type: 物体类型 [M]（VEHICLE / PEDESTRIAN）
+    - object_scene: 物体所属场景下标 [M]
+    - object_position: 用户请求的中心 [M, 3]（重建对象用）
+    - object_center: 包络盒中心 [M, 3]（与对象的 center 属性一致）
+    - object_direction: 朝向角度 [M]（弧度）
+    - object_velocity: 速度 [M]
+    - object_offsets: 场景物体偏移 [S+1]
+    - object_start: 物体在 scatterers 中的起始行 [M]，长度由模板点数决定
+    - barrier, lights: 共享的固定布局对象
+    """
+    VEHICLE = 0
+    PEDESTRIAN = 1
+    OBJECT_CLASSES = (Vehicle, Pedestrian)
+
+    def __init__(self, scatterers, scatterer_offsets, object_type, object_scene,
+                 object_position, object_center, object_direction, object_velocity,
+                 object_offsets, object_start, barrier, lights):
+        self.scatterers = scatterers
+        self.scatterer_offsets = scatterer_offsets
+        self.object_type = object_type
+        self.object_scene = object_scene
+        self.object_position = object_position
+        self.object_center = object_center
+        self.object_direction = object_direction
+        self.object_velocity = object_velocity
+        self.object_offsets = object_offsets
+        self.object_start = object_start
+        self.barrier = barrier
+        self.lights = lights
+
+        # 固定布局散射点只计算一次
+        self.barrier_scatterers = barrier.get_scatterers()
+        self.light_scatterers = np.vstack([l.get_scatterers() for l in lights])
+
+    def __len__(self):
+        return len(self.scatterer_offsets) - 1
+
+    @property
+    def nbytes(self):
+        """批量数据占用的字节数（不含共享固定布局）"""
+        return sum(getattr(self, name).nbytes for name in (
+            'scatterers', 'scatterer_offsets', 'object_type', 'object_scene',
+            'object_position', 'object_center', 'object_direction', 'object_velocity',
+            'object_offsets', 'object_start'))
+
+    @classmethod
+    def from_placements(cls, n_scenes, object_scene, object_type, position, direction,
+                        velocity, barrier, lights, dtype=np.float64):
+        """
+        由物体放置结果直接构建批量数据（不创建 Vehicle/Pedestrian 对象）
+
+        参数：
+        - n_scenes: 场景数量
+        - object_scene: 物体所属场景 [M]
+        - object_type: 物体类型 [M]
+        - position: 用户请求的中心 [M, 3]
+        - direction: 朝向角度 [M]（弧度）
+        - velocity: 速度 [M]
+        - barrier, lights: 固定布局对象
+        - dtype: 散射点数组的数据类型（float32 可减半内存）
+
+        返回：
+        - SceneBatch
+        """
+        object_scene = np.asarray(object_scene, dtype=np.int64)
+        object_type = np.asarray(object_type, dtype=np.int8)
+        position = np.asarray(position, dtype=float).reshape(-1, 3)
+        direction = np.asarray(direction, dtype=float)
+        velocity = np.asarray(velocity, dtype=float)
+
+        # 每个场景内按（类型, 放置顺序）排列：先车辆后行人
+        order = np.lexsort((object_type, object_scene))
+        object_scene, object_type = object_scene[order], object_type[order]
+        position, direction, velocity = position[order], direction[order], velocity[order]
+
+        num_points = np.array([c.TEMPLATE.shape[0] for c in cls.OBJECT_CLASSES])[object_type]
+        object_start = (np.cumsum(num_points) - num_points).astype(np.int64)
+        object_offsets = np.searchsorted(object_scene, np.arange(n_scenes + 1)).astype(np.int64)
+        scatterer_offsets = np.concatenate([object_start, [num_points.sum()]])[object_offsets]
+
+        scatterers = np.empty((int(num_points.sum()), 4), dtype=dtype)
+        center = np.empty_like(position)
+
+        # 同一（类型, 朝向）的物体共享缓存的旋转模板，一次平移整组
+        keys = np.stack([object_type, direction]) if len(direction) else np.empty((2, 0))
+        for obj_type_value, obj_direction in np.unique(keys.T, axis=0):
+            obj_class = cls.OBJECT_CLASSES[int(obj_type_value)]
+            rotated, center_offset, _ = rotated_geometry(obj_class, float(obj_direction))
+            members = np.nonzero((object_type == obj_type_value) & (direction == obj_direction))[0]
+
+            rows = object_start[members, None] + np.arange(rotated.shape[0])
+            scatterers[rows, :3] = rotated + position[members, None, :]
+            scatterers[rows, 3] = velocity[members, None]
+            center[members] = position[members] + center_offset
+
+        return cls(scatterers, scatterer_offsets, object_type, object_scene.astype(np.int32),
+                   position, center, direction, velocity, object_offsets, object_start,
+                   barrier, lights)
+
+    @classmethod
+    def from_scenes(cls, scenes, dtype=np.float64):
+        """
+        由 generate_scene / generate_batch 返回的场景字典列表构建批量数据
+        （固定布局取自第一个场景）
+        """
+        if not scenes:
+            raise ValueError("scenes 为空：固定布局取自第一个场景，至少需要一个场景")
+        object_scene, object_type, position, direction, velocity = [], [], [], [], []
+        for i, scene in enumerate(scenes):
+            for type_value, key in ((cls.VEHICLE, 'vehicles'), (cls.PEDESTRIAN, 'pedestrians')):
+                for obj in scene['objects'][key]:
+                    object_scene.append(i)
+                    object_type.append(type_value)
+                    position.append(obj.requested_center)
+                    direction.append(obj.direction)
+                    velocity.append(obj.velocity)
+
+        layout = scenes[0]['objects']
+        return cls.from_placements(len(scenes), object_scene, object_type, position, direction,
+                                   velocity, layout['barrier'], layout['lights'], dtype=dtype)
+
+    @classmethod
+    def concatenate(cls, batches):
+        """按顺序拼接多个共享同一固定布局的批量数据"""
+        if not batches:
+            raise ValueError("batches 为空：至少需要一个批量数据")
+        scene_shift = np.cumsum([0] + [len(b) for b in batches[:-1]])
+        point_shift = np.cumsum([0] + [b.scatterers.shape[0] for b in batches[:-1]])
+        object_shift = np.cumsum([0] + [b.object_type.shape[0] for b in batches[:-1]])
+
+        def offsets(name, shifts):
+            parts = [getattr(b, name)[:-1] + s for b, s in zip(batches, shifts)]
+            parts.append([getattr(batches[-1], name)[-1] + shifts[-1]])
+            return np.concatenate(parts).astype(np.int64)
+
+        def stack(name):
+            return np.concatenate([getattr(b, name) for b in batches])
+
+        return cls(
+            stack('scatterers'), offsets('scatterer_offsets', point_shift),
+            stack('object_type'),
+            np.concatenate([b.object_scene + s for b, s in zip(batches, scene_shift)]).astype(np.int32),
+            stack('object_position'), stack('object_center'), stack('object_direction'),
+            stack('object_velocity'), offsets('object_offsets', object_shift),
+            np.concatenate([b.object_start + s for b, s in zip(batches, point_shift)]),
+            batches[0].barrier, batches[0].lights
+        )
+
+    def _object_slice(self, index):
+        return slice(self.object_offsets[index], self.object_offsets[index + 1])
+
+    def scene_objects(self, index):
+        """
+        返回场景 index 的物体表
+
+        返回：dict with keys 'vehicles', 'pedestrians'，各含
+            - centers [K, 3]、positions [K, 3]、directions [K]、velocities [K]
+        """
+        sl = self._object_slice(index)
+        result = {}
+        for type_value, key in ((self.VEHICLE, 'vehicles'), (self.PEDESTRIAN, 'pedestrians')):
+            mask = self.object_type[sl] == type_value
+            result[key] = {
+                'centers': self.object_center[sl][mask],
+                'positions': self.object_position[sl][mask],
+                'directions': self.object_direction[sl][mask],
+                'velocities': self.object_velocity[sl][mask]
+            }
+        return result
+
+    def scene_scatterers(self, index):
+        """
+        返回场景 index 的散射点，格式与场景字典中的 'scatterers' 相同
+        （'all' 顺序为车辆、隔离带、路灯、行人）
+        """
+        points = self.scatterers[self.scatterer_offsets[index]:self.scatterer_offsets[index + 1]]
+        sl = self._object_slice(index)
+        num_vehicle_points = Vehicle.TEMPLATE.shape[0] * int(np.sum(self.object_type[sl] == self.VEHICLE))
+
+        vehicle_scatterers = points[:num_vehicle_points]
+        pedestrian_scatterers = points[num_vehicle_points:]
+
+        return {
+            'vehicles': vehicle_scatterers,
+            'barrier': self.barrier_scatterers,
+            'lights': self.light_scatterers,
+            'pedestrians': pedestrian_scatterers,
+            'all': np.vstack([vehicle_scatterers, self.barrier_scatterers,
+                              self.light_scatterers, pedestrian_scatterers])
+        }
+
+    def object_centroids(self):
+        """所有物体散射点的XY质心 [M, 2]（即碰撞检测使用的实际中心）"""
+        if self.object_start.size == 0:
+            return np.empty((0, 2))
+        num_points = np.diff(np.append(self.object_start, self.scatterers.shape[0]))
+        sums = np.add.reduceat(self.scatterers[:, :2].astype(float), self.object_start, axis=0)
+        return sums / num_points[:, None]
+
+    def to_scene_dict(self, index):
+        """重建场景 index 的场景字典（含 Vehicle/Pedestrian 对象），用于兼容旧接口"""
+        sl = self._object_slice(index)
+        vehicles, pedestrians = [], []
+        for obj_type, position, direction, velocity in zip(
+                self.object_type[sl], self.object_position[sl],
+                self.object_direction[sl], self.object_velocity[sl]):
+            obj_class = self.OBJECT_CLASSES[obj_type]
+            obj = obj_class(center=position, direction=np.degrees(direction), velocity=velocity)
+            (vehicles if obj_type == self.VEHICLE else pedestrians).append(obj)
+
+        return {
+            'objects': {
+                'vehicles': vehicles,
+                'barrier': self.barrier,
+                'lights': self.lights,
+                'pedestrians': pedestrians
+            },
+            'scatterers': self.scene_scatterers(index)
+        }
@@ -0,0 +1,210 @@
+"""
+场景数据集读取器（随机访问 + 分片迭代）
+- 构造时只索引一次场景文件（scenario_N/mat_files/scene_*.mat），__getitem__ 时才解码
+- 解码后的场景保存在 LRU 缓存中，重复访问不再读盘
+- 也可直接读取 scene_store.py 写入的列式数据集（.h5 或 npy 目录）
+- 迭代时按 DataLoader worker（若安装了 PyTorch）或显式指定的分片切分场景，各 worker 互不重复
+- 每个样本以数组形式给出散射点、类别、物体表与真值 point_info（距离、速度、方位角、俯仰角）
+"""
+
+import glob
+import os
+import re
+from collections import OrderedDict
+
+import numpy as np
+import scipy.io as sio
+
+from radar_echo import BASE_POS, compute_point_info
+from scene_store import INDEX_NAME, OBJECT_CATEGORIES, SCATTERER_CATEGORIES, SceneStore
+
+
+_SCENE_FILE_PATTERN = re.compile(r'scene_(\d+)\.mat$')
+
+
+def scene_id_from_path(path):
+    """由 scene_XXX.mat 文件名解析场景编号，文件名不符合时返回 None"""
+    match = _SCENE_FILE_PATTERN.search(os.path.basename(path))
+    return int(match.group(1)) if match else None
+
+
+def load_scene_mat(mat_path):
+    """
+    读取 save_scene_to_mat 保存的单个场景
+
+    返回：
+    - dict: scene_id, scatterers{all, vehicles, barrier, lights, pedestrians}（各 [n, 4]），
+            vehicles / pedestrians{centers [K, 3], directions [K], velocities [K]}
+    """
+    data = sio.loadmat(mat_path, squeeze_me=True, struct_as_record=False)
+    scatterers = {key: np.asarray(getattr(data['scatterers'], key), dtype=float).reshape(-1, 4)
+                  for key in SCATTERER_CATEGORIES + ('all',)}
+    scene = {'scene_id': int(data['scene_id']), 'scatterers': scatterers}
+    for key in OBJECT_CATEGORIES:
+        table = data[key]
+        scene[key] = {
+            'centers': np.asarray(table.centers, dtype=float).reshape(-1, 3),
+            'directions': np.asarray(table.directions, dtype=float).reshape(-1),
+            'velocities': np.asarray(table.velocities, dtype=float).reshape(-1),
+        }
+    return scene
+
+
+def is_store(path):
+    """path 是否为 scene_store 列式数据集（.h5 文件或含 index.json 的目录）"""
+    return (os.path.splitext(path)[1].lower() in ('.h5', '.hdf5')
+            or os.path.exists(os.path.join(path, INDEX_NAME)))
+
+
+class SceneDataset:
+    """
+    场景数据集（PyTorch Dataset 风格：支持 len / 下标访问 / 迭代，但不依赖 PyTorch）
+
+    样本（dict）：
+    - scene_id: 场景编号
+    - scatterers: 全部散射点 [N, 4] - (x, y, z, velocity)
+    - category: 散射点类别 [N]（0 车辆、1 隔离带、2 路灯、3 行人，见 SCATTERER_CATEGORIES）
+    - point_info: 真值 [N, 4] - (距离, 速度, 方位角, 俯仰角)，相对 base_pos
+    - vehicles / pedestrians: 物体表 {centers [K, 3], directions [K], velocities [K]}
+    """
+
+    def __init__(self, root, base_pos=BASE_POS, cache_size=128, transform=None,
+                 num_shards=1, shard_index=0):
+        """
+        参数：
+        - root: 场景目录（scenario_N 或其下的 mat_files），或列式数据集路径
+        - base_pos: 计算 point_info 的基站位置
+        - cache_size: LRU 缓存的场景数（0 表示不缓存）
+        - transform: 可选，对样本 dict 的变换函数
+        - num_shards, shard_index: 迭代时的显式分片（如分布式训练的 world_size / rank），
+                                   与 DataLoader worker 分片叠加
+        """
+        self.root = root
+        self.base_pos = base_pos
+        self.cache_size = cache_size
+        self.transform = transform
+        self.num_shards = num_shards
+        self.shard_index = shard_index
+        self._cache = OrderedDict()
+        self._store = None
+
+        if is_store(root):
+            self._store_path = root
+            with SceneStore(root) as store:
+                self.scene_ids = store.scene_ids.copy()
+            self.files = None
+        else:
+            self._store_path = None
+            mat_dir = os.path.join(root, 'mat_files') if os.path.isdir(os.path.join(root, 'mat_files')) else root
+            files = [(scene_id, path) for path in glob.glob(os.path.join(mat_dir, 'scene_*.mat'))
+                     if (scene_id := scene_id_from_path(path)) is not None]
+            if not files:
+                raise FileNotFoundError(f"在目录 {mat_dir} 中未找到场景文件")
+            files.sort()
+            self.scene_ids = np.array([scene_id for scene_id, _ in files])
+            self.files = [path for _, path in files]
+        self._rows = {scene_id: row for row, scene_id in enumerate(self.scene_ids.tolist())}
+
+    def __len__(self):
+        return len(self.scene_ids)
+
+    def __contains__(self, scene_id):
+        return scene_id in self._rows
+
+    def __getstate__(self):
+        # 传给 DataLoader worker 时不携带缓存与已打开的数据集句柄
+        state = self.__dict__.copy()
+        state['_cache'] = OrderedDict()
+        state['_store'] = None
+        return state
+
+    def _decode(self, row):
+        """读取并整理第 row 个场景（不经过缓存）"""
+        if self._store_path is not None:
+            if self._store is None:
+                self._store = SceneStore(self._store_path)
+            scene = self._store.scene(int(self.scene_ids[row]))
+        else:
+            scene = load_scene_mat(self.files[row])
+
+        counts = [len(scene['scatterers'][key]) for key in SCATTERER_CATEGORIES]
+        scatterers = scene['scatterers']['all']
+        sample = {
+            'scene_id': int(self.scene_ids[row]),
+            'scatterers': scatterers,
+            'category': np.repeat(np.arange(len(SCATTERER_CATEGORIES), dtype=np.int8), counts),
+            'point_info': compute_point_info(scatterers, self.base_pos),
+        }
+        for key in OBJECT_CATEGORIES:
+            sample[key] = {field: scene[key][field] for field in ('centers', 'directions', 'velocities')}
+        return sample
+
+    def __getitem__(self, index):
+        """按下标（0 起始，按场景编号排序）读取场景"""
+        row = int(index)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(f"场景下标 {index} 超出范围 [0, {len(self)})")
+
+        sample = self._cache.get(row)
+        if sample is None:
+            sample = self._decode(row)
+            if self.cache_size:
+                self._cache[row] = sample
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(row)
+        return self.transform(sample) if self.transform is not None else sample
+
+    def get(self, scene_id):
+        """按场景编号读取"""
+        try:
+            return self[self._rows[scene_id]]
+        except KeyError:
+            raise KeyError(f"数据集中没有场景 {scene_id}") from None
+
+    def shard_indices(self, num_shards=None, shard_index=None):
+        """
+        当前分片负责的场景下标
+
+        默认叠加显式分片与 PyTorch DataLoader worker 分片（未安装 PyTorch 或不在 worker 中时只按显式分片）
+        """
+        num_shards = self.num_shards if num_shards is None else num_shards
+        shard_index = self.shard_index if shard_index is None else shard_index
+        try:
+            from torch.utils.data import get_worker_info
+            worker_info = get_worker_info()
+        except ImportError:
+            worker_info = None
+        if worker_info is not None:
+            shard_index = shard_index * worker_info.num_workers + worker_info.id
+            num_shards *= worker_info.num_workers
+        return np.arange(shard_index, len(self), num_shards)
+
+    def __iter__(self):
+        for row in self.shard_indices():
+            yield self[row]
+
+
+def collate_scenes(samples):
+    """
+    把多个样本拼接为一个批次（散射点数不同，按偏移索引拼接，可作为 DataLoader 的 collate_fn）
+
+    返回：
+    - dict: scene_id [B]、scatterers / category / point_info 拼接后的数组、
+            scatterer_offsets [B+1]（场景 i 为 [offsets[i], offsets[i+1])），
+            vehicles / pedestrians 各字段拼接后的数组及 offsets [B+1]
+    """
+    batch = {
+        'scene_id': np.array([s['scene_id'] for s in samples]),
+        'scatterer_offsets': np.concatenate([[0], np.cumsum([len(s['scatterers']) for s in samples])]),
+    }
+    for key in ('scatterers', 'category', 'point_info'):
+        batch[key] = np.concatenate([s[key] for s in samples])
+    for key in OBJECT_CATEGORIES:
+        batch[key] = {field: np.concatenate([s[key][field] for s in samples])
+                      for field in ('centers', 'directions', 'velocities')}
+        batch[key]['offsets'] = np.concatenate([[0], np.cumsum([len(s[key]['velocities']) for s in samples])])
+    return batch
@@ -7,9 +7,78 @@ ISAC 场景对象类库
 版本: 1.0
 """
 
+from functools import lru_cache
+
 import numpy as np
 
 
+def _frozen(array):
+    """返回只读数组（类级模板在所有实例间共享，禁止原地修改）"""
+    array = np.asarray(array, dtype=float)
+    array.flags.writeable = False
+    return array
+
+
+def _rotation_matrix(direction):
+    """绕Z轴旋转矩阵（direction 为弧度）"""
+    cos_theta = np.cos(direction)
+    sin_theta = np.sin(direction)
+    return np.array([
+        [cos_theta, -sin_theta, 0],
+        [sin_theta, cos_theta, 0],
+        [0, 0, 1]
+    ])
+
+
+@lru_cache(maxsize=1024)
+def rotated_geometry(cls, direction):
+    """
+    按 (类, 朝向) 缓存旋转后的散射点模板及其几何属性
+    
+    返回：
+    - rotated: 旋转后的模板 [N, 3]（只读）
+    - center_offset: 包络盒中心相对几何中心的偏移 [3]
+    - size: 旋转后的包络盒尺寸 [3]
+    """
+    rotated = cls.TEMPLATE @ _rotation_matrix(direction).T
+    geometric_center = np.mean(rotated, axis=0)
+    min_coords = np.min(rotated, axis=0)
+    max_coords = np.max(rotated, axis=0)
+    bbox_center = (min_coords + max_coords) / 2
+    return _frozen(rotated), _frozen(bbox_center - geometric_center), _frozen(max_coords - min_coords)
+
+
+def _with_velocity(points, velocity):
+    """拼接速度列，返回 [N, 4] 散射点数组"""
+    result = np.empty((points.shape[0], 4))
+    result[:, :3] = points
+    result[:, 3] = velocity
+    return result
+
+
+def _vehicle_template():
+    """车辆的散射点模板（相对坐标）"""
+    tar_car = np.array([
+        [2, 0, 0], [2, 0, 0.9], [2, 0.6, 0.9], [2, 1, 1.4], [2, 4.5, 1.4], [2, 5, 0.9], [2, 6, 0],
+        [0, 0, 0], [0, 0, 0.9], [0, 0.6, 0.9], [0, 1, 1.4], [0, 4.5, 1.4], [0, 5, 0.9], [0, 6, 0],
+        [2, 0, 0.5], [2, 1.5, 1.7], [2, 2, 1.8], [2, 2.5, 1.8], [2, 3, 1.8], [2, 3.5, 1.8], [2, 4, 1.7], [2, 5.5, 0.8], [2, 6, 0.5],
+        [0, 0, 0.5], [0, 1.5, 1.7], [0, 2, 1.8], [0, 2.5, 1.8], [0, 3, 1.8], [0, 3.5, 1.8], [0, 4, 1.7], [0, 5.5, 0.8], [0, 6, 0.5],
+        # 细节填充
+        [2, 3, 1.4], [2, 3, 0.6], [2, 3, 0.3], [2, 3, 0], [2, 1, 0.9], [2, 1.4, 0.9], [2, 1.8, 0.9], [2, 2.2, 0.9], [2, 2.6, 0.9], [2, 3, 0.9], [2, 3.4, 0.9], [2, 3.8, 0.9], [2, 4.2, 0.9], [2, 4.6, 0.9], [2, 1, 0.5], [2, 5, 0.4], [2, 0.6, 0.4], [2, 0.4, 0], [2, 1.4, 0.4], [2, 1.6, 0], [2, 5.4, 0.3], [2, 5.6, 0], [2, 4.6, 0.3], [2, 4.4, 0], [2, 2.1, 0], [2, 2.6, 0], [2, 3.5, 0], [2, 4, 0],
+        [0, 3, 1.4], [0, 3, 0.6], [0, 3, 0.3], [0, 3, 0], [0, 1, 0.9], [0, 1.4, 0.9], [0, 1.8, 0.9], [0, 2.2, 0.9], [0, 2.6, 0.9], [0, 3, 0.9], [0, 3.4, 0.9], [0, 3.8, 0.9], [0, 4.2, 0.9], [0, 4.6, 0.9], [0, 1, 0.5], [0, 5, 0.4], [0, 0.6, 0.4], [0, 0.4, 0], [0, 1.4, 0.4], [0, 1.6, 0], [0, 5.4, 0.3], [0, 5.6, 0], [0, 4.6, 0.3], [0, 4.4, 0], [0, 2.1, 0], [0, 2.6, 0], [0, 3.5, 0], [0, 4, 0],
+        [1, 0, 0], [1, 0, 0.9], [1, 0.6, 0.9], [1, 5, 0.9], [1, 6, 0], [1, 4, 1.7], [1, 1.5, 1.7], [1.5, 3.2, 1.8], [0.5, 3.2, 1.8], [1.5, 2.5, 1.8], [0.5, 2.5, 1.8], [1, 6, 0.5],
+        # 车轮
+        [2, 1, -0.4], [2, 0.7, -0.3], [2, 1.3, -0.3], [2, 5, -0.4], [2, 4.7, -0.3], [2, 5.3, -0.3],
+        [0, 1, -0.4], [0, 0.7, -0.3], [0, 1.3, -0.3], [0, 5, -0.4], [0, 4.7, -0.3], [0, 5.3, -0.3],
+        # 后视镜
+        [2.2, 4.6, 0.9], [-0.2, 4.6, 0.9]
+    ])
+    # 高度和横向偏移调整
+    tar_car[:, 2] += 0.4
+    tar_car[:, 0] += 0.2
+    return _frozen(tar_car)
+
+
 class Vehicle:
     """
     车辆类
@@ -19,6 +88,10 @@ class Vehicle:
     - 速度：10 m/s
     - 尺寸：约 6m(长) × 2m(宽) × 2m(高)
     """
+    # 类级只读模板及其未旋转尺寸，所有实例共享
+    TEMPLATE = _vehicle_template()
+    TEMPLATE_SIZE = _frozen(TEMPLATE.max(axis=0) - TEMPLATE.min(axis=0))
+    
     def __init__(self, center=(0, 0, 0), direction=0, velocity=10):
         """
         参数：
@@ -35,57 +108,20 @@ class Vehicle:
         self._calculate_geometry()
     
     def _create_model(self):
-        """创建车辆的散射点模板（相对坐标）"""
-        tar_car = np.array([
-            [2, 0, 0], [2, 0, 0.9], [2, 0.6, 0.9], [2, 1, 1.4], [2, 4.5, 1.4], [2, 5, 0.9], [2, 6, 0],
-            [0, 0, 0], [0, 0, 0.9], [0, 0.6, 0.9], [0, 1, 1.4], [0, 4.5, 1.4], [0, 5, 0.9], [0, 6, 0],
-            [2, 0, 0.5], [2, 1.5, 1.7], [2, 2, 1.8], [2, 2.5, 1.8], [2, 3, 1.8], [2, 3.5, 1.8], [2, 4, 1.7], [2, 5.5, 0.8], [2, 6, 0.5],
-            [0, 0, 0.5], [0, 1.5, 1.7], [0, 2, 1.8], [0, 2.5, 1.8], [0, 3, 1.8], [0, 3.5, 1.8], [0, 4, 1.7], [0, 5.5, 0.8], [0, 6, 0.5],
-            # 细节填充
-            [2, 3, 1.4], [2, 3, 0.6], [2, 3, 0.3], [2, 3, 0], [2, 1, 0.9], [2, 1.4, 0.9], [2, 1.8, 0.9], [2, 2.2, 0.9], [2, 2.6, 0.9], [2, 3, 0.9], [2, 3.4, 0.9], [2, 3.8, 0.9], [2, 4.2, 0.9], [2, 4.6, 0.9], [2, 1, 0.5], [2, 5, 0.4], [2, 0.6, 0.4], [2, 0.4, 0], [2, 1.4, 0.4], [2, 1.6, 0], [2, 5.4, 0.3], [2, 5.6, 0], [2, 4.6, 0.3], [2, 4.4, 0], [2, 2.1, 0], [2, 2.6, 0], [2, 3.5, 0], [2, 4, 0],
-            [0, 3, 1.4], [0, 3, 0.6], [0, 3, 0.3], [0, 3, 0], [0, 1, 0.9], [0, 1.4, 0.9], [0, 1.8, 0.9], [0, 2.2, 0.9], [0, 2.6, 0.9], [0, 3, 0.9], [0, 3.4, 0.9], [0, 3.8, 0.9], [0, 4.2, 0.9], [0, 4.6, 0.9], [0, 1, 0.5], [0, 5, 0.4], [0, 0.6, 0.4], [0, 0.4, 0], [0, 1.4, 0.4], [0, 1.6, 0], [0, 5.4, 0.3], [0, 5.6, 0], [0, 4.6, 0.3], [0, 4.4, 0], [0, 2.1, 0], [0, 2.6, 0], [0, 3.5, 0], [0, 4, 0],
-            [1, 0, 0], [1, 0, 0.9], [1, 0.6, 0.9], [1, 5, 0.9], [1, 6, 0], [1, 4, 1.7], [1, 1.5, 1.7], [1.5, 3.2, 1.8], [0.5, 3.2, 1.8], [1.5, 2.5, 1.8], [0.5, 2.5, 1.8], [1, 6, 0.5],
-            # 车轮
-            [2, 1, -0.4], [2, 0.7, -0.3], [2, 1.3, -0.3], [2, 5, -0.4], [2, 4.7, -0.3], [2, 5.3, -0.3],
-            [0, 1, -0.4], [0, 0.7, -0.3], [0, 1.3, -0.3], [0, 5, -0.4], [0, 4.7, -0.3], [0, 5.3, -0.3],
-            # 后视镜
-            [2.2, 4.6, 0.9], [-0.2, 4.6, 0.9]
-        ])
-        # 高度和横向偏移调整
-        tar_car[:, 2] += 0.4
-        tar_car[:, 0] += 0.2
-        return tar_car
+        """返回车辆的散射点模板（相对坐标，类级共享只读数组）"""
+        return self.TEMPLATE
     
     def _calculate_geometry(self):
         """计算旋转后的实际几何属性"""
-        # 旋转矩阵
-        cos_theta = np.cos(self.direction)
-        sin_theta = np.sin(self.direction)
-        rotation_matrix = np.array([
-            [cos_theta, -sin_theta, 0],
-            [sin_theta, cos_theta, 0],
-            [0, 0, 1]
-        ])
-        
-        # 旋转散射点模板
-        rotated = self.scatterers @ rotation_matrix.T
-        
-        # 计算旋转后散射点的几何中心
-        geometric_center = np.mean(rotated, axis=0)
-        
-        # 计算包络盒（在旋转后的坐标系中）
-        min_coords = np.min(rotated, axis=0)
-        max_coords = np.max(rotated, axis=0)
+        # 旋转后的模板、包络盒偏移与尺寸按朝向缓存
+        _, center_offset, size = rotated_geometry(type(self), float(self.direction))
         
         # 包络盒尺寸
-        self.size = max_coords - min_coords
-        
-        # 包络盒中心（几何中心）
-        bbox_center = (min_coords + max_coords) / 2
+        self.size = size.copy()
         
         # 实际中心点 = 用户请求的中心 + (包络盒中心 - 几何中心)
         # 这样可以确保包络盒的中心在用户请求的位置
-        self.center = self.requested_center + (bbox_center - geometric_center)
+        self.center = self.requested_center + center_offset
     
     def get_bounding_box(self):
         """
@@ -110,12 +146,7 @@ class Vehicle:
             - direction: 朝向角度（弧度）
             - height: 高度
         """
-        # 计算原始未旋转的散射点范围
-        min_coords = np.min(self.scatterers, axis=0)
-        max_coords = np.max(self.scatterers, axis=0)
-        
-        # 原始尺寸（未旋转）
-        original_size = max_coords - min_coords
+        original_size = self.TEMPLATE_SIZE
         
         return {
             'center': self.center.copy(),
@@ -126,22 +157,9 @@ class Vehicle:
     
     def get_scatterers(self):
         """返回带位置、方向、速度的散射点数组 [N, 4]"""
-        # 旋转变换
-        cos_theta = np.cos(self.direction)
-        sin_theta = np.sin(self.direction)
-        rotation_matrix = np.array([
-            [cos_theta, -sin_theta, 0],
-            [sin_theta, cos_theta, 0],
-            [0, 0, 1]
-        ])
-        
-        # 应用旋转和平移到用户请求的中心
-        rotated = self.scatterers @ rotation_matrix.T
-        translated = rotated + self.requested_center
-        
-        # 添加速度信息
-        velocity_column = np.ones((translated.shape[0], 1)) * self.velocity
-        return np.hstack([translated, velocity_column])
+        # 缓存的旋转模板平移到用户请求的中心，并添加速度信息
+        rotated, _, _ = rotated_geometry(type(self), float(self.direction))
+        return _with_velocity(rotated + self.requested_center, self.velocity)
 
 
 class StraightBarrier:
@@ -397,6 +415,15 @@ class StreetLight:
     - 高度：10m
     - 速度：0 m/s（静止）
     """
+    # 路灯模板（相对坐标，类级只读）
+    TEMPLATE = _frozen([
+        [0, 0, 2], [0, 0, 3], [0, 0, 4], [0, 0, 5], [0, 0, 6],
+        [0, 0, 7], [0, 0, 8], [0, 0, 9], [0, 0, 10],  # 灯杆
+        [-1, 0, 10], [1, 0, 10], [0, -1, 10], [0, 1, 10]  # 灯头
+    ])
+    TEMPLATE_CENTER = _frozen((TEMPLATE.min(axis=0) + TEMPLATE.max(axis=0)) / 2)
+    TEMPLATE_SIZE = _frozen(TEMPLATE.max(axis=0) - TEMPLATE.min(axis=0))
+    
     def __init__(self, position=(0, 0, 0)):
         """
         参数：
@@ -410,25 +437,11 @@ class StreetLight:
     
     def _calculate_geometry(self):
         """计算路灯的实际几何属性"""
-        # 路灯模板（相对坐标）
-        light_template = np.array([
-            [0, 0, 2], [0, 0, 3], [0, 0, 4], [0, 0, 5], [0, 0, 6],
-            [0, 0, 7], [0, 0, 8], [0, 0, 9], [0, 0, 10],  # 灯杆
-            [-1, 0, 10], [1, 0, 10], [0, -1, 10], [0, 1, 10]  # 灯头
-        ])
-        
-        # 计算包络盒
-        min_coords = np.min(light_template, axis=0)
-        max_coords = np.max(light_template, axis=0)
-        
         # 包络盒尺寸
-        self.size = max_coords - min_coords
-        
-        # 包络盒中心（相对坐标）
-        bbox_center_relative = (min_coords + max_coords) / 2
+        self.size = self.TEMPLATE_SIZE.copy()
         
-        # 实际中心点
-        self.center = self.requested_position + bbox_center_relative
+        # 实际中心点 = 底座位置 + 包络盒中心（相对坐标）
+        self.center = self.requested_position + self.TEMPLATE_CENTER
         
         # 路灯没有方向角
         self.direction = 0
@@ -452,16 +465,7 @@ class StreetLight:
         返回OBB参数（用于精确碰撞检测）
         注意：StreetLight 为静态物体，通常不参与碰撞检测
         """
-        # 路灯模板（相对坐标）
-        light_template = np.array([
-            [0, 0, 2], [0, 0, 3], [0, 0, 4], [0, 0, 5], [0, 0, 6],
-            [0, 0, 7], [0, 0, 8], [0, 0, 9], [0, 0, 10],  # 灯杆
-            [-1, 0, 10], [1, 0, 10], [0, -1, 10], [0, 1, 10]  # 灯头
-        ])
-        
-        min_coords = np.min(light_template, axis=0)
-        max_coords = np.max(light_template, axis=0)
-        original_size = max_coords - min_coords
+        original_size = self.TEMPLATE_SIZE
         
         return {
             'center': self.center.copy(),
@@ -472,19 +476,8 @@ class StreetLight:
     
     def get_scatterers(self):
         """返回散射点数组 [N, 4]"""
-        # 路灯模板（相对坐标）
-        light_template = np.array([
-            [0, 0, 2], [0, 0, 3], [0, 0, 4], [0, 0, 5], [0, 0, 6],
-            [0, 0, 7], [0, 0, 8], [0, 0, 9], [0, 0, 10],  # 灯杆
-            [-1, 0, 10], [1, 0, 10], [0, -1, 10], [0, 1, 10]  # 灯头
-        ])
-        
-        # 平移到指定位置
-        translated = light_template + self.requested_position
-        
-        # 添加速度信息
-        velocity_column = np.zeros((translated.shape[0], 1))
-        return np.hstack([translated, velocity_column])
+        # 平移到指定位置，并添加速度信息
+        return _with_velocity(self.TEMPLATE + self.requested_position, 0)
 
 
 class Pedestrian:
@@ -496,6 +489,14 @@ class Pedestrian:
     - 速度：2 m/s
     - 尺寸：约 0.5m × 0.5m × 1.8m
     """
+    # 行人模板（相对坐标，类级只读）
+    TEMPLATE = _frozen([
+        [0, 0, 0], [0.5, 0.5, 0], [0.25, 0.3, 1], [0.25, 0.3, 1.5],
+        [0.25, 0.3, 1.7], [0.4, 0.4, 0.5], [0.1, 0.2, 0.5], [0.25, 0.3, 1.8],
+        [0.5, 0.3, 1.4], [0, 0.3, 1.4],             [0.5, 0.5, 1], [0, 0, 0.9]
+    ])
+    TEMPLATE_SIZE = _frozen(TEMPLATE.max(axis=0) - TEMPLATE.min(axis=0))
+    
     def __init__(self, center=(0, 0, 0), direction=0, velocity=2):
         """
         参数：
@@ -512,43 +513,19 @@ class Pedestrian:
         self._calculate_geometry()
     
     def _create_model(self):
-        """创建行人的散射点模板（相对坐标）"""
-        people_template = np.array([
-            [0, 0, 0], [0.5, 0.5, 0], [0.25, 0.3, 1], [0.25, 0.3, 1.5],
-            [0.25, 0.3, 1.7], [0.4, 0.4, 0.5], [0.1, 0.2, 0.5], [0.25, 0.3, 1.8],
-            [0.5, 0.3, 1.4], [0, 0.3, 1.4],             [0.5, 0.5, 1], [0, 0, 0.9]
-        ])
-        return people_template
+        """返回行人的散射点模板（相对坐标，类级共享只读数组）"""
+        return self.TEMPLATE
     
     def _calculate_geometry(self):
         """计算旋转后的实际几何属性"""
-        # 旋转矩阵
-        cos_theta = np.cos(self.direction)
-        sin_theta = np.sin(self.direction)
-        rotation_matrix = np.array([
-            [cos_theta, -sin_theta, 0],
-            [sin_theta, cos_theta, 0],
-            [0, 0, 1]
-        ])
-        
-        # 旋转散射点模板
-        rotated = self.scatterers @ rotation_matrix.T
-        
-        # 计算旋转后散射点的几何中心
-        geometric_center = np.mean(rotated, axis=0)
-        
-        # 计算包络盒
-        min_coords = np.min(rotated, axis=0)
-        max_coords = np.max(rotated, axis=0)
+        # 旋转后的模板、包络盒偏移与尺寸按朝向缓存
+        _, center_offset, size = rotated_geometry(type(self), float(self.direction))
         
         # 包络盒尺寸
-        self.size = max_coords - min_coords
-        
-        # 包络盒中心
-        bbox_center = (min_coords + max_coords) / 2
+        self.size = size.copy()
         
         # 实际中心点 = 用户请求的中心 + (包络盒中心 - 几何中心)
-        self.center = self.requested_center + (bbox_center - geometric_center)
+        self.center = self.requested_center + center_offset
     
     def get_bounding_box(self):
         """
@@ -573,12 +550,7 @@ class Pedestrian:
             - direction: 朝向角度（弧度）
             - height: 高度
         """
-        # 计算原始未旋转的散射点范围
-        min_coords = np.min(self.scatterers, axis=0)
-        max_coords = np.max(self.scatterers, axis=0)
-        
-        # 原始尺寸（未旋转）
-        original_size = max_coords - min_coords
+        original_size = self.TEMPLATE_SIZE
         
         return {
             'center': self.center.copy(),
@@ -589,24 +561,12 @@ class Pedestrian:
     
     def get_scatterers(self):
         """返回散射点数组 [N, 4]"""
-        # 旋转变换
-        cos_theta = np.cos(self.direction)
-        sin_theta = np.sin(self.direction)
-        rotation_matrix = np.array([
-            [cos_theta, -sin_theta, 0],
-            [sin_theta, cos_theta, 0],
-            [0, 0, 1]
-        ])
-        
-        rotated = self.scatterers @ rotation_matrix.T
-        translated = rotated + self.requested_center
-        
-        # 添加速度信息
-        velocity_column = np.ones((translated.shape[0], 1)) * self.velocity
-        return np.hstack([translated, velocity_column])
+        # 缓存的旋转模板平移到用户请求的中心，并添加速度信息
+        rotated, _, _ = rotated_geometry(type(self), float(self.direction))
+        return _with_velocity(rotated + self.requested_center, self.velocity)
 
 
 # 模块信息
-__all__ = ['Vehicle', 'StraightBarrier', 'CurveBarrier', 'StreetLight', 'Pedestrian']
+__all__ = ['Vehicle', 'StraightBarrier', 'CurveBarrier', 'StreetLight', 'Pedestrian', 'rotated_geometry']
 __version__ = '1.0.0'
 __author__ = 'AI Assistant'
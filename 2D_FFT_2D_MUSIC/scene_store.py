@@ -0,0 +1,474 @@
+"""
+列式场景数据集（单个容器替代每场景一个 .mat + summary.mat）
+- 所有场景的散射点拼接为一个 [N, 4] 数组，按 scatterer_offsets [S+1] 切片（与 SceneBatch 相同的偏移索引）
+- 每个场景内散射点顺序与 save_scene_to_mat 的 'all' 一致：车辆、隔离带、路灯、行人，
+  各类点数记录在 scatterer_counts [S, 4]
+- 物体表（车辆 / 行人）以列数组存储，按 object_offsets [S+1] 切片
+- 场景元数据（种子等）每场景一条 JSON，固定布局（隔离带、路灯）只存一份
+- 两种后端：
+  * 'hdf5': 单个 .h5 文件，分块 + gzip 压缩，可追加；MATLAB 可用 h5read 直接读取（需要 h5py）
+  * 'npy': 目录下每列一个原始二进制文件 + index.json，读取时 np.memmap 零拷贝切片（无额外依赖）
+- 追加写入按 flush_every 个场景成批提交，进程中断时未提交的尾部在下次打开时丢弃
+- 以不同元数据（如不同种子）重新写入已有编号的场景时追加新行，读取时以最后写入的行为准
+"""
+
+import json
+import os
+
+import numpy as np
+
+from job_manifest import atomic_output
+from scene_batch import SceneBatch
+
+try:
+    import h5py
+except ImportError:          # 可选依赖：只有 'hdf5' 后端需要
+    h5py = None
+
+
+FORMAT_VERSION = 1
+INDEX_NAME = 'index.json'
+SCATTERER_CATEGORIES = ('vehicles', 'barrier', 'lights', 'pedestrians')
+OBJECT_CATEGORIES = ('vehicles', 'pedestrians')
+
+# 列定义：名称 -> (dtype, 每行形状)
+COLUMNS = {
+    # 散射点 [N, ...]
+    'scatterers': ('<f8', (4,)),
+    # 场景 [S(+1), ...]
+    'scene_id': ('<i8', ()),
+    'scatterer_offsets': ('<i8', ()),
+    'scatterer_counts': ('<i8', (len(SCATTERER_CATEGORIES),)),
+    'object_offsets': ('<i8', ()),
+    # 物体 [M, ...]
+    'object_type': ('i1', ()),
+    'object_center': ('<f8', (3,)),
+    'object_position': ('<f8', (3,)),
+    'object_direction': ('<f8', ()),
+    'object_velocity': ('<f8', ()),
+}
+_OFFSET_COLUMNS = ('scatterer_offsets', 'object_offsets')
+
+
+def _backend_for(path, backend=None):
+    """按扩展名推断后端：.h5 / .hdf5 为 'hdf5'，其余为 'npy' 目录"""
+    if backend is None:
+        backend = 'hdf5' if os.path.splitext(path)[1].lower() in ('.h5', '.hdf5') else 'npy'
+    if backend not in ('hdf5', 'npy'):
+        raise ValueError(f"未知的存储后端: {backend}")
+    if backend == 'hdf5' and h5py is None:
+        raise ImportError("'hdf5' 后端需要 h5py（pip install h5py），或改用 'npy' 目录后端")
+    return backend
+
+
+def scene_columns(scene_data, index=None):
+    """
+    把单个场景整理为列式存储的行（也可在 worker 中调用，只传输小数组）
+
+    参数：
+    - scene_data: 场景数据字典，或 SceneBatch
+    - index: scene_data 为 SceneBatch 时的批内场景下标
+
+    返回：
+    - dict: scatterers [n, 4]、scatterer_counts [4]、object_type / object_center / object_position /
+            object_direction / object_velocity（物体按先车辆后行人排列）
+    """
+    if index is not None:
+        scatterers = scene_data.scene_scatterers(index)
+        table = scene_data.scene_objects(index)
+        objects = {key: [table[key][field] for field in ('centers', 'positions', 'directions', 'velocities')]
+                   for key in OBJECT_CATEGORIES}
+    else:
+        scatterers = scene_data['scatterers']
+        objects = {key: [[getattr(o, attr) for o in scene_data['objects'][key]]
+                         for attr in ('center', 'requested_center', 'direction', 'velocity')]
+                   for key in OBJECT_CATEGORIES}
+
+    def stack(field, width=None):
+        parts = [np.asarray(objects[key][field], dtype=float) for key in OBJECT_CATEGORIES]
+        return np.concatenate([p.reshape(-1, width) if width else p.reshape(-1) for p in parts])
+
+    counts = [len(objects[key][3]) for key in OBJECT_CATEGORIES]
+    return {
+        'scatterers': np.concatenate([np.asarray(scatterers[key], dtype=float).reshape(-1, 4)
+                                      for key in SCATTERER_CATEGORIES]),
+        'scatterer_counts': np.array([len(scatterers[key]) for key in SCATTERER_CATEGORIES]),
+        'object_type': np.repeat(np.arange(len(OBJECT_CATEGORIES), dtype=np.int8), counts),
+        'object_center': stack(0, 3),
+        'object_position': stack(1, 3),
+        'object_direction': stack(2),
+        'object_velocity': stack(3),
+    }
+
+
+def scene_layout(scene_data):
+    """场景（字典或 SceneBatch）的固定布局（隔离带、路灯），存储为容器级属性"""
+    if isinstance(scene_data, SceneBatch):
+        barrier, lights = scene_data.barrier, scene_data.lights
+    else:
+        barrier, lights = scene_data['objects']['barrier'], scene_data['objects']['lights']
+    return {
+        'barrier': {
+            'start': np.asarray(barrier.requested_start, dtype=float).tolist(),
+            'center': np.asarray(barrier.center, dtype=float).tolist(),
+            'length': float(barrier.length),
+            'direction': float(barrier.direction),
+        },
+        'lights': {'centers': [np.asarray(l.center, dtype=float).tolist() for l in lights]},
+    }
+
+
+class _NpyBackend:
+    """目录后端：每列一个原始二进制文件，index.json 记录已提交的行数"""
+
+    def __init__(self, path, mode):
+        self.path = path
+        index_path = os.path.join(path, INDEX_NAME)
+        if os.path.exists(index_path):
+            with open(index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+        elif mode == 'r':
+            raise FileNotFoundError(f"未找到场景数据集: {index_path}")
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.index = {'format_version': FORMAT_VERSION, 'lengths': {name: 0 for name in COLUMNS},
+                          'meta_bytes': 0, 'attrs': {}}
+        if mode != 'r':
+            # 丢弃上次中断时未提交的尾部
+            for name, (dtype, shape) in COLUMNS.items():
+                self._truncate(self._column_path(name), self.index['lengths'][name] * self._row_bytes(name))
+            self._truncate(self._meta_path(), self.index['meta_bytes'])
+
+    def _column_path(self, name):
+        return os.path.join(self.path, name + '.bin')
+
+    def _meta_path(self):
+        return os.path.join(self.path, 'scene_meta.jsonl')
+
+    @staticmethod
+    def _row_bytes(name):
+        dtype, shape = COLUMNS[name]
+        return np.dtype(dtype).itemsize * int(np.prod(shape, dtype=int))
+
+    @staticmethod
+    def _truncate(path, size):
+        with open(path, 'ab') as f:
+            f.truncate(size)
+
+    @property
+    def attrs(self):
+        return self.index['attrs']
+
+    @attrs.setter
+    def attrs(self, value):
+        self.index['attrs'] = value
+
+    def length(self, name):
+        return self.index['lengths'][name]
+
+    def append(self, name, rows):
+        with open(self._column_path(name), 'ab') as f:
+            f.write(np.ascontiguousarray(rows, dtype=COLUMNS[name][0]).tobytes())
+        self.index['lengths'][name] += len(rows)
+
+    def append_meta(self, lines):
+        data = ''.join(line + '\n' for line in lines).encode('utf-8')
+        with open(self._meta_path(), 'ab') as f:
+            f.write(data)
+        self.index['meta_bytes'] += len(data)
+
+    def commit(self):
+        with atomic_output(os.path.join(self.path, INDEX_NAME)) as tmp_path:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, ensure_ascii=False)
+
+    def column(self, name):
+        dtype, shape = COLUMNS[name]
+        length = self.length(name)
+        if length == 0:
+            return np.empty((0,) + shape, dtype=dtype)
+        return np.memmap(self._column_path(name), dtype=dtype, mode='r', shape=(length,) + shape)
+
+    def meta(self):
+        with open(self._meta_path(), 'rb') as f:
+            data = f.read(self.index['meta_bytes'])
+        return data.decode('utf-8').splitlines()
+
+    def close(self):
+        pass
+
+
+class _Hdf5Backend:
+    """HDF5 后端：可扩展的分块压缩数据集，每次提交后 flush"""
+
+    def __init__(self, path, mode, chunk_rows=4096, compression='gzip'):
+        if mode == 'r':
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"未找到场景数据集: {path}")
+            self.file = h5py.File(path, 'r')
+            return
+        self.file = h5py.File(path, 'a')
+        if 'format_version' not in self.file.attrs:
+            self.file.attrs['format_version'] = FORMAT_VERSION
+            self.file.attrs['committed'] = json.dumps({name: 0 for name in COLUMNS} | {'scene_meta': 0})
+            for name, (dtype, shape) in COLUMNS.items():
+                self.file.create_dataset(name, shape=(0,) + shape, maxshape=(None,) + shape, dtype=dtype,
+                                         chunks=(chunk_rows,) + shape, compression=compression, shuffle=True)
+            self.file.create_dataset('scene_meta', shape=(0,), maxshape=(None,), dtype=h5py.string_dtype(),
+                                     chunks=(chunk_rows,))
+        # 丢弃上次中断时未提交的尾部
+        for name, length in self._committed().items():
+            self.file[name].resize(length, axis=0)
+
+    def _committed(self):
+        return json.loads(self.file.attrs['committed'])
+
+    @property
+    def attrs(self):
+        return json.loads(self.file.attrs.get('layout', '{}'))
+
+    @attrs.setter
+    def attrs(self, value):
+        self.file.attrs['layout'] = json.dumps(value, ensure_ascii=False)
+
+    def length(self, name):
+        return self._committed()[name]
+
+    def append(self, name, rows):
+        dataset = self.file[name]
+        start = dataset.shape[0]
+        dataset.resize(start + len(rows), axis=0)
+        dataset[start:] = rows
+
+    def append_meta(self, lines):
+        self.append('scene_meta', np.array(lines, dtype=object))
+
+    def commit(self):
+        self.file.attrs['committed'] = json.dumps({name: self.file[name].shape[0]
+                                                   for name in list(COLUMNS) + ['scene_meta']})
+        self.file.flush()
+
+    def column(self, name):
+        return self.file[name]          # h5py 数据集按切片惰性读取（只读取已提交的行）
+
+    def meta(self):
+        lines = self.file['scene_meta'][:self.length('scene_meta')]
+        return [line.decode('utf-8') if isinstance(line, bytes) else line for line in lines]
+
+    def close(self):
+        self.file.close()
+
+
+def _open_backend(path, mode, backend=None):
+    backend = _backend_for(path, backend)
+    return _Hdf5Backend(path, mode) if backend == 'hdf5' else _NpyBackend(path, mode)
+
+
+class SceneStoreWriter:
+    """
+    追加写入列式场景数据集
+
+    用法：
+        with SceneStoreWriter('scenario_1/scenes.h5') as writer:
+            writer.append_scene(scene_data, scene_id=1, meta={'seed': 0})
+    """
+
+    def __init__(self, path, backend=None, flush_every=64):
+        """
+        参数：
+        - path: 数据集路径（.h5 / .hdf5 为 HDF5 文件，否则为目录）
+        - backend: 'hdf5' / 'npy'，默认按扩展名推断
+        - flush_every: 每缓存多少个场景提交一次
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self._backend = _open_backend(path, 'a', backend)
+        for name in _OFFSET_COLUMNS:
+            if self._backend.length(name) == 0:
+                self._backend.append(name, [0])
+        self._offsets = {name: int(self._backend.column(name)[-1]) for name in _OFFSET_COLUMNS}
+        # 场景编号 -> 元数据（同一编号写入多次时以最后一行为准）
+        scene_ids = np.asarray(self._backend.column('scene_id')[:self._backend.length('scene_id')]).tolist()
+        self._meta = {scene_id: json.loads(line) for scene_id, line in zip(scene_ids, self._backend.meta())}
+        self._backend.commit()
+        self._pending = []
+
+    def __contains__(self, scene_id):
+        return scene_id in self._meta
+
+    def __len__(self):
+        return len(self._meta)
+
+    def meta(self, scene_id):
+        """已写入场景的元数据（不存在时为 None）"""
+        return self._meta.get(scene_id)
+
+    def matches(self, scene_id, meta):
+        """场景已写入且元数据包含 meta 的全部键值（如种子），用于断点续跑判断"""
+        stored = self._meta.get(scene_id)
+        return stored is not None and all(stored.get(key) == value for key, value in meta.items())
+
+    def set_layout(self, layout):
+        """设置固定布局（只在首次写入时设置一次）"""
+        if not self._backend.attrs:
+            self._backend.attrs = layout
+
+    def append_scene(self, scene_data, scene_id, meta=None, index=None):
+        """追加一个场景字典（或 SceneBatch 的第 index 个场景）"""
+        self.set_layout(scene_layout(scene_data))
+        self.append(scene_id, scene_columns(scene_data, index), meta)
+
+    def append(self, scene_id, columns, meta=None):
+        """
+        追加由 scene_columns() 得到的一行场景数据
+
+        参数：
+        - scene_id: 场景编号。编号已存在且元数据相同时忽略（断点续跑）；元数据不同（如以新的种子重新生成）时
+          追加新行替换旧场景，旧行不再被读取
+        - columns: scene_columns() 的返回值
+        - meta: 场景元数据（可 JSON 序列化）
+        """
+        scene_id = int(scene_id)
+        meta = json.loads(json.dumps(meta or {}))     # 与读回的元数据比较（元组变为列表等）
+        if self._meta.get(scene_id) == meta:
+            return
+        self._meta[scene_id] = meta
+        self._pending.append((scene_id, columns, meta))
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """把缓存的场景写入并提交"""
+        if not self._pending:
+            return
+        ids, columns, metas = zip(*self._pending)
+        self._pending = []
+
+        backend = self._backend
+        backend.append('scene_id', np.array(ids))
+        for name in ('scatterers', 'object_type', 'object_center', 'object_position',
+                     'object_direction', 'object_velocity'):
+            backend.append(name, np.concatenate([c[name] for c in columns]))
+        backend.append('scatterer_counts', np.stack([c['scatterer_counts'] for c in columns]))
+        for name, column in (('scatterer_offsets', 'scatterers'), ('object_offsets', 'object_type')):
+            offsets = self._offsets[name] + np.cumsum([len(c[column]) for c in columns])
+            backend.append(name, offsets)
+            self._offsets[name] = int(offsets[-1])
+        backend.append_meta([json.dumps(meta, ensure_ascii=False) for meta in metas])
+        backend.commit()
+
+    def close(self):
+        """提交剩余场景并关闭"""
+        self.flush()
+        self._backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SceneStore:
+    """
+    列式场景数据集读取器（按场景编号随机访问，只读取被访问场景的切片）
+
+    属性：
+    - scene_ids: 场景编号 [S]（按首次写入顺序；同一编号写入多次时读取最后一行）
+    - scatterer_offsets / object_offsets: 偏移索引 [S+1]
+    - scatterer_counts: 各类散射点数 [S, 4]
+    - layout: 固定布局（隔离带、路灯）
+    """
+
+    def __init__(self, path, backend=None):
+        self.path = path
+        self._backend = _open_backend(path, 'r', backend)
+        self.layout = self._backend.attrs
+        self.scene_ids, self.scatterer_offsets, self.object_offsets, self.scatterer_counts = (
+            np.asarray(self._backend.column(name)[:self._backend.length(name)])
+            for name in ('scene_id', 'scatterer_offsets', 'object_offsets', 'scatterer_counts'))
+        self._rows = {scene_id: row for row, scene_id in enumerate(self.scene_ids.tolist())}
+        self.scene_ids = np.array(list(self._rows), dtype=self.scene_ids.dtype)
+        self._meta = None
+
+    def __len__(self):
+        return len(self.scene_ids)
+
+    def __contains__(self, scene_id):
+        return scene_id in self._rows
+
+    def row_of(self, scene_id):
+        """场景编号对应的行号"""
+        try:
+            return self._rows[scene_id]
+        except KeyError:
+            raise KeyError(f"数据集中没有场景 {scene_id}") from None
+
+    def column(self, name):
+        """整列数据（npy 后端为 memmap，hdf5 后端为惰性数据集）"""
+        return self._backend.column(name)
+
+    def scatterers(self, scene_id, category='all'):
+        """
+        场景的散射点 [n, 4] - (x, y, z, velocity)
+
+        参数：
+        - scene_id: 场景编号
+        - category: 'all' 或 'vehicles' / 'barrier' / 'lights' / 'pedestrians'
+        """
+        row = self.row_of(scene_id)
+        start, stop = self.scatterer_offsets[row], self.scatterer_offsets[row + 1]
+        if category != 'all':
+            bounds = start + np.concatenate([[0], np.cumsum(self.scatterer_counts[row])])
+            k = SCATTERER_CATEGORIES.index(category)
+            start, stop = bounds[k], bounds[k + 1]
+        return np.asarray(self._backend.column('scatterers')[start:stop])
+
+    def objects(self, scene_id):
+        """
+        场景的物体表
+
+        返回：dict with keys 'vehicles', 'pedestrians'，各含
+            - centers [K, 3]、positions [K, 3]、directions [K]、velocities [K]
+        """
+        row = self.row_of(scene_id)
+        sl = slice(self.object_offsets[row], self.object_offsets[row + 1])
+        object_type = np.asarray(self._backend.column('object_type')[sl])
+        columns = {key: np.asarray(self._backend.column(name)[sl]) for key, name in (
+            ('centers', 'object_center'), ('positions', 'object_position'),
+            ('directions', 'object_direction'), ('velocities', 'object_velocity'))}
+        return {category: {key: value[object_type == k] for key, value in columns.items()}
+                for k, category in enumerate(OBJECT_CATEGORIES)}
+
+    def meta(self, scene_id):
+        """场景元数据（写入时的 meta 字典）"""
+        if self._meta is None:
+            self._meta = self._backend.meta()
+        return json.loads(self._meta[self.row_of(scene_id)])
+
+    def scene(self, scene_id):
+        """
+        读取单个场景（字段与 save_scene_to_mat 保存的 .mat 一致）
+
+        返回：
+        - dict: scene_id, scatterers{all, vehicles, barrier, lights, pedestrians}, vehicles, pedestrians, meta
+        """
+        points = self.scatterers(scene_id)
+        bounds = np.concatenate([[0], np.cumsum(self.scatterer_counts[self.row_of(scene_id)])])
+        scatterers = {key: points[bounds[k]:bounds[k + 1]] for k, key in enumerate(SCATTERER_CATEGORIES)}
+        scatterers['all'] = points
+        return {'scene_id': scene_id, 'scatterers': scatterers, **self.objects(scene_id),
+                'meta': self.meta(scene_id)}
+
+    def __iter__(self):
+        for scene_id in self.scene_ids.tolist():
+            yield self.scene(scene_id)
+
+    def close(self):
+        self._backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
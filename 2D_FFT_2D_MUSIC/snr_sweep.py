@@ -0,0 +1,376 @@
+"""
+多 SNR 扫描（替代 run_single_snr_batch_*.m 的五份拷贝）
+- 读取 save_scene_to_mat 生成的 scenario_N/mat_files/scene_*.mat
+- 每个场景只合成一次无噪声几何回波（接收信号取 1）
+- 回波对接收信号逐元素线性，各 SNR 只需生成含噪接收信号，并与参考矩阵合并后做 Range-Doppler FFT 与 CFAR
+- 输出目录结构与 MATLAB 流程一致：output_dir/scene_XXX/SNR_Inf|SNR_%ddB/results.mat
+- --workers N 时按场景并行，参考信号只发布一次到共享内存，所有 worker 零拷贝挂载
+"""
+
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from contextlib import ExitStack
+from datetime import datetime
+
+import numpy as np
+import scipy.io as sio
+
+from cfar import osca_cfar_snr
+from job_manifest import JobManifest, atomic_output, file_sha256, job_key
+from radar_echo import BASE_POS, compute_point_info, default_radar_params, generate_radar_echo
+from range_doppler import RangeDopplerProcessor
+from reference_cache import (SharedReference, attach, get_or_publish_npy, init_worker_reference,
+                             load_ofdm_signal_mat, random_reference_signal, worker_reference)
+from scene_dataset import load_scene_mat, scene_id_from_path
+
+
+DEFAULT_SNR_LIST = (np.inf, 10, 0, -10, -20)
+
+
+def snr_folder_name(snr_db):
+    """SNR 结果文件夹名（与 run_single_snr_batch.m 一致）"""
+    return 'SNR_Inf' if np.isinf(snr_db) else f'SNR_{int(snr_db)}dB'
+
+
+def demodulate_qam4(symbols):
+    """
+    4QAM 硬判决解调（与 demoduqam4.m 的最近星座点判决一致）
+
+    返回：
+    - ndarray: 比特序列 [2 * len(symbols)]
+    """
+    symbols = np.asarray(symbols).ravel()
+    bits = np.empty((symbols.size, 2), dtype=np.int8)
+    bits[:, 0] = symbols.imag < 0
+    bits[:, 1] = symbols.real > 0
+    return bits.ravel()
+
+
+def add_noise(complex_carrier_matrix, snr_db, rng, signal_power=None):
+    """
+    生成含噪的频域接收信号（func_add_noise.m + func_ofdm_demodulation.m 的频域等效）
+
+    MATLAB 流程在时域对发送信号叠加实高斯白噪声（方差 = 信号功率 / SNR），
+    去除循环前后缀并 FFT 后得到接收信号。这里直接对每个 OFDM 符号的时域噪声做 FFT 叠加到发送符号上。
+
+    参数：
+    - complex_carrier_matrix: 发送符号 [symbols_per_carrier, IFFT_length]
+    - snr_db: 信噪比（dB），inf 表示无噪声
+    - rng: numpy Generator
+    - signal_power: 时域发送信号功率（默认由 complex_carrier_matrix 的 IFFT 估计，
+                    给定 windowed_Tx_data 时可取 np.var(windowed_Tx_data)）
+
+    返回：
+    - Rx_complex_carrier_matrix: [symbols_per_carrier, IFFT_length]
+    """
+    complex_carrier_matrix = np.asarray(complex_carrier_matrix)
+    if np.isinf(snr_db):
+        return complex_carrier_matrix.astype(complex)
+    if signal_power is None:
+        signal_power = np.var(np.fft.ifft(complex_carrier_matrix, axis=1))
+    noise_scale = np.sqrt(signal_power / 10 ** (snr_db / 10))
+    noise = rng.standard_normal(complex_carrier_matrix.shape) * noise_scale
+    return complex_carrier_matrix + np.fft.fft(noise, axis=1)
+
+
+def sweep_scene(environment_point, snr_list, reference, radar_params, processor, rngs,
+                base_pos=BASE_POS, dtype=np.complex128, chunk_size=None, signal_power=None):
+    """
+    对单个场景完成所有 SNR 等级的处理（无噪声回波只合成一次）
+
+    参数：
+    - environment_point: 散射点 [N, 4]
+    - snr_list: SNR 列表（dB）
+    - reference: 参考信号（含 complex_carrier_matrix，可选 baseband_out）
+    - radar_params: 雷达参数字典
+    - processor: RangeDopplerProcessor（同一参考信号下复用）
+    - rngs: 每个 SNR 的噪声 Generator 列表（与 snr_list 对应）
+    - base_pos, dtype, chunk_size: 见 radar_echo
+    - signal_power: 时域发送信号功率（见 add_noise）
+
+    返回：
+    - point_info: [N, 4]
+    - results: list of dict（每个 SNR 一项，字段与 results.mat 一致，RD_target_index 为 0 起始）
+    """
+    complex_carrier_matrix = reference['complex_carrier_matrix']
+    point_info = compute_point_info(environment_point, base_pos)
+
+    unit_rx = np.ones((radar_params['symbols_per_carrier'], radar_params['IFFT_length']))
+    geometry_echo = generate_radar_echo(unit_rx, point_info, radar_params, dtype=dtype, chunk_size=chunk_size)
+    Velocity_fft = np.empty_like(geometry_echo)
+
+    results = []
+    for snr_db, rng in zip(snr_list, rngs):
+        Rx_complex_carrier_matrix = add_noise(complex_carrier_matrix, snr_db, rng, signal_power)
+        BER = np.nan
+        if 'baseband_out' in reference:
+            baseband_in = demodulate_qam4(Rx_complex_carrier_matrix)
+            BER = np.count_nonzero(baseband_in != reference['baseband_out']) / baseband_in.size
+
+        processor.process(geometry_echo, out=Velocity_fft, scale=Rx_complex_carrier_matrix)
+        RD_threshold_matrix, RD_target_index, RD_detect_matrix_abs = osca_cfar_snr(Velocity_fft[:, :, 0, 0], snr_db)
+        results.append({
+            'SNR_TARGET': snr_db,
+            'BER': BER,
+            'Velocity_fft_antenna_1_1': Velocity_fft[:, :, 0, 0].copy(),
+            'RD_threshold_matrix': RD_threshold_matrix,
+            'RD_target_index': RD_target_index,
+            'RD_detect_matrix_abs': RD_detect_matrix_abs,
+        })
+    return point_info, results
+
+
+def reference_digest(reference, radar_params, base_pos=BASE_POS):
+    """
+    参考信号与雷达参数的摘要（SHA-256 前 16 位），记录在任务清单中，参考信号或参数变化时重新计算
+
+    参数：
+    - reference: 参考信号（含 complex_carrier_matrix，可选 baseband_out / windowed_Tx_data）
+    - radar_params: 雷达参数字典
+    - base_pos: 基站位置
+    """
+    digest = hashlib.sha256()
+    for key in ('complex_carrier_matrix', 'baseband_out', 'windowed_Tx_data'):
+        if key in reference:
+            array = np.ascontiguousarray(reference[key])
+            digest.update(f'{key}:{array.dtype.str}:{array.shape}'.encode())
+            digest.update(array.tobytes())
+    digest.update(json.dumps({'radar_params': radar_params, 'base_pos': list(base_pos)}, sort_keys=True,
+                             default=float).encode())
+    return digest.hexdigest()[:16]
+
+
+def _sweep_scene_task(task, context):
+    """
+    处理单个场景的待算 SNR，原子写出 scene_info.mat 与各 SNR 的 results.mat（串行与 worker 共用）
+
+    参数：
+    - task: (scene_id, mat_path, pending)，pending 为待处理的 SNR 列表
+    - context: 参考信号、processor 与扫描设置（见 run_snr_sweep）
+
+    返回：
+    - outputs: {snr: {结果文件路径: sha256}}（清单由主进程记录）
+    - infos: {snr: {'BER', 'num_targets'}}
+    - elapsed: 耗时（秒）
+    """
+    scene_id, mat_path, pending = task
+    scene_start = time.time()
+    snr_list = context['snr_list']
+    scene_output_dir = os.path.join(context['output_dir'], os.path.splitext(os.path.basename(mat_path))[0])
+
+    environment_point = load_scene_mat(mat_path)['scatterers']['all']
+    # 噪声子流由场景编号（而非在目录中的位置）决定，增删其他场景文件不影响本场景
+    scene_seed = np.random.SeedSequence([context['seed'], scene_id])
+    snr_rngs = {snr: np.random.default_rng(child) for snr, child in zip(snr_list, scene_seed.spawn(len(snr_list)))}
+
+    # 噪声子流按完整 SNR 列表分配，只处理部分 SNR（续跑）时结果不变
+    point_info, results = sweep_scene(environment_point, pending, context['reference'], context['radar_params'],
+                                      context['processor'], [snr_rngs[snr] for snr in pending],
+                                      context['base_pos'], context['dtype'], context['chunk_size'],
+                                      context['signal_power'])
+
+    # 场景文件可能已重新生成，scene_info.mat 随结果一起重写
+    with atomic_output(os.path.join(scene_output_dir, 'scene_info.mat')) as tmp_path:
+        sio.savemat(tmp_path, {'scene_name': os.path.basename(mat_path),
+                               'environment_point': environment_point,
+                               'point_info': point_info}, do_compression=True)
+
+    outputs, infos = {}, {}
+    for snr, result in zip(pending, results):
+        result_file = os.path.join(scene_output_dir, snr_folder_name(snr), 'results.mat')
+        mat_result = dict(result, RD_target_index=result['RD_target_index'] + 1)   # MATLAB 1 起始
+        with atomic_output(result_file) as tmp_path:
+            sio.savemat(tmp_path, mat_result, do_compression=True)
+        outputs[snr] = {result_file: file_sha256(result_file)}
+        infos[snr] = {'BER': result['BER'], 'num_targets': len(result['RD_target_index'])}
+    return outputs, infos, time.time() - scene_start
+
+
+# worker 进程内的扫描上下文（由 _init_sweep_worker 设置）
+_WORKER_CONTEXT = None
+
+
+def _init_sweep_worker(handle, settings):
+    """multiprocessing.Pool 的 initializer：挂载共享参考信号并构建本进程的 processor"""
+    global _WORKER_CONTEXT
+    init_worker_reference(handle)
+    reference = worker_reference()
+    _WORKER_CONTEXT = dict(settings, reference=reference, processor=RangeDopplerProcessor(
+        reference['complex_carrier_matrix'], settings['radar_params'], workers=settings['fft_workers']))
+
+
+def _sweep_worker_task(task):
+    """worker 入口"""
+    return _sweep_scene_task(task, _WORKER_CONTEXT)
+
+
+def run_snr_sweep(scene_dir, output_dir='snr_simulation_results', snr_list=DEFAULT_SNR_LIST,
+                  reference=None, radar_params=None, base_pos=BASE_POS, seed=0,
+                  dtype=np.complex128, chunk_size=None, fft_workers=None, overwrite=False, workers=1):
+    """
+    多 SNR 批量处理（workers > 1 时按场景并行）
+
+    参数：
+    - scene_dir: 场景 .mat 目录（如 scenario_1/mat_files）
+    - output_dir: 输出根目录
+    - snr_list: SNR 列表（dB），np.inf 表示无噪声
+    - reference: 参考信号（attach() 的返回值或含 complex_carrier_matrix 的 dict，默认按 seed 生成随机 4QAM）
+    - radar_params: 雷达参数字典（默认取参考信号中的 radar_params，否则 default_radar_params()）
+    - base_pos: 基站位置
+    - seed: 噪声随机种子（按 (seed, 场景编号, SNR) 使用独立子流，结果与处理顺序、并行度及目录中其他场景无关）
+    - dtype: 回波数据类型（complex64 可减半内存）
+    - chunk_size: 回波合成的散射点分块大小
+    - fft_workers: FFT 线程数（每个进程）
+    - overwrite: 是否重新计算已完成的 SNR（默认按 output_dir/manifest.json 跳过，支持中断后续跑；
+                 场景 .mat 的内容哈希或参考信号摘要与记录不一致时总是重新计算）
+    - workers: 并行进程数。大于 1 时参考信号发布到共享内存（SharedReference），
+               所有 worker 在 Pool initializer 中零拷贝挂载；每个 worker 各自持有一个场景的回波，内存随 workers 线性增长
+
+    返回：
+    - dict: 统计信息
+    """
+    scene_files = sorted((scene_id, path) for path in glob.glob(os.path.join(scene_dir, 'scene_*.mat'))
+                         if (scene_id := scene_id_from_path(path)) is not None)
+    if not scene_files:
+        raise FileNotFoundError(f"在目录 {scene_dir} 中未找到场景文件")
+    mat_files = [path for _, path in scene_files]
+
+    params = getattr(reference, 'params', {}) if reference is not None else {}
+    if radar_params is None:
+        radar_params = default_radar_params(**params.get('radar_params', {}))
+    if reference is None:
+        reference = random_reference_signal(radar_params, seed=seed)
+    snr_list = [float(snr) for snr in snr_list]
+    settings = {
+        'output_dir': output_dir, 'snr_list': snr_list, 'radar_params': radar_params, 'base_pos': base_pos,
+        'seed': seed, 'dtype': dtype, 'chunk_size': chunk_size, 'fft_workers': fft_workers,
+        'signal_power': np.var(reference['windowed_Tx_data']) if 'windowed_Tx_data' in reference else None,
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = JobManifest(output_dir)
+
+    print(f"\n{'='*60}")
+    print(f"多SNR扫描: {len(mat_files)} 个场景 × {len(snr_list)} 个SNR等级" + (f"（{workers} 进程）" if workers > 1 else ""))
+    print(f"SNR列表: {', '.join(snr_folder_name(s) for s in snr_list)}")
+    print(f"{'='*60}\n")
+
+    # 结果依赖的输入：场景文件内容与参考信号，任一变化时已完成的结果作废
+    reference_id = reference_digest(reference, radar_params, base_pos)
+    tasks, task_inputs, skipped = [], [], 0
+    for scene_id, mat_path in scene_files:
+        scene_basename = os.path.splitext(os.path.basename(mat_path))[0]
+        inputs = {'scene_sha256': file_sha256(mat_path), 'reference': reference_id}
+
+        def is_current(snr):
+            key = job_key(scene_basename, seed, snr_folder_name(snr))
+            return (manifest.is_complete(key)
+                    and all(manifest.get(key)['info'].get(name) == value for name, value in inputs.items()))
+
+        pending = [snr for snr in snr_list if overwrite or not is_current(snr)]
+        if pending:
+            tasks.append((scene_id, mat_path, pending))
+            task_inputs.append(inputs)
+        else:
+            skipped += 1
+            print(f"⚠ 场景 {scene_basename} 的所有SNR结果已存在，跳过")
+
+    total_start = time.time()
+    scene_times = []
+    # 清单只由主进程记录，按时间间隔写回，结束或中断时再写回一次
+    with ExitStack() as stack:
+        stack.callback(manifest.flush, force=True)
+        if workers > 1 and len(tasks) > 1:
+            shared = stack.enter_context(SharedReference(dict(reference), {'radar_params': radar_params}))
+            pool = stack.enter_context(multiprocessing.Pool(
+                min(workers, len(tasks)), initializer=_init_sweep_worker, initargs=(shared.handle, settings)))
+            completed = pool.imap(_sweep_worker_task, tasks)
+        else:
+            context = dict(settings, reference=reference, processor=RangeDopplerProcessor(
+                reference['complex_carrier_matrix'], radar_params, workers=fft_workers))
+            completed = (_sweep_scene_task(task, context) for task in tasks)
+
+        for task_idx, ((_, mat_path, pending), inputs, (outputs, infos, elapsed)) in enumerate(
+                zip(tasks, task_inputs, completed)):
+            scene_basename = os.path.splitext(os.path.basename(mat_path))[0]
+            for snr in pending:
+                manifest.finish(job_key(scene_basename, seed, snr_folder_name(snr)),
+                                {manifest.relpath(path): digest for path, digest in outputs[snr].items()},
+                                info=dict(infos[snr], **inputs), duration=elapsed / len(pending), flush=False)
+            manifest.flush()
+
+            scene_times.append(elapsed)
+            detections = ', '.join(f"{snr_folder_name(s)}:{infos[s]['num_targets']}" for s in pending)
+            print(f"✓ [{task_idx + 1}/{len(tasks)}] {scene_basename} 完成，耗时 {elapsed:.2f} 秒 ({detections})")
+
+    total_time = time.time() - total_start
+    for snr in snr_list:
+        with atomic_output(os.path.join(output_dir, f'completed_{snr_folder_name(snr)}.txt')) as tmp_path, \
+                open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(f"处理完成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"SNR等级: {snr_folder_name(snr)}\n")
+            f.write(f"总场景数: {len(mat_files)}\n")
+            f.write(f"总运行时间: {total_time:.2f} 秒\n")
+
+    print(f"\n✓ 多SNR扫描完成！处理 {len(scene_times)} 个场景，跳过 {skipped} 个，总耗时 {total_time:.2f} 秒")
+    return {'num_scenes': len(mat_files), 'processed': len(scene_times), 'skipped': skipped,
+            'total_time': total_time, 'scene_times': scene_times}
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='多SNR扫描（无噪声回波只合成一次）')
+    parser.add_argument('--scene-dir', type=str, default='scenario_1/mat_files', help='场景 .mat 目录')
+    parser.add_argument('--output-dir', type=str, default='snr_simulation_results', help='输出目录')
+    parser.add_argument('--snr', type=float, nargs='+', default=list(DEFAULT_SNR_LIST),
+                        help='SNR 列表（dB），inf 表示无噪声')
+    parser.add_argument('--reference-mat', type=str, default=None,
+                        help='复用 MATLAB 流程的 ofdm_signal_data.mat（默认在输出目录发布随机 4QAM 参考信号）')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--complex64', action='store_true', help='回波使用 complex64（内存减半）')
+    parser.add_argument('--chunk-size', type=int, default=None, help='回波合成的散射点分块大小')
+    parser.add_argument('--fft-workers', type=int, default=None, help='FFT 线程数（每个进程）')
+    parser.add_argument('--workers', type=int, default=1, help='并行进程数（按场景并行，参考信号经共享内存挂载）')
+    parser.add_argument('--overwrite', action='store_true', help='覆盖已有结果（默认跳过，支持续跑）')
+
+    args = parser.parse_args()
+
+    base_pos = BASE_POS
+    if args.reference_mat:
+        reference, params = load_ofdm_signal_mat(args.reference_mat)
+        radar_params = default_radar_params(**params.get('radar_params', {}))
+        base_pos = tuple(params.get('base_pos', base_pos))
+        print(f"✓ 已加载参考信号: {args.reference_mat}")
+    else:
+        radar_params = default_radar_params()
+        handle = get_or_publish_npy(
+            os.path.join(args.output_dir, 'ofdm_reference'),
+            lambda: (random_reference_signal(radar_params, seed=args.seed), {'radar_params': radar_params}))
+        reference = attach(handle)
+        radar_params = default_radar_params(**reference.params['radar_params'])
+        print(f"✓ 参考信号: {handle['directory']}")
+
+    run_snr_sweep(
+        scene_dir=args.scene_dir,
+        output_dir=args.output_dir,
+        snr_list=args.snr,
+        reference=reference,
+        radar_params=radar_params,
+        base_pos=base_pos,
+        seed=args.seed,
+        dtype=np.complex64 if args.complex64 else np.complex128,
+        chunk_size=args.chunk_size,
+        fft_workers=args.fft_workers,
+        overwrite=args.overwrite,
+        workers=args.workers
+    )
+
+
+if __name__ == '__main__':
+    main()
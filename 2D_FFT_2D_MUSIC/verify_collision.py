@@ -7,6 +7,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import Circle
 from monte_carlo_generator_scenario1 import MonteCarloSceneGenerator, visualize_scene
+from scene_batch import SceneBatch
 
 
 def visualize_with_collision_circles(scene_data, save_path=None):
@@ -137,16 +138,23 @@ Safety Buffer: {config.SAFETY_BUFFER}m"""
     return fig, ax
 
 
-def verify_no_collision(scene_data):
+def verify_no_collision(scene_data, index=None):
     """
     程序化验证是否有碰撞
     
+    参数：
+    - scene_data: 场景数据字典，或 SceneBatch
+    - index: scene_data 为 SceneBatch 时要验证的场景下标（None 表示验证全部场景）
+    
     返回：
     - bool: True=无碰撞, False=有碰撞
     """
     from monte_carlo_generator_scenario1 import SceneConfig
     config = SceneConfig()
     
+    if isinstance(scene_data, SceneBatch):
+        return _verify_scene_batch(scene_data, config, index)
+    
     vehicles = scene_data['objects']['vehicles']
     pedestrians = scene_data['objects']['pedestrians']
     lights = scene_data['objects']['lights']
@@ -210,6 +218,54 @@ def verify_no_collision(scene_data):
     return not has_collision
 
 
+def _verify_scene_batch(batch, config, index=None):
+    """
+    批量验证 SceneBatch 中的场景（逐场景两两比较，向量化）
+    
+    返回：
+    - bool: True=所有场景均无碰撞
+    """
+    # 每个物体的实际中心与半径；路灯追加到每个场景末尾
+    radius_by_type = np.array([config.VEHICLE_RADIUS, config.PEDESTRIAN_RADIUS])
+    centroids = batch.object_centroids()
+    radii = radius_by_type[batch.object_type]
+    light_centers = np.array([l.requested_position[:2] for l in batch.lights], dtype=float).reshape(-1, 2)
+    
+    scene_indices = range(len(batch)) if index is None else [index]
+    counts = np.diff(batch.object_offsets)
+    max_objects = int(counts.max(initial=0)) + light_centers.shape[0]
+    
+    # 填充为 [S, P] 数组，空槽位半径为 NaN（比较恒为 False）
+    scene_indices = np.asarray(scene_indices)
+    centers = np.zeros((len(scene_indices), max_objects, 2))
+    padded_r = np.full((len(scene_indices), max_objects), np.nan)
+    for row, scene in enumerate(scene_indices):
+        sl = slice(batch.object_offsets[scene], batch.object_offsets[scene + 1])
+        n = counts[scene]
+        centers[row, :n] = centroids[sl]
+        padded_r[row, :n] = radii[sl]
+        centers[row, n:n + light_centers.shape[0]] = light_centers
+        padded_r[row, n:n + light_centers.shape[0]] = config.LIGHT_RADIUS
+    
+    distance = np.linalg.norm(centers[:, :, None, :] - centers[:, None, :, :], axis=-1)
+    min_distance = padded_r[:, :, None] + padded_r[:, None, :] + config.SAFETY_BUFFER
+    upper = np.triu(np.ones((max_objects, max_objects), dtype=bool), k=1)
+    collisions = (distance < min_distance) & upper
+    
+    has_collision = False
+    for row, i, j in zip(*np.nonzero(collisions)):
+        print(f"⚠ 碰撞检测到! 场景 {scene_indices[row]}")
+        print(f"  物体 {i} @ {centers[row, i]}")
+        print(f"  物体 {j} @ {centers[row, j]}")
+        print(f"  距离: {distance[row, i, j]:.2f}m < 最小距离: {min_distance[row, i, j]:.2f}m")
+        has_collision = True
+    
+    if not has_collision:
+        print(f"✓ 验证通过：{len(scene_indices)} 个场景中所有物体之间无碰撞")
+    
+    return not has_collision
+
+
 def main():
     """主函数"""
     print("=" * 60)
@@ -1,13 +1,16 @@
 from scipy.io import loadmat
-from matplotlib import pyplot as plt
 import numpy as np
-import cv2
-import imageio
-import math
-from shapely.geometry import Polygon
+from scipy.optimize import linear_sum_assignment
+from scipy.spatial import cKDTree
 from scipy.spatial.distance import directed_hausdorff
 
 
+# pos_metric 使用的投影：x 轴、y 轴与 xz 平面
+PROJECTIONS = {'x': [0], 'y': [1], 'xz': [0, 2]}
+POS_METRIC_MODES = ('kdtree', 'legacy')
+VELOCITY_METRIC_MODES = ('sorted', 'hungarian', 'legacy')
+
+
 def dataloader():
     # load original pos & imaging pos
     true_pos = loadmat('./data/pos_all_true.mat')
@@ -27,7 +30,86 @@ def density_mertic(true_pos, imaging_pos, env_size):
     return metric_value
 
 
-def velociy_metric(true_pos, imaging_pos):
+def select_velocities(imaging_velocities, k, counts=None):
+    """
+    成像点云中出现次数最多的 k 个速度值
+
+    计数大于第 k 大计数的速度全部入选，与之相等的按速度从小到大补足（并列时结果确定）
+
+    参数：
+    - imaging_velocities: 成像点的速度；给出 counts 时为已去重的速度（升序，如 np.unique 的结果）
+    - k: 选出的个数
+    - counts: 各速度的出现次数（分块统计后合并时使用），None 表示由 imaging_velocities 统计
+
+    返回：
+    - (selected, unique_count)：入选的速度（升序），成像点云中不同速度的个数
+    """
+    if counts is None:
+        img_array, img_count = np.unique(imaging_velocities, return_counts=True)
+    else:
+        img_array, img_count = np.asarray(imaging_velocities), np.asarray(counts)
+    if len(img_array) <= k:
+        return img_array, len(img_array)
+    kth_count = -np.partition(-img_count, k - 1)[k - 1]
+    selected = img_count > kth_count
+    ties = np.flatnonzero(img_count == kth_count)
+    selected[ties[:k - np.count_nonzero(selected)]] = True
+    return img_array[selected], len(img_array)
+
+
+def match_velocities(true_array, img_array, mode='sorted'):
+    """
+    真值速度集合与选出的成像速度集合配对，返回每对速度标准差的平均值
+
+    参数：
+    - true_array: 真值中不同的速度（升序）
+    - img_array: select_velocities 选出的成像速度
+    - mode: 'sorted' 或 'hungarian'（见 velociy_metric）
+
+    返回：
+    - float；任一集合为空时为 NaN
+    """
+    if len(img_array) == 0 or len(true_array) == 0:
+        return float('nan')
+
+    # 代价为 |差| 时，两组数量相同则按大小顺序配对即为最优配对，只有真值更多时才需要求解指派问题
+    if mode == 'hungarian' and len(img_array) < len(true_array):
+        cost = np.abs(true_array[:, None] - img_array[None, :]) / 2
+        rows, cols = linear_sum_assignment(cost)
+        return float(cost[rows, cols].mean())
+
+    # 与原实现相同的配对与求和顺序：降序排列后前 k 个逐个配对，逐项累加
+    true_sorted = np.sort(-true_array)[:len(img_array)]
+    img_sorted = np.sort(-img_array)
+    pair_std = np.std(np.stack([true_sorted, img_sorted]), axis=0)
+    return float(np.cumsum(pair_std)[-1] / len(img_sorted))
+
+
+def velociy_metric(true_pos, imaging_pos, mode='sorted'):
+    """
+    速度指标：真值速度集合与成像速度集合配对后，每对速度标准差（|差| / 2）的平均值
+
+    参数：
+    - true_pos, imaging_pos: 点云 [N, 4]，第 4 列为速度
+    - mode: 'sorted'（按出现次数选出 k 个成像速度，与真值各自降序后逐个配对，向量化）、
+            'hungarian'（同样选出 k 个成像速度，用 linear_sum_assignment 求使总偏差最小的配对）、
+            'legacy'（原循环实现）
+            其中 k = min(真值速度数, 成像速度数)
+
+    返回：
+    - float；成像点云为空时为 NaN（legacy 模式抛出 ZeroDivisionError）
+    """
+    if mode == 'legacy':
+        return _velociy_metric_legacy(true_pos, imaging_pos)
+    if mode not in VELOCITY_METRIC_MODES:
+        raise ValueError(f"未知的 velociy_metric 模式: {mode}（可选 {', '.join(VELOCITY_METRIC_MODES)}）")
+
+    true_array = np.unique(true_pos[:, 3])
+    img_array, _ = select_velocities(imaging_pos[:, 3], len(true_array))
+    return match_velocities(true_array, img_array, mode)
+
+
+def _velociy_metric_legacy(true_pos, imaging_pos):
     # True Velocity
     true_array = np.unique(true_pos[:, 3])
     # Estimate Velocity
@@ -51,7 +133,125 @@ def velociy_metric(true_pos, imaging_pos):
     return sum_d
 
 
-def pos_metric(true_pos, imaging_pos, env_size):
+class NearestNeighbourMetrics:
+    """
+    真值与成像点云在各投影上的双向最近邻距离
+
+    每个点云的每个投影只建一棵 cKDTree，正向（真值 -> 成像）与反向（成像 -> 真值）各查询一次，
+    Hausdorff、Chamfer、百分位 Hausdorff 与 F-score 都由同一组最近邻距离计算。
+    """
+
+    def __init__(self, true_pos, imaging_pos, env_size, projections=PROJECTIONS, workers=1):
+        """
+        参数：
+        - true_pos: 真值点云 [N, >=3]
+        - imaging_pos: 成像点云 [M, >=3]
+        - env_size: 坐标平移量（与 pos_metric 相同，先减去 env_size 再计算，保证与旧实现逐位一致）
+        - projections: {名称: 坐标列}
+        - workers: cKDTree.query 的并行线程数（-1 为全部核）
+        """
+        offset = np.asarray(env_size, dtype=float)
+        self.forward = {}   # 每个真值点到成像点云的最近距离
+        self.reverse = {}   # 每个成像点到真值点云的最近距离
+        for name, columns in projections.items():
+            true_proj = true_pos[:, columns] - offset[columns]
+            imaging_proj = imaging_pos[:, columns] - offset[columns]
+            if len(true_proj) == 0 or len(imaging_proj) == 0:
+                self.forward[name] = np.full(len(true_proj), np.inf)
+                self.reverse[name] = np.full(len(imaging_proj), np.inf)
+                continue
+            self.forward[name] = cKDTree(imaging_proj).query(true_proj, workers=workers)[0]
+            self.reverse[name] = cKDTree(true_proj).query(imaging_proj, workers=workers)[0]
+
+    @staticmethod
+    def _max(distances):
+        return distances.max() if len(distances) else 0.0
+
+    def hausdorff(self, name):
+        """对称 Hausdorff 距离 max(h(A, B), h(B, A))"""
+        return float(max(self._max(self.forward[name]), self._max(self.reverse[name])))
+
+    def percentile_hausdorff(self, name, percentile=95):
+        """百分位 Hausdorff 距离（忽略最远的离群点）"""
+        return float(max(np.percentile(self.forward[name], percentile) if len(self.forward[name]) else 0.0,
+                         np.percentile(self.reverse[name], percentile) if len(self.reverse[name]) else 0.0))
+
+    def chamfer(self, name):
+        """Chamfer 距离：双向平均最近邻距离之和"""
+        return float(np.mean(self.forward[name]) + np.mean(self.reverse[name]))
+
+    def fscore(self, name, threshold=0.5):
+        """
+        阈值 F-score
+
+        返回：
+        - (precision, recall, fscore)：precision 为成像点中距真值不超过 threshold 的比例，
+          recall 为真值点中距成像点不超过 threshold 的比例
+        """
+        precision = float(np.mean(self.reverse[name] <= threshold)) if len(self.reverse[name]) else 0.0
+        recall = float(np.mean(self.forward[name] <= threshold)) if len(self.forward[name]) else 0.0
+        fscore = 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+        return precision, recall, fscore
+
+
+def pos_metric_variants(true_pos, imaging_pos, env_size, percentile=95, threshold=0.5, workers=1):
+    """
+    位置指标的各种变体（一次最近邻查询）
+
+    参数：
+    - true_pos, imaging_pos, env_size: 同 pos_metric
+    - percentile: 百分位 Hausdorff 的百分位
+    - threshold: F-score 的距离阈值 (m)
+    - workers: cKDTree.query 的并行线程数
+
+    返回：
+    - dict: hausdorff（三个投影之和，即 pos_metric）、chamfer、percentile_hausdorff（之和）、
+            precision / recall / fscore（三个投影的平均），以及 projections 中各投影的分项
+    """
+    nn = NearestNeighbourMetrics(true_pos, imaging_pos, env_size, workers=workers)
+    return summarize_pos_variants(nn, percentile, threshold)
+
+
+def summarize_pos_variants(nn, percentile=95, threshold=0.5):
+    """由已计算的最近邻距离（NearestNeighbourMetrics 或其分块版本）汇总 pos_metric_variants 的结果"""
+    projections = {}
+    for name in PROJECTIONS:
+        precision, recall, fscore = nn.fscore(name, threshold)
+        projections[name] = {
+            'hausdorff': nn.hausdorff(name),
+            'chamfer': nn.chamfer(name),
+            'percentile_hausdorff': nn.percentile_hausdorff(name, percentile),
+            'precision': precision,
+            'recall': recall,
+            'fscore': fscore,
+        }
+    result = {key: sum(p[key] for p in projections.values())
+              for key in ('hausdorff', 'chamfer', 'percentile_hausdorff')}
+    result.update({key: float(np.mean([p[key] for p in projections.values()]))
+                   for key in ('precision', 'recall', 'fscore')})
+    result['projections'] = projections
+    return result
+
+
+def pos_metric(true_pos, imaging_pos, env_size, mode='kdtree', workers=1):
+    """
+    位置指标：x 轴、y 轴与 xz 平面投影上对称 Hausdorff 距离之和
+
+    参数：
+    - true_pos, imaging_pos: 点云 [N, >=3]
+    - env_size: 坐标平移量
+    - mode: 'kdtree'（每个投影建一次 cKDTree）或 'legacy'（原 directed_hausdorff 实现）
+    - workers: kdtree 模式下 cKDTree.query 的并行线程数
+    """
+    if mode == 'legacy':
+        return _pos_metric_legacy(true_pos, imaging_pos, env_size)
+    if mode != 'kdtree':
+        raise ValueError(f"未知的 pos_metric 模式: {mode}（可选 {', '.join(POS_METRIC_MODES)}）")
+    nn = NearestNeighbourMetrics(true_pos, imaging_pos, env_size, workers=workers)
+    return sum(nn.hausdorff(name) for name in PROJECTIONS)
+
+
+def _pos_metric_legacy(true_pos, imaging_pos, env_size):
     true_pos_zero = np.zeros(true_pos.shape, dtype=float)
     true_pos_zero[:, 0] = true_pos[:, 0] - env_size[0]
     true_pos_zero[:, 1] = true_pos[:, 1] - env_size[1]
@@ -0,0 +1,346 @@
+"""
+批量评估多个场景、多个 SNR 的成像结果
+- 遍历结果目录 results_dir/scene_XXX/SNR_*/，读取 music_results.mat（pos_all 与 pos_all_true），
+  或 Metric/data 形式的 pos_all.mat + pos_all_true.mat
+- 线程池并行读取 .mat，进程池并行计算 pos_metric / velociy_metric / density_mertic；
+  两级都只提前提交有限个任务，内存中同时只有少量点云
+- 读取失败的结果（如 MATLAB save 中断留下的截断文件）与计算失败一样记为一行 NaN 指标，error 列记录原因
+- 输出一张表（CSV，或安装了 pandas 时输出 Parquet）：每个 (场景, SNR) 一行，
+  另附各 SNR 与全部结果的 mean / std / median 汇总行（scene 列为 'ALL'）
+- 给出场景文件目录（scenario_N/mat_files）时，另输出按物体、按类别分解的指标表（<输出文件名>_objects，见 object_metric.py）
+"""
+
+import csv
+import glob
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+from scipy.io import loadmat
+
+from Metric import VELOCITY_METRIC_MODES, density_mertic, pos_metric, pos_metric_variants, velociy_metric
+from object_metric import (DEFAULT_MARGIN, OBJECT_CLASSES, OBJECT_COLUMNS, OBJECT_VELOCITY_MODES, ObjectBoxes,
+                           object_metrics)
+
+
+ENV_SIZE = [30, 20, 20]
+MUSIC_RESULTS_NAME = 'music_results.mat'
+SNR_DIR_PATTERN = re.compile(r'^SNR_(Inf|-?\d+(?:\.\d+)?)(?:dB)?$')
+METRIC_COLUMNS = ('pos_metric', 'velociy_metric', 'density_mertic', 'metric_value')
+VARIANT_COLUMNS = ('chamfer', 'percentile_hausdorff', 'fscore')
+AGGREGATE_STATS = ('mean', 'std', 'median')
+OBJECT_FIELDS = ('scene', 'snr', 'snr_db', 'level', 'class', 'object', 'true_points', 'imaging_points')
+READ_AHEAD = 4      # 每个线程 / 进程提前提交的任务数
+
+
+def parse_snr(folder_name):
+    """SNR 文件夹名（SNR_Inf / SNR_-10dB）对应的 SNR (dB)，无法识别时返回 None"""
+    match = SNR_DIR_PATTERN.match(folder_name)
+    if match is None:
+        return None
+    return float('inf') if match.group(1) == 'Inf' else float(match.group(1))
+
+
+def find_result_files(results_dir, scene_pattern='scene_*'):
+    """
+    查找所有 (场景, SNR) 的结果文件
+
+    参数：
+    - results_dir: 结果根目录（如 snr_simulation_results）
+    - scene_pattern: 场景子目录的通配符
+
+    返回：
+    - list of dict: scene, snr, snr_db, files（music_results.mat，或 (pos_all_true.mat, pos_all.mat)），
+                    按场景名与 SNR 排序
+    """
+    jobs = []
+    for scene_dir in sorted(glob.glob(os.path.join(results_dir, scene_pattern))):
+        for snr_dir in glob.glob(os.path.join(scene_dir, 'SNR_*')):
+            snr_db = parse_snr(os.path.basename(snr_dir))
+            if snr_db is None:
+                continue
+            music_file = os.path.join(snr_dir, MUSIC_RESULTS_NAME)
+            pair_files = (os.path.join(snr_dir, 'pos_all_true.mat'), os.path.join(snr_dir, 'pos_all.mat'))
+            if os.path.exists(music_file):
+                files = music_file
+            elif all(os.path.exists(path) for path in pair_files):
+                files = pair_files
+            else:
+                continue
+            jobs.append({'scene': os.path.basename(scene_dir), 'snr': os.path.basename(snr_dir),
+                         'snr_db': snr_db, 'files': files})
+    jobs.sort(key=lambda job: (job['scene'], job['snr_db']))
+    return jobs
+
+
+def _as_points(array):
+    """.mat 中的点云转换为 [N, 4]（MATLAB 空矩阵读出为 0×0）"""
+    array = np.atleast_2d(np.asarray(array, dtype=float))
+    return array.reshape(0, 4) if array.size == 0 else array
+
+
+def load_result(job):
+    """
+    读取一个结果的真值与成像点云
+
+    返回：
+    - (true_pos, imaging_pos, BER)；BER 不在文件中时为 NaN
+    """
+    if isinstance(job['files'], str):
+        data = loadmat(job['files'], variable_names=['pos_all', 'pos_all_true', 'BER'])
+        ber = float(np.squeeze(data['BER'])) if 'BER' in data else float('nan')
+        return _as_points(data['pos_all_true']), _as_points(data['pos_all']), ber
+    true_file, imaging_file = job['files']
+    return (_as_points(loadmat(true_file)['pos_all_true']), _as_points(loadmat(imaging_file)['pos_all']),
+            float('nan'))
+
+
+def _load_job(job):
+    """
+    读取一个结果（线程池任务），异常不向外抛出
+
+    返回：
+    - (true_pos, imaging_pos, BER, error)；读取失败时点云为空、error 记录原因
+    """
+    try:
+        return (*load_result(job), '')
+    except Exception as e:
+        return np.empty((0, 4)), np.empty((0, 4)), float('nan'), f'load failed: {type(e).__name__}: {e}'
+
+
+def score_result(job, true_pos, imaging_pos, ber, env_size=ENV_SIZE, variants=False, velocity_mode='sorted'):
+    """
+    计算一个结果的各项指标（进程池任务）
+
+    返回：
+    - dict: 表格的一行；无法计算时指标为 NaN，error 列记录原因
+    """
+    row = {'scene': job['scene'], 'snr': job['snr'], 'snr_db': job['snr_db'], 'stat': 'value',
+           'true_points': len(true_pos), 'imaging_points': len(imaging_pos), 'BER': ber, 'error': ''}
+    columns = METRIC_COLUMNS + (VARIANT_COLUMNS if variants else ())
+    row.update(dict.fromkeys(columns, float('nan')))
+    if len(true_pos) == 0 or len(imaging_pos) == 0:
+        row['error'] = 'no detections' if len(true_pos) else 'empty ground truth'
+        return row
+    try:
+        row['pos_metric'] = pos_metric(true_pos, imaging_pos, env_size)
+        row['velociy_metric'] = velociy_metric(true_pos, imaging_pos, mode=velocity_mode)
+        row['density_mertic'] = density_mertic(true_pos, imaging_pos, env_size)
+        row['metric_value'] = row['pos_metric'] + row['velociy_metric'] + row['density_mertic']
+        if variants:
+            result = pos_metric_variants(true_pos, imaging_pos, env_size)
+            row.update({key: result[key] for key in VARIANT_COLUMNS})
+    except Exception as e:
+        row['error'] = f'{type(e).__name__}: {e}'
+    return row
+
+
+def score_objects(job, true_pos, imaging_pos, scenes_dir, env_size=ENV_SIZE, velocity_mode='sorted',
+                  margin=DEFAULT_MARGIN):
+    """
+    按物体、按类别分解一个结果的指标（进程池任务）
+
+    参数：
+    - scenes_dir: 场景文件目录，场景文件为 scenes_dir/<scene>.mat
+
+    返回：
+    - list of dict: object_metrics 的各行，附 scene / snr / snr_db 与 error 列
+    """
+    prefix = {'scene': job['scene'], 'snr': job['snr'], 'snr_db': job['snr_db'], 'error': ''}
+    try:
+        boxes = ObjectBoxes.from_scene(os.path.join(scenes_dir, f"{job['scene']}.mat"), margin)
+        rows = object_metrics(true_pos, imaging_pos, boxes, env_size, velocity_mode)
+    except Exception as e:
+        return [dict(prefix, error=f'{type(e).__name__}: {e}')]
+    return [dict(prefix, **row) for row in rows]
+
+
+def _score_job(args):
+    job, true_pos, imaging_pos, ber, load_error, env_size, variants, velocity_mode, scenes_dir, margin = args
+    if load_error:
+        row = score_result(job, true_pos, imaging_pos, ber, env_size, variants, velocity_mode)
+        row.update(true_points=float('nan'), imaging_points=float('nan'), error=load_error)
+        prefix = {'scene': job['scene'], 'snr': job['snr'], 'snr_db': job['snr_db']}
+        return row, ([] if scenes_dir is None else [dict(prefix, error=load_error)])
+    row = score_result(job, true_pos, imaging_pos, ber, env_size, variants, velocity_mode)
+    if scenes_dir is None:
+        return row, []
+    return row, score_objects(job, true_pos, imaging_pos, scenes_dir, env_size, velocity_mode, margin)
+
+
+def _bounded_map(executor, fn, iterable, window):
+    """
+    executor.map 的有界版本：最多提前提交 window 个任务，按输入顺序产出结果
+
+    executor.map 会立即提交全部任务，读取的点云对全部驻留内存；这里按需从 iterable 取任务。
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def aggregate_rows(rows, columns):
+    """
+    各 SNR 与全部结果的汇总行（只统计无错误且有限的值）
+
+    返回：
+    - list of dict: scene='ALL'，stat 为 mean / std / median，count 为参与统计的结果数
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault((row['snr'], row['snr_db']), []).append(row)
+    groups[('ALL', float('nan'))] = rows
+
+    aggregates = []
+    for (snr, snr_db), group in sorted(groups.items(), key=lambda item: (item[0][0] == 'ALL', item[0][1])):
+        valid = [row for row in group if not row['error']]
+        for stat in AGGREGATE_STATS:
+            aggregate = {'scene': 'ALL', 'snr': snr, 'snr_db': snr_db, 'stat': stat, 'count': len(valid), 'error': ''}
+            for column in ('true_points', 'imaging_points', 'BER') + tuple(columns):
+                values = np.array([row[column] for row in valid], dtype=float)
+                values = values[np.isfinite(values)]
+                aggregate[column] = float(getattr(np, stat)(values)) if values.size else float('nan')
+            aggregates.append(aggregate)
+    return aggregates
+
+
+def _require_pandas():
+    try:
+        import pandas
+    except ImportError:
+        raise ImportError("输出 Parquet 需要 pandas 与 pyarrow：pip install pandas pyarrow") from None
+    return pandas
+
+
+def write_table(rows, output_path, columns,
+                keys=('scene', 'snr', 'snr_db', 'stat', 'count', 'true_points', 'imaging_points', 'BER')):
+    """写出表格：.parquet 使用 pandas（需额外安装），其余写 CSV"""
+    fieldnames = list(keys) + list(columns) + ['error']
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+    if output_path.lower().endswith('.parquet'):
+        _require_pandas().DataFrame(rows, columns=fieldnames).to_parquet(output_path, index=False)
+        return
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, restval='')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def objects_output_path(output_path):
+    """按物体分解的表格路径：evaluation.csv -> evaluation_objects.csv"""
+    stem, ext = os.path.splitext(output_path)
+    return f'{stem}_objects{ext}'
+
+
+def evaluate_results(results_dir, output_path=None, env_size=ENV_SIZE, workers=None, io_workers=8,
+                     variants=False, velocity_mode='sorted', scene_pattern='scene_*', scenes_dir=None,
+                     margin=DEFAULT_MARGIN):
+    """
+    批量评估结果目录下的所有 (场景, SNR)
+
+    参数：
+    - results_dir: 结果根目录
+    - output_path: 输出表格路径（.csv 或 .parquet；None 表示不写文件）
+    - env_size: 指标使用的环境尺寸
+    - workers: 计算指标的进程数（None 为 CPU 核数，1 为在当前进程中串行计算）
+    - io_workers: 读取 .mat 的线程数
+    - variants: 是否同时计算 Chamfer、百分位 Hausdorff 与 F-score
+    - velocity_mode: velociy_metric 的配对方式（见 VELOCITY_METRIC_MODES）
+    - scene_pattern: 场景子目录的通配符
+    - scenes_dir: 场景文件目录（scenario_N/mat_files）；给出时同时按物体、按类别分解指标
+    - margin: 按物体分解时包围盒的外扩距离 (m)
+
+    返回：
+    - list of dict: 逐结果的行 + 汇总行；给出 scenes_dir 时返回 (该表, 按物体分解的行)
+    """
+    if output_path and output_path.lower().endswith('.parquet'):
+        _require_pandas()
+    if scenes_dir is not None and velocity_mode not in OBJECT_VELOCITY_MODES:
+        raise ValueError(f"按物体分解不支持 velociy_metric 模式: {velocity_mode}"
+                         f"（可选 {', '.join(OBJECT_VELOCITY_MODES)}）")
+    jobs = find_result_files(results_dir, scene_pattern)
+    if not jobs:
+        raise FileNotFoundError(f"在目录 {results_dir} 中未找到结果文件（{scene_pattern}/SNR_*/{MUSIC_RESULTS_NAME}）")
+    print(f"✓ 找到 {len(jobs)} 个结果（{len({job['scene'] for job in jobs})} 个场景）")
+
+    with ThreadPoolExecutor(max_workers=io_workers) as io_pool:
+        # 读取在线程池中提前进行（最多 READ_AHEAD × io_workers 个），指标按结果顺序提交到进程池
+        loaded = _bounded_map(io_pool, _load_job, jobs, READ_AHEAD * io_workers)
+        tasks = ((job, *data, env_size, variants, velocity_mode, scenes_dir, margin)
+                 for job, data in zip(jobs, loaded))
+        if workers == 1:
+            results = [_score_job(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                window = READ_AHEAD * (workers or os.cpu_count() or 1)
+                results = list(_bounded_map(pool, _score_job, tasks, window))
+    rows = [row for row, _ in results]
+    object_rows = [object_row for _, object_part in results for object_row in object_part]
+
+    columns = METRIC_COLUMNS + (VARIANT_COLUMNS if variants else ())
+    failed = [row for row in rows if row['error']]
+    for row in failed:
+        print(f"⚠ {row['scene']}/{row['snr']}: {row['error']}")
+    table = rows + aggregate_rows(rows, columns)
+
+    for row in table:
+        if row['scene'] == 'ALL' and row['stat'] == 'mean':
+            print(f"  {row['snr']:>10}: " + ', '.join(f"{column}={row[column]:.4f}" for column in columns)
+                  + f"（{row['count']} 个结果）")
+    if output_path:
+        write_table(table, output_path, columns)
+        print(f"✓ 评估结果已保存: {output_path}")
+    if scenes_dir is None:
+        return table
+
+    for row in object_rows:
+        if row['error']:
+            print(f"⚠ {row['scene']}/{row['snr']}（按物体分解）: {row['error']}")
+    class_rows = [row for row in object_rows if row.get('level') == 'class']
+    for name in OBJECT_CLASSES:
+        summary = []
+        for column in OBJECT_COLUMNS:
+            values = np.array([row[column] for row in class_rows if row['class'] == name], dtype=float)
+            values = values[np.isfinite(values)]
+            summary.append(f"{column}={np.mean(values) if values.size else float('nan'):.4f}")
+        print(f"  {name:>12}: " + ', '.join(summary))
+    if output_path:
+        objects_path = objects_output_path(output_path)
+        write_table(object_rows, objects_path, OBJECT_COLUMNS, keys=OBJECT_FIELDS)
+        print(f"✓ 按物体分解的结果已保存: {objects_path}")
+    return table, object_rows
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='批量评估多个场景、多个SNR的成像结果')
+    parser.add_argument('results_dir', type=str, help='结果根目录（如 snr_simulation_results）')
+    parser.add_argument('--output', type=str, default='evaluation.csv', help='输出表格（.csv 或 .parquet）')
+    parser.add_argument('--env-size', type=float, nargs=3, default=ENV_SIZE, help='环境尺寸')
+    parser.add_argument('--workers', type=int, default=None, help='计算指标的进程数（默认CPU核数）')
+    parser.add_argument('--io-workers', type=int, default=8, help='读取 .mat 的线程数')
+    parser.add_argument('--variants', action='store_true', help='同时计算 Chamfer、百分位 Hausdorff 与 F-score')
+    parser.add_argument('--velocity-mode', type=str, default='sorted', choices=VELOCITY_METRIC_MODES,
+                        help='velociy_metric 的配对方式')
+    parser.add_argument('--scene-pattern', type=str, default='scene_*', help='场景子目录通配符')
+    parser.add_argument('--scenes-dir', type=str, default=None,
+                        help='场景文件目录（scenario_N/mat_files）；给出时同时按物体、按类别分解指标')
+    parser.add_argument('--margin', type=float, default=DEFAULT_MARGIN, help='按物体分解时包围盒的外扩距离 (m)')
+
+    args = parser.parse_args()
+    evaluate_results(args.results_dir, args.output, env_size=args.env_size, workers=args.workers,
+                     io_workers=args.io_workers, variants=args.variants, velocity_mode=args.velocity_mode,
+                     scene_pattern=args.scene_pattern, scenes_dir=args.scenes_dir, margin=args.margin)
+
+
+if __name__ == '__main__':
+    main()
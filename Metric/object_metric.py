@@ -0,0 +1,328 @@
+"""
+按物体、按类别分解评估指标
+- 由场景 .mat（save_scene_to_mat）中的物体表重建车辆、隔离带、路灯、行人对象（scene_objects.py）
+- 每个物体的有向包围盒（OBB）：朝向取自 get_obb_params，中心与半轴由物体自身散射点在该朝向下的包络确定，
+  再向外扩 margin 以容纳成像的位置误差
+  （get_obb_params 的中心对车辆、行人为 requested_center + 包络盒偏移，与散射点所在位置相差模板的几何中心；
+   隔离带的宽度按单层散射点估计为 0，均不能直接用来分配点）
+- 包围盒中心建 cKDTree 作为空间索引，真值与成像点一次向量化地分配到物体；落在多个包围盒内时取中心最近的，
+  不在任何包围盒内的点记为未分配（-1）
+- 每个投影只建一棵 cKDTree：坐标后追加一列“分组编号 × 间隔”，间隔大于点云直径，最近邻只会落在同一分组内；
+  各物体（各类别）的 Hausdorff 距离、速度计数与点数在同一遍计算中得到，
+  与对该物体（类别）的子集单独调用 pos_metric / velociy_metric / density_mertic 的结果一致
+"""
+
+import os
+import sys
+
+import numpy as np
+from scipy.io import loadmat
+from scipy.spatial import cKDTree
+
+from Metric import PROJECTIONS, match_velocities, select_velocities
+
+
+SCENE_OBJECTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '2D_FFT_2D_MUSIC')
+ENV_SIZE = [30, 20, 20]
+OBJECT_CLASSES = ('vehicles', 'barrier', 'lights', 'pedestrians')
+OBJECT_VELOCITY_MODES = ('sorted', 'hungarian')
+OBJECT_COLUMNS = ('pos_metric', 'velociy_metric', 'velocity_mae', 'density_mertic')
+DEFAULT_MARGIN = 0.5
+UNASSIGNED = -1
+_ASSIGN_BLOCK = 65536
+_BOUNDARY_TOLERANCE = 1e-9  # 旋转的舍入误差，保证 margin=0 时物体自身的散射点仍在包围盒内
+
+
+def _import_scene_objects(scene_objects_dir=SCENE_OBJECTS_DIR):
+    """导入 2D_FFT_2D_MUSIC/scene_objects.py（位于仓库的另一目录）"""
+    scene_objects_dir = os.path.abspath(scene_objects_dir)
+    if scene_objects_dir not in sys.path:
+        sys.path.insert(0, scene_objects_dir)
+    import scene_objects
+    return scene_objects
+
+
+def load_scene_objects(scene_file):
+    """
+    读取场景 .mat 的物体表并重建物体对象
+
+    参数：
+    - scene_file: save_scene_to_mat 保存的场景文件
+
+    返回：
+    - list of (类别, 物体对象)，按 vehicles、barrier、lights、pedestrians 排列（与 scatterers.all 的顺序一致）
+    """
+    so = _import_scene_objects()
+    data = loadmat(scene_file, squeeze_me=True, struct_as_record=False)
+
+    def table(key):
+        return (np.asarray(data[key].centers, dtype=float).reshape(-1, 3),
+                np.asarray(getattr(data[key], 'directions', []), dtype=float).reshape(-1),
+                np.asarray(getattr(data[key], 'velocities', []), dtype=float).reshape(-1))
+
+    def moving(cls, key):
+        # 表中保存的是 obj.center，还原出构造时请求的中心（方向以弧度保存，构造参数为角度）
+        return [cls(center=center - so.rotated_geometry(cls, float(direction))[1],
+                    direction=np.degrees(direction), velocity=velocity)
+                for center, direction, velocity in zip(*table(key))]
+
+    barrier = data['barrier']
+    objects = [('vehicles', obj) for obj in moving(so.Vehicle, 'vehicles')]
+    objects.append(('barrier', so.StraightBarrier(start=np.asarray(barrier.start, dtype=float),
+                                                  direction=np.degrees(float(barrier.direction)),
+                                                  length=float(barrier.length))))
+    objects += [('lights', so.StreetLight(position=center - so.StreetLight.TEMPLATE_CENTER))
+                for center in table('lights')[0]]
+    objects += [('pedestrians', obj) for obj in moving(so.Pedestrian, 'pedestrians')]
+    return objects
+
+
+class ObjectBoxes:
+    """
+    场景中各物体的有向包围盒及其空间索引
+
+    属性：
+    - classes / class_ids: 每个物体的类别名与类别编号（OBJECT_CLASSES 中的下标）
+    - object_ids: 物体在本类别中的序号
+    - velocities: 物体速度
+    - centers [K, 3]、half_extents [K, 3]（已含 margin）、directions [K]
+    """
+
+    def __init__(self, objects, margin=DEFAULT_MARGIN):
+        """
+        参数：
+        - objects: load_scene_objects 的结果
+        - margin: 包围盒各方向外扩的距离 (m)
+        """
+        self.margin = margin
+        self.classes = [key for key, _ in objects]
+        self.class_ids = np.array([OBJECT_CLASSES.index(key) for key in self.classes], dtype=int)
+        self.object_ids = np.zeros(len(objects), dtype=int)
+        for class_id in range(len(OBJECT_CLASSES)):
+            members = self.class_ids == class_id
+            self.object_ids[members] = np.arange(np.count_nonzero(members))
+        self.velocities = np.array([float(obj.velocity) for _, obj in objects])
+        self.directions = np.array([float(obj.get_obb_params()['direction']) for _, obj in objects])
+        self.centers = np.zeros((len(objects), 3))
+        self.half_extents = np.zeros((len(objects), 3))
+        for k, (_, obj) in enumerate(objects):
+            # 散射点转到物体坐标系（绕 Z 轴旋转 -direction）求包络，中心再转回场景坐标系
+            points = obj.get_scatterers()[:, :3]
+            cos, sin = np.cos(self.directions[k]), np.sin(self.directions[k])
+            local = np.column_stack([points[:, 0] * cos + points[:, 1] * sin,
+                                     -points[:, 0] * sin + points[:, 1] * cos, points[:, 2]])
+            low, high = local.min(axis=0), local.max(axis=0)
+            center_local = (low + high) / 2
+            self.centers[k] = [center_local[0] * cos - center_local[1] * sin,
+                               center_local[0] * sin + center_local[1] * cos, center_local[2]]
+            self.half_extents[k] = (high - low) / 2 + margin + _BOUNDARY_TOLERANCE
+        self.tree = cKDTree(self.centers[:, :2]) if len(objects) else None
+        self.radius = float(np.hypot(self.half_extents[:, 0], self.half_extents[:, 1]).max()) if len(objects) else 0.0
+
+    def __len__(self):
+        return len(self.classes)
+
+    @classmethod
+    def from_scene(cls, scene_file, margin=DEFAULT_MARGIN):
+        """由场景 .mat 文件构造"""
+        return cls(load_scene_objects(scene_file), margin)
+
+    def assign(self, points):
+        """
+        把点分配到物体
+
+        参数：
+        - points: 点云 [N, >=3]
+
+        返回：
+        - ndarray [N]: 所在物体的编号；落在多个包围盒内时取中心最近的，不在任何包围盒内为 UNASSIGNED
+        """
+        labels = np.full(len(points), UNASSIGNED, dtype=int)
+        if len(self) == 0 or len(points) == 0:
+            return labels
+        num_boxes = len(self)
+        cos, sin = np.cos(self.directions), np.sin(self.directions)
+        for start in range(0, len(points), _ASSIGN_BLOCK):
+            block = points[start:start + _ASSIGN_BLOCK, :3]
+            # 候选包围盒按中心距离由近到远排列，超出最大外接圆半径的记为 num_boxes
+            _, candidates = self.tree.query(block[:, :2], k=list(range(1, num_boxes + 1)),
+                                            distance_upper_bound=self.radius + _BOUNDARY_TOLERANCE)
+            valid = candidates < num_boxes
+            boxes = np.where(valid, candidates, 0)
+            delta = block[:, None, :] - self.centers[boxes]
+            local_x = delta[..., 0] * cos[boxes] + delta[..., 1] * sin[boxes]
+            local_y = -delta[..., 0] * sin[boxes] + delta[..., 1] * cos[boxes]
+            inside = (valid & (np.abs(local_x) <= self.half_extents[boxes, 0])
+                      & (np.abs(local_y) <= self.half_extents[boxes, 1])
+                      & (np.abs(delta[..., 2]) <= self.half_extents[boxes, 2]))
+            first = inside.argmax(axis=1)
+            rows = np.arange(len(block))
+            labels[start:start + len(block)] = np.where(inside[rows, first], boxes[rows, first], UNASSIGNED)
+        return labels
+
+
+def _group_hausdorff(true_pos, true_groups, imaging_pos, imaging_groups, num_groups, env_size):
+    """各分组上的 pos_metric（三个投影的对称 Hausdorff 距离之和），每个投影只建两棵 cKDTree"""
+    offset = np.asarray(env_size, dtype=float)
+    total = np.zeros(num_groups)
+    for columns in PROJECTIONS.values():
+        true_proj = true_pos[:, columns] - offset[columns]
+        imaging_proj = imaging_pos[:, columns] - offset[columns]
+        stacked = np.vstack([true_proj, imaging_proj])
+        diameter = float(np.linalg.norm(stacked.max(axis=0) - stacked.min(axis=0))) if len(stacked) else 0.0
+        # 不同分组之间的距离至少为 gap > diameter，组内距离不超过 diameter
+        gap = 2 * diameter + 1
+        true_key = np.column_stack([true_proj, true_groups * gap])
+        imaging_key = np.column_stack([imaging_proj, imaging_groups * gap])
+
+        forward = np.full(len(true_key), np.inf)
+        reverse = np.full(len(imaging_key), np.inf)
+        if len(true_key) and len(imaging_key):
+            forward = cKDTree(imaging_key).query(true_key)[0]
+            reverse = cKDTree(true_key).query(imaging_key)[0]
+            forward[forward > diameter] = np.inf
+            reverse[reverse > diameter] = np.inf
+        hausdorff = np.zeros(num_groups)
+        np.maximum.at(hausdorff, true_groups, forward)
+        np.maximum.at(hausdorff, imaging_groups, reverse)
+        total += hausdorff
+    return total
+
+
+def _group_velocity(true_velocities, true_groups, imaging_velocities, imaging_groups, num_groups, mode):
+    """各分组上的 velociy_metric：按 (分组, 速度) 一次统计，再逐组选出并配对速度"""
+    true_pairs = np.unique(np.column_stack([true_groups, true_velocities]), axis=0)
+    img_pairs, img_counts = np.unique(np.column_stack([imaging_groups, imaging_velocities]), axis=0,
+                                      return_counts=True)
+    true_bounds = np.searchsorted(true_pairs[:, 0], np.arange(num_groups + 1))
+    img_bounds = np.searchsorted(img_pairs[:, 0], np.arange(num_groups + 1))
+    result = np.full(num_groups, np.nan)
+    for g in range(num_groups):
+        true_array = true_pairs[true_bounds[g]:true_bounds[g + 1], 1]
+        img_slice = slice(img_bounds[g], img_bounds[g + 1])
+        img_array, _ = select_velocities(img_pairs[img_slice, 1], len(true_array), counts=img_counts[img_slice])
+        result[g] = match_velocities(true_array, img_array, mode)
+    return result
+
+
+def group_metrics(true_pos, true_groups, imaging_pos, imaging_groups, num_groups, env_size=ENV_SIZE,
+                  velocity_mode='sorted', imaging_errors=None):
+    """
+    一次计算所有分组的指标（分组编号为 UNASSIGNED 的点不参与）
+
+    参数：
+    - true_pos, imaging_pos: 点云 [N, 4]
+    - true_groups, imaging_groups: 每个点的分组编号（0 .. num_groups - 1 或 UNASSIGNED）
+    - num_groups: 分组数
+    - env_size: 指标使用的环境尺寸
+    - velocity_mode: 'sorted' 或 'hungarian'
+    - imaging_errors: 每个成像点的速度误差 |v - 所属物体速度|（None 表示不计算 velocity_mae）
+
+    返回：
+    - dict: true_points、imaging_points 与 OBJECT_COLUMNS 中各指标，均为长度 num_groups 的数组
+    """
+    true_mask = true_groups != UNASSIGNED
+    imaging_mask = imaging_groups != UNASSIGNED
+    true_pos, true_groups = true_pos[true_mask], true_groups[true_mask]
+    imaging_pos, imaging_groups = imaging_pos[imaging_mask], imaging_groups[imaging_mask]
+
+    true_points = np.bincount(true_groups, minlength=num_groups)
+    imaging_points = np.bincount(imaging_groups, minlength=num_groups)
+    volum = np.prod(env_size)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 与 density_mertic 相同的计算顺序
+        density = np.abs((imaging_points / volum - true_points / volum) / (true_points / volum))
+        if imaging_errors is None:
+            velocity_mae = np.full(num_groups, np.nan)
+        else:
+            velocity_mae = (np.bincount(imaging_groups, weights=imaging_errors[imaging_mask], minlength=num_groups)
+                            / imaging_points)
+    return {
+        'true_points': true_points,
+        'imaging_points': imaging_points,
+        'pos_metric': _group_hausdorff(true_pos, true_groups, imaging_pos, imaging_groups, num_groups, env_size),
+        'velociy_metric': _group_velocity(true_pos[:, 3], true_groups, imaging_pos[:, 3], imaging_groups,
+                                          num_groups, velocity_mode),
+        'velocity_mae': velocity_mae,
+        'density_mertic': density,
+    }
+
+
+def object_metrics(true_pos, imaging_pos, boxes, env_size=ENV_SIZE, velocity_mode='sorted'):
+    """
+    按物体与按类别分解的评估指标
+
+    参数：
+    - true_pos, imaging_pos: 点云 [N, 4]（与场景同一坐标系）
+    - boxes: ObjectBoxes
+    - env_size: 指标使用的环境尺寸
+    - velocity_mode: velociy_metric 的配对方式（'sorted' 或 'hungarian'）
+
+    返回：
+    - list of dict: level 为 'object'（每个物体一行）、'class'（每个类别一行）或 'unassigned'（未分配的点数），
+                    class、object（类别内序号，非物体行为 -1）、true_points、imaging_points 与 OBJECT_COLUMNS 各列；
+                    velocity_mae 为成像点与所属物体真实速度之差的平均绝对值
+    """
+    if velocity_mode not in OBJECT_VELOCITY_MODES:
+        raise ValueError(f"按物体分解不支持 velociy_metric 模式: {velocity_mode}"
+                         f"（可选 {', '.join(OBJECT_VELOCITY_MODES)}）")
+    true_objects = boxes.assign(true_pos)
+    imaging_objects = boxes.assign(imaging_pos)
+    imaging_errors = np.full(len(imaging_pos), np.nan)
+    assigned = imaging_objects != UNASSIGNED
+    imaging_errors[assigned] = np.abs(imaging_pos[assigned, 3] - boxes.velocities[imaging_objects[assigned]])
+
+    def to_class(objects):
+        return np.where(objects == UNASSIGNED, UNASSIGNED, boxes.class_ids[np.maximum(objects, 0)])
+
+    levels = (
+        ('object', true_objects, imaging_objects, len(boxes),
+         lambda k: (boxes.classes[k], int(boxes.object_ids[k]))),
+        ('class', to_class(true_objects), to_class(imaging_objects), len(OBJECT_CLASSES),
+         lambda k: (OBJECT_CLASSES[k], -1)),
+    )
+    rows = []
+    for level, true_groups, imaging_groups, num_groups, describe in levels:
+        metrics = group_metrics(true_pos, true_groups, imaging_pos, imaging_groups, num_groups, env_size,
+                                velocity_mode, imaging_errors)
+        for k in range(num_groups):
+            name, object_id = describe(k)
+            row = {'level': level, 'class': name, 'object': object_id}
+            row.update({key: values[k].item() for key, values in metrics.items()})
+            rows.append(row)
+
+    row = {'level': 'unassigned', 'class': '', 'object': -1,
+           'true_points': int(np.count_nonzero(true_objects == UNASSIGNED)),
+           'imaging_points': int(np.count_nonzero(imaging_objects == UNASSIGNED))}
+    row.update(dict.fromkeys(OBJECT_COLUMNS, float('nan')))
+    rows.append(row)
+    return rows
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='按物体、按类别分解成像结果的评估指标')
+    parser.add_argument('scene_file', type=str, help='场景文件（scenario_N/mat_files/scene_XXX.mat）')
+    parser.add_argument('result_file', type=str, help='成像结果（music_results.mat，或与 --true-file 配合的 pos_all.mat）')
+    parser.add_argument('--true-file', type=str, default=None, help='真值 pos_all_true.mat（结果为 pos_all.mat 时）')
+    parser.add_argument('--env-size', type=float, nargs=3, default=ENV_SIZE, help='环境尺寸')
+    parser.add_argument('--margin', type=float, default=DEFAULT_MARGIN, help='包围盒外扩距离 (m)')
+    parser.add_argument('--velocity-mode', type=str, default='sorted', choices=OBJECT_VELOCITY_MODES,
+                        help='velociy_metric 的配对方式')
+
+    args = parser.parse_args()
+    from evaluate_results import load_result
+    files = (args.true_file, args.result_file) if args.true_file else args.result_file
+    true_pos, imaging_pos, _ = load_result({'files': files})
+    boxes = ObjectBoxes.from_scene(args.scene_file, margin=args.margin)
+    print(f"✓ {len(boxes)} 个物体，真值 {len(true_pos)} 点，成像 {len(imaging_pos)} 点")
+    for row in object_metrics(true_pos, imaging_pos, boxes, args.env_size, args.velocity_mode):
+        label = row['class'] if row['object'] < 0 else f"{row['class']}[{row['object']}]"
+        print(f"  {row['level']:>10} {label:<16} 真值 {row['true_points']:>5} 成像 {row['imaging_points']:>5}  "
+              + ', '.join(f"{column}={row[column]:.4f}" for column in OBJECT_COLUMNS))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""
+分块（out-of-core）计算评估指标，用于内存放不下的成像点云
+- 成像点云从内存映射的 .npy（np.load(mmap_mode='r')）或 HDF5 数据集（需安装 h5py，含 MATLAB -v7.3 的 .mat）
+  中逐块读取，不整体载入内存；真值点云较小，常驻内存，每个投影只建一棵 cKDTree
+- 每块成像点：用真值的 cKDTree 查询反向最近距离（成像 -> 真值）；对该块建 cKDTree 查询每个真值点的最近距离，
+  与之前各块的结果取逐点最小值，得到正向最近距离（真值 -> 成像）
+- 只算 pos_metric 时反向距离只保留每块的最大值；计算 Chamfer、百分位 Hausdorff 与 F-score 时反向距离逐块写入
+  临时目录中的内存映射文件，在与内存计算完全相同的距离数组上求均值与百分位
+- 速度逐块统计出现次数后合并，密度只需要点数
+结果与 Metric.py 的内存计算（pos_metric / pos_metric_variants / velociy_metric / density_mertic）逐位一致
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+from scipy.io import loadmat
+from scipy.spatial import cKDTree
+
+from Metric import (PROJECTIONS, NearestNeighbourMetrics, density_mertic, match_velocities, select_velocities,
+                    summarize_pos_variants)
+
+
+ENV_SIZE = [30, 20, 20]
+DEFAULT_CHUNK_SIZE = 1_000_000
+STREAMING_VELOCITY_MODES = ('sorted', 'hungarian')
+HDF5_SUFFIXES = ('.h5', '.hdf5')
+
+
+def _require_h5py():
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError("读取 HDF5 / MATLAB -v7.3 文件需要 h5py：pip install h5py") from None
+    return h5py
+
+
+class _ColumnMajorDataset:
+    """MATLAB -v7.3 文件中的矩阵在 HDF5 里是转置存储的 [4, N]，按行切片时转回 [n, 4]"""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.shape = dataset.shape[::-1]
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        return self.dataset[:, rows].T
+
+
+def _check_points(points, path):
+    if len(points.shape) != 2 or points.shape[1] < 4:
+        raise ValueError(f"{path} 中的点云形状为 {points.shape}，应为 [N, 4]（x, y, z, v）")
+    return points
+
+
+@contextmanager
+def open_point_cloud(path, key='pos_all'):
+    """
+    以只读、按需读取的方式打开点云
+
+    参数：
+    - path: .npy（内存映射）、.h5 / .hdf5（HDF5 数据集，需 h5py）或 .mat 文件
+    - key: HDF5 / .mat 中的变量名（.npy 忽略）
+
+    返回（上下文管理器）：
+    - 支持按行切片的 [N, 4] 点云；.mat（-v7.3 之前的格式）无法部分读取，会整体读入内存
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == '.npy':
+        yield _check_points(np.load(path, mmap_mode='r'), path)
+        return
+    if suffix == '.mat':
+        try:
+            points = np.atleast_2d(np.asarray(loadmat(path, variable_names=[key])[key], dtype=float))
+        except NotImplementedError:
+            pass  # MATLAB -v7.3 文件，按 HDF5 读取
+        else:
+            yield _check_points(points.reshape(0, 4) if points.size == 0 else points, path)
+            return
+    elif suffix not in HDF5_SUFFIXES:
+        raise ValueError(f"不支持的点云文件格式: {path}（可选 .npy、.h5 / .hdf5、.mat）")
+
+    h5py = _require_h5py()
+    with h5py.File(path, 'r') as f:
+        if key not in f:
+            raise KeyError(f"{path} 中没有数据集 {key}")
+        dataset = f[key]
+        yield _check_points(_ColumnMajorDataset(dataset) if suffix == '.mat' else dataset, path)
+
+
+def iter_chunks(points, chunk_size=DEFAULT_CHUNK_SIZE):
+    """按行分块读取点云，每块为 [n, 4] 的 float 数组"""
+    for start in range(0, points.shape[0], chunk_size):
+        yield np.asarray(points[start:start + chunk_size], dtype=float)
+
+
+def merge_velocity_counts(values, counts, chunk_velocities):
+    """
+    把一块成像点的速度计数合并到已有计数中
+
+    参数：
+    - values, counts: 已统计的不同速度（升序）与出现次数
+    - chunk_velocities: 当前块的速度
+
+    返回：
+    - (values, counts)：与对全部速度做 np.unique(return_counts=True) 的结果相同
+    """
+    chunk_values, chunk_counts = np.unique(chunk_velocities, return_counts=True)
+    merged, inverse = np.unique(np.concatenate([values, chunk_values]), return_inverse=True)
+    merged_counts = np.zeros(len(merged), dtype=np.int64)
+    np.add.at(merged_counts, inverse, np.concatenate([counts, chunk_counts]).astype(np.int64))
+    return merged, merged_counts
+
+
+class StreamingNearestNeighbourMetrics(NearestNeighbourMetrics):
+    """
+    NearestNeighbourMetrics 的分块版本：真值常驻内存，成像点云通过 update 逐块加入
+
+    forward 为每个真值点到已加入成像点的最近距离（逐块取最小值）；reverse 为成像点到真值的最近距离，
+    给出 distance_dir 时完整保存在内存映射文件中，否则只保存每块的最大值（此时只能计算 Hausdorff）。
+    """
+
+    def __init__(self, true_pos, num_imaging, env_size, distance_dir=None, projections=PROJECTIONS, workers=1):
+        """
+        参数：
+        - true_pos: 真值点云 [N, >=3]
+        - num_imaging: 成像点总数（用于预先分配反向距离文件）
+        - env_size: 坐标平移量（同 NearestNeighbourMetrics）
+        - distance_dir: 保存反向距离的目录；None 表示不保存
+        - projections: {名称: 坐标列}
+        - workers: cKDTree.query 的并行线程数
+        """
+        self.offset = np.asarray(env_size, dtype=float)
+        self.projections = projections
+        self.workers = workers
+        self.num_imaging = num_imaging
+        self.keep_distances = distance_dir is not None
+        self.filled = 0
+        self.true_proj = {}
+        self.true_trees = {}
+        self.forward = {}
+        self.reverse = {}
+        for name, columns in projections.items():
+            self.true_proj[name] = true_pos[:, columns] - self.offset[columns]
+            self.true_trees[name] = cKDTree(self.true_proj[name]) if len(true_pos) else None
+            self.forward[name] = np.full(len(true_pos), np.inf)
+            if not self.keep_distances:
+                self.reverse[name] = np.empty(0)
+            elif num_imaging == 0:
+                self.reverse[name] = np.empty(0)
+            else:
+                path = os.path.join(distance_dir, f'reverse_{name}.npy')
+                self.reverse[name] = np.lib.format.open_memmap(path, mode='w+', dtype=float, shape=(num_imaging,))
+
+    def update(self, chunk):
+        """加入一块成像点 [n, >=3]"""
+        if len(chunk) == 0:
+            return
+        stop = self.filled + len(chunk)
+        if stop > self.num_imaging:
+            raise ValueError(f"成像点数超过预先给定的 {self.num_imaging}")
+        for name, columns in self.projections.items():
+            imaging_proj = chunk[:, columns] - self.offset[columns]
+            if self.true_trees[name] is None:
+                reverse = np.full(len(imaging_proj), np.inf)
+            else:
+                reverse = self.true_trees[name].query(imaging_proj, workers=self.workers)[0]
+                np.minimum(self.forward[name],
+                           cKDTree(imaging_proj).query(self.true_proj[name], workers=self.workers)[0],
+                           out=self.forward[name])
+            if self.keep_distances:
+                self.reverse[name][self.filled:stop] = reverse
+            else:
+                self.reverse[name] = np.append(self.reverse[name], reverse.max())
+        self.filled = stop
+
+    def _require_distances(self):
+        if not self.keep_distances:
+            raise RuntimeError("Chamfer、百分位 Hausdorff 与 F-score 需要完整的反向距离（创建时给出 distance_dir）")
+        if self.filled != self.num_imaging:
+            raise RuntimeError(f"只加入了 {self.filled} / {self.num_imaging} 个成像点")
+
+    def percentile_hausdorff(self, name, percentile=95):
+        self._require_distances()
+        return super().percentile_hausdorff(name, percentile)
+
+    def chamfer(self, name):
+        self._require_distances()
+        return super().chamfer(name)
+
+    def fscore(self, name, threshold=0.5):
+        self._require_distances()
+        return super().fscore(name, threshold)
+
+    def close(self):
+        """释放反向距离的内存映射（删除临时目录之前调用）"""
+        for name in self.reverse:
+            if isinstance(self.reverse[name], np.memmap):
+                self.reverse[name].flush()
+            self.reverse[name] = np.empty(0)
+
+
+def streaming_metrics(true_pos, imaging_points, env_size=ENV_SIZE, chunk_size=DEFAULT_CHUNK_SIZE, variants=False,
+                      velocity_mode='sorted', percentile=95, threshold=0.5, workers=1, tmp_dir=None):
+    """
+    分块计算一个结果的各项指标
+
+    参数：
+    - true_pos: 真值点云 [N, 4]（常驻内存）
+    - imaging_points: 成像点云，支持按行切片的 [M, 4] 对象（open_point_cloud 的结果、np.memmap 或 ndarray）
+    - env_size: 指标使用的环境尺寸
+    - chunk_size: 每块的成像点数
+    - variants: 是否同时计算 Chamfer、百分位 Hausdorff 与 F-score（反向距离写入 tmp_dir 下的临时文件，
+                每个成像点每个投影 8 字节）
+    - velocity_mode: 'sorted' 或 'hungarian'（见 velociy_metric；legacy 需要逐点排序，不支持分块）
+    - percentile, threshold: 同 pos_metric_variants
+    - workers: cKDTree.query 的并行线程数
+    - tmp_dir: 临时文件目录（默认为系统临时目录）
+
+    返回：
+    - dict: pos_metric、velociy_metric、density_mertic、metric_value、imaging_points、chunks；
+            variants 为 True 时另有 pos_metric_variants 的各项结果
+    """
+    if velocity_mode not in STREAMING_VELOCITY_MODES:
+        raise ValueError(f"分块计算不支持 velociy_metric 模式: {velocity_mode}"
+                         f"（可选 {', '.join(STREAMING_VELOCITY_MODES)}）")
+    num_imaging = imaging_points.shape[0]
+    with tempfile.TemporaryDirectory(prefix='streaming_metric_', dir=tmp_dir) as distance_dir:
+        nn = StreamingNearestNeighbourMetrics(true_pos, num_imaging, env_size,
+                                              distance_dir=distance_dir if variants else None, workers=workers)
+        values, counts = np.empty(0), np.empty(0, dtype=np.int64)
+        num_chunks = 0
+        try:
+            for chunk in iter_chunks(imaging_points, chunk_size):
+                nn.update(chunk)
+                values, counts = merge_velocity_counts(values, counts, chunk[:, 3])
+                num_chunks += 1
+
+            true_array = np.unique(true_pos[:, 3])
+            img_array, _ = select_velocities(values, len(true_array), counts=counts)
+            result = {
+                'pos_metric': sum(nn.hausdorff(name) for name in PROJECTIONS),
+                'velociy_metric': match_velocities(true_array, img_array, velocity_mode),
+                'density_mertic': density_mertic(true_pos, imaging_points, env_size),
+            }
+            result['metric_value'] = result['pos_metric'] + result['velociy_metric'] + result['density_mertic']
+            result.update(imaging_points=num_imaging, chunks=num_chunks)
+            if variants:
+                result.update(summarize_pos_variants(nn, percentile, threshold))
+        finally:
+            nn.close()
+    return result
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='分块计算成像点云的评估指标（成像点云不整体载入内存）')
+    parser.add_argument('true_file', type=str, help='真值点云（.mat / .npy / .h5）')
+    parser.add_argument('imaging_file', type=str, help='成像点云（.npy / .h5 / MATLAB -v7.3 .mat）')
+    parser.add_argument('--true-key', type=str, default='pos_all_true', help='真值在 .mat / HDF5 中的变量名')
+    parser.add_argument('--imaging-key', type=str, default='pos_all', help='成像点云在 .mat / HDF5 中的变量名')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='每块的成像点数')
+    parser.add_argument('--env-size', type=float, nargs=3, default=ENV_SIZE, help='环境尺寸')
+    parser.add_argument('--variants', action='store_true', help='同时计算 Chamfer、百分位 Hausdorff 与 F-score')
+    parser.add_argument('--velocity-mode', type=str, default='sorted', choices=STREAMING_VELOCITY_MODES,
+                        help='velociy_metric 的配对方式')
+    parser.add_argument('--workers', type=int, default=1, help='cKDTree.query 的并行线程数（-1 为全部核）')
+    parser.add_argument('--tmp-dir', type=str, default=None, help='反向距离临时文件目录（--variants 时使用）')
+
+    args = parser.parse_args()
+    with open_point_cloud(args.true_file, args.true_key) as points:
+        true_pos = np.array(points[:], dtype=float)
+    with open_point_cloud(args.imaging_file, args.imaging_key) as imaging_points:
+        print(f"✓ 真值 {len(true_pos)} 点，成像 {imaging_points.shape[0]} 点，每块 {args.chunk_size} 点")
+        result = streaming_metrics(true_pos, imaging_points, env_size=args.env_size, chunk_size=args.chunk_size,
+                                   variants=args.variants, velocity_mode=args.velocity_mode,
+                                   workers=args.workers, tmp_dir=args.tmp_dir)
+    for key, value in result.items():
+        if key != 'projections':
+            print(f"  {key}: {value}")
+
+
+if __name__ == '__main__':
+    main()